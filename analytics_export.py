@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analiz için sütunlu (Parquet / Arrow IPC) anlık görüntü dışa aktarma
+
+Kitaplar, üyeler, işlemler, cezalar ve etkinlik kayıtları tablo başına bir
+dosyaya yazılır. Tüm tablolar aynı görüntüden okunur (PostgreSQL'de tek
+REPEATABLE READ transaction'ı, SQLite'ta backup API ile alınan kopya):
+dosyalar aynı ana ait tutarlı bir görüntüdür ve bu an (snapshot_at) her dosyanın şema
+metadata'sına, o anki veri sürümüyle birlikte manifest.json'a yazılır.
+
+Satırlar ANALYTICS_EXPORT_CHUNK_ROWS'luk parçalar halinde okunup dosyaya
+eklenir; bellek kullanımı tablo boyutundan bağımsızdır. Sütun türleri model
+tanımından gelir (tarih sütunları timestamp olarak yazılır), böylece
+pandas.read_parquet ile yeniden ayrıştırma gerekmeden yüklenir.
+
+pyarrow isteğe bağlıdır; kurulu değilse available() False döner.
+
+Komut satırından: python analytics_export.py [çıktı klasörü] [parquet|arrow]
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import create_engine, select, Integer, Float, Numeric, Boolean, DateTime, Date
+
+from config import app
+from models import db, Book, Member, Transaction, Fine, ActivityLog, DataVersion
+from data_version import CATALOG
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # İsteğe bağlı bağımlılık
+    pa = None
+    pq = None
+
+
+app.config.setdefault('ANALYTICS_EXPORT_CHUNK_ROWS', 50000)
+
+SNAPSHOT_MODELS = (Book, Member, Transaction, Fine, ActivityLog)
+SNAPSHOT_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def available():
+    return pa is not None
+
+
+def _arrow_type(column):
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, (Float, Numeric)):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def table_schema(table, snapshot_at):
+    fields = [pa.field(column.name, _arrow_type(column)) for column in table.columns]
+    return pa.schema(fields, metadata={
+        'snapshot_at': snapshot_at.isoformat(),
+        'table': table.name,
+        'source': 'library'
+    })
+
+
+def _open_writer(path, schema, file_format):
+    if file_format == 'arrow':
+        return pa.ipc.new_file(path, schema)
+    return pq.ParquetWriter(path, schema, compression='zstd')
+
+
+def _write_table(connection, table, path, file_format, snapshot_at):
+    schema = table_schema(table, snapshot_at)
+    chunk_rows = app.config['ANALYTICS_EXPORT_CHUNK_ROWS']
+    result = connection.execution_options(stream_results=True, yield_per=chunk_rows)\
+        .execute(select(table).order_by(*table.primary_key.columns))
+    row_count = 0
+    writer = _open_writer(path, schema, file_format)
+    try:
+        for rows in result.partitions(chunk_rows):
+            columns = list(zip(*rows))
+            arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            row_count += len(rows)
+    finally:
+        writer.close()
+    return row_count
+
+
+@contextmanager
+def _snapshot_connection():
+    """Tutarlı görüntüyü okuyan bağlantı.
+
+    SQLite'ta uzun bir okuma transaction'ı (WAL kapalıyken) tüm yazmaları
+    bekletir; bunun yerine veritabanı backup API'siyle tek adımda kopyalanır
+    ve kopyadan okunur. PostgreSQL'de REPEATABLE READ transaction'ı kullanılır.
+    """
+    if db.engine.dialect.name == 'sqlite':
+        fd, copy_path = tempfile.mkstemp(suffix='.db', prefix='snapshot_')
+        os.close(fd)
+        engine = None
+        try:
+            raw = db.engine.raw_connection()
+            try:
+                target = sqlite3.connect(copy_path)
+                try:
+                    raw.driver_connection.backup(target)
+                finally:
+                    target.close()
+            finally:
+                raw.close()
+            engine = create_engine(f'sqlite:///{copy_path}')
+            with engine.connect() as connection:
+                yield connection
+        finally:
+            if engine is not None:
+                engine.dispose()
+            os.remove(copy_path)
+    else:
+        with db.engine.connect() as connection:
+            connection.execution_options(isolation_level='REPEATABLE READ', postgresql_readonly=True)
+            with connection.begin():
+                yield connection
+
+
+def write_snapshot(directory, file_format='parquet'):
+    """Tüm tabloları directory altına yaz; manifest sözlüğünü döner"""
+    if not available():
+        raise RuntimeError('pyarrow kurulu değil')
+    if file_format not in SNAPSHOT_FORMATS:
+        raise ValueError(f'Geçersiz biçim: {file_format}')
+    os.makedirs(directory, exist_ok=True)
+
+    snapshot_at = datetime.utcnow()
+    with _snapshot_connection() as connection:
+        # İlk okuma PostgreSQL'de görüntüyü sabitler
+        version = connection.execute(
+            select(DataVersion.version).where(DataVersion.name == CATALOG)
+        ).scalar()
+        manifest = {'format': file_format, 'snapshot_at': snapshot_at.isoformat(),
+                    'data_version': version or 0, 'tables': {}}
+        for model in SNAPSHOT_MODELS:
+            table = model.__table__
+            filename = table.name + SNAPSHOT_FORMATS[file_format]
+            rows = _write_table(connection, table, os.path.join(directory, filename),
+                                file_format, snapshot_at)
+            manifest['tables'][table.name] = {'file': filename, 'rows': rows}
+
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def build_snapshot_zip(file_format='parquet'):
+    """Anlık görüntüyü geçici bir ZIP'e yaz; (yol, indirme adı) döner"""
+    work_dir = tempfile.mkdtemp(prefix='snapshot_')
+    fd, zip_path = tempfile.mkstemp(suffix='.zip', prefix='snapshot_')
+    os.close(fd)
+    try:
+        manifest = write_snapshot(work_dir, file_format)
+        # Parquet/Arrow zaten sıkıştırılmış; ZIP yalnızca paketler
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for name in sorted(os.listdir(work_dir)):
+                archive.write(os.path.join(work_dir, name), name)
+    except Exception:
+        os.remove(zip_path)
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    stamp = manifest['snapshot_at'][:19].replace(':', '').replace('-', '').replace('T', '_')
+    return zip_path, f'kutuphane_snapshot_{stamp}_{file_format}.zip'
+
+
+if __name__ == '__main__':
+    import sys
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join('reports', 'snapshots',
+                                                                datetime.now().strftime('%Y%m%d_%H%M%S'))
+    fmt = sys.argv[2] if len(sys.argv) > 2 else 'parquet'
+    with app.app_context():
+        result = write_snapshot(target, fmt)
+    for name, info in result['tables'].items():
+        print(f"📦 {name}: {info['rows']} satır -> {os.path.join(target, info['file'])}")
+    print(f"✅ Anlık görüntü zamanı: {result['snapshot_at']}")
@@ -1,12 +1,10 @@
-from flask import request, jsonify, send_file
+from flask import request, jsonify
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-import tempfile
 import os
 import json
 import secrets
-import pandas as pd  # Excel işlemleri için gerekli
 from io import BytesIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
@@ -15,21 +13,49 @@ import qrcode
 
 from config import app, get_setting
 from models import db, User, Book, Member, Transaction, Category, BookCategory, Notification, SearchHistory, Review, Reservation, Fine, ActivityLog, Settings, EmailTemplate, OnlineBorrowRequest, QRCode
-from utils import (log_activity, fetch_book_info_from_api, calculate_fine, 
+from utils import (log_activity, fetch_book_info_from_api, fetch_books_info_bulk, calculate_fine, 
+                   missing_info_books_query, fill_missing_book_info, verify_and_update_book,
                    send_email, add_notification, generate_qr_code, save_qr_code,
-                   normalize_cover_url, download_cover_image,
-                   normalize_text_tr, compute_relevance_score)
+                   normalize_cover_url, download_cover_image, download_cover_images,
+                   normalize_text_tr, compute_relevance_score, adjust_borrowed_count)
 from routes import role_required
+from search_index import match_subquery
+from background_jobs import enqueue_job, job_to_dict
+from typeahead import book_typeahead
+from cover_store import store_cover
+from export_engine import export_response
+from book_import import import_file, read_columns, map_columns, missing_columns, IMPORT_EXTENSIONS
+from transaction_dates import parse_datetime, format_datetime, day_start, days_between
 
 # Books API
+def _category_names_by_isbn(isbns):
+    """Verilen ISBN'lerin kategori adlarını tek sorguda (IN) getir: {isbn: [ad, ...]}"""
+    names = {isbn: [] for isbn in isbns}
+    if not isbns:
+        return names
+    rows = db.session.query(BookCategory.book_isbn, Category.name)\
+        .join(Category, Category.id == BookCategory.category_id)\
+        .filter(BookCategory.book_isbn.in_(isbns))\
+        .order_by(Category.name).all()
+    for isbn, name in rows:
+        names[isbn].append(name)
+    return names
+
 @app.route('/api/books')
 def api_get_books():
-    """API endpoint to get all books"""
+    """API endpoint to get all books
+
+    Sayfa başına sabit sayıda sorgu çalışır: kitaplar + kategori adları (IN).
+    'cursor' parametresi verilirse (ilk sayfa için boş) keyset sayfalama
+    kullanılır: ISBN sırasına göre ilerler, OFFSET ve COUNT(*) çalıştırmaz.
+    """
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     search = request.args.get('search', '')
     category_filter = request.args.get('category', '')
     category_id = request.args.get('category_id', type=int)
+    keyset = 'cursor' in request.args
+    cursor = request.args.get('cursor', '')
     
     query = Book.query
     
@@ -50,20 +76,23 @@ def api_get_books():
         # Eski alanla (tekil string) filtreleme geriye uyumluluk için
         query = query.filter(Book.category.contains(category_filter))
     
-    books = query.paginate(page=page, per_page=per_page, error_out=False)
+    if keyset:
+        if cursor:
+            query = query.filter(Book.isbn > cursor)
+        # Bir fazla kayıt çekerek sonraki sayfa olup olmadığını COUNT olmadan anla
+        items = query.order_by(Book.isbn).limit(per_page + 1).all()
+        has_more = len(items) > per_page
+        items = items[:per_page]
+    else:
+        books = query.paginate(page=page, per_page=per_page, error_out=False)
+        items = books.items
+    
+    categories_by_isbn = _category_names_by_isbn([book.isbn for book in items])
     
     books_data = []
-    for book in books.items:
-        borrowed_count = Transaction.query.filter_by(isbn=book.isbn, return_date=None).count()
-        available = book.quantity - borrowed_count
-        
-        # Kapak yolunu normalize et
-        image_url = normalize_cover_url(book.image_path)
-        
-        # Get categories (çoklu)
-        categories = db.session.query(Category.name).join(BookCategory)\
-            .filter(BookCategory.book_isbn == book.isbn).all()
-        category_names = [cat[0] for cat in categories]
+    for book in items:
+        # Kapak yolunu normalize et (listede küçük boy)
+        image_url = normalize_cover_url(book.image_path, size='list')
         
         books_data.append({
             'isbn': book.isbn,
@@ -74,15 +103,22 @@ def api_get_books():
             'publishers': book.publishers,
             'languages': book.languages,
             'quantity': book.quantity,
-            'borrowed': borrowed_count,
-            'available': available,
+            'borrowed': book.borrowed_count or 0,
+            'available': book.available_count,
             'shelf': book.shelf,
             'cupboard': book.cupboard,
             'category': book.category,
-            'categories': ', '.join(category_names),
+            'categories': ', '.join(categories_by_isbn.get(book.isbn, [])),
             'image_path': image_url
         })
     
+    if keyset:
+        return jsonify({
+            'books': books_data,
+            'next_cursor': items[-1].isbn if has_more and items else None,
+            'has_more': has_more
+        })
+    
     return jsonify({
         'books': books_data,
         'total': books.total,
@@ -95,9 +131,10 @@ def api_fetch_books():
     """Fetch book information from Open Library API"""
     isbns = request.json.get('isbns', [])
     results = []
+    fetched = fetch_books_info_bulk(isbns, refresh=bool(request.json.get('refresh')))
     
     for isbn in isbns:
-        book_info = fetch_book_info_from_api(isbn)
+        book_info = fetched.get(isbn)
         if book_info:
             results.append(book_info)
         else:
@@ -127,11 +164,13 @@ def api_fetch_books_bulk():
     success_count = 0
     error_count = 0
     
-    for isbn in isbns:
+    # Tüm geçerli ISBN'leri paralel çek (sağlayıcı başına sınırlı, toplam süre sınırlı)
+    clean_isbns = [str(isbn).strip().replace('-', '').replace(' ', '') for isbn in isbns]
+    fetched = fetch_books_info_bulk([isbn for isbn in clean_isbns if len(isbn) >= 10],
+                                    refresh=bool(request.json.get('refresh')))
+    
+    for isbn, clean_isbn in zip(isbns, clean_isbns):
         try:
-            # ISBN'i temizle
-            clean_isbn = str(isbn).strip().replace('-', '').replace(' ', '')
-            
             if len(clean_isbn) < 10:
                 results.append({
                     'isbn': isbn,
@@ -142,8 +181,7 @@ def api_fetch_books_bulk():
                 error_count += 1
                 continue
             
-            # API'den bilgi çek
-            book_info = fetch_book_info_from_api(clean_isbn)
+            book_info = fetched.get(clean_isbn)
             if book_info:
                 # Başarılı sonuç
                 result = {
@@ -214,6 +252,7 @@ def api_import_books_bulk():
     updated_count = 0 
     error_count = 0
     errors = []
+    cover_urls = {}  # isbn -> (kitap, image_url)
     
     try:
         for book_data in books_data:
@@ -242,15 +281,10 @@ def api_import_books_bulk():
                     except:
                         pass
                     
-                    # Resim URL'si varsa kaydet
+                    # Resim URL'si varsa döngüden sonra paralel indirilir
                     image_url = book_data.get('image_url')
                     if image_url and not existing_book.image_path:
-                        try:
-                            downloaded = download_cover_image(image_url, isbn)
-                            if downloaded:
-                                existing_book.image_path = downloaded
-                        except Exception as img_error:
-                            print(f"Resim indirme hatası {isbn}: {img_error}")
+                        cover_urls[isbn] = (existing_book, image_url)
                     
                     updated_count += 1
                 else:
@@ -274,15 +308,10 @@ def api_import_books_bulk():
                     except:
                         book.number_of_pages = 0
                     
-                    # Resim URL'si varsa kaydet
+                    # Resim URL'si varsa döngüden sonra paralel indirilir
                     image_url = book_data.get('image_url')
                     if image_url:
-                        try:
-                            downloaded = download_cover_image(image_url, isbn)
-                            if downloaded:
-                                book.image_path = downloaded
-                        except Exception as img_error:
-                            print(f"Resim indirme hatası {isbn}: {img_error}")
+                        cover_urls[isbn] = (book, image_url)
                     
                     db.session.add(book)
                     success_count += 1
@@ -292,6 +321,11 @@ def api_import_books_bulk():
                 errors.append(f'Kitap işleme hatası: {str(e)}')
                 continue
         
+        # Kapakları tek tek değil, eşzamanlı indir
+        downloaded = download_cover_images({isbn: url for isbn, (_, url) in cover_urls.items()})
+        for isbn, filename in downloaded.items():
+            cover_urls[isbn][0].image_path = filename
+        
         # Değişiklikleri kaydet
         db.session.commit()
         
@@ -321,11 +355,28 @@ def api_import_books_bulk():
             'message': f'Veritabanı hatası: {str(e)}'
         }), 500
 
+def _enqueue_background_job(job_type, params):
+    """Uzun işi arka plan kuyruğuna al ve 202 ile iş bilgisini döndür"""
+    try:
+        created_by = current_user.id if current_user.is_authenticated else None
+        job = enqueue_job(job_type, params, created_by=created_by)
+        return jsonify({
+            'success': True,
+            'background': True,
+            'message': 'İş arka planda başlatıldı',
+            'job': job_to_dict(job)
+        }), 202
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'İş başlatılamadı: {str(e)}'}), 500
+
 @app.route('/api/books/download-missing-covers', methods=['POST'])
 def api_download_missing_covers():
     """Download missing book covers for existing books"""
-    import requests
-    from utils import fetch_book_info_from_api
+    options = request.get_json(silent=True) or {}
+    if options.get('background'):
+        # 20 kitap sınırı olmadan tüm eksik kapaklar
+        return _enqueue_background_job('download_missing_covers', {'refresh': bool(options.get('refresh'))})
     
     # Only process books without covers
     books_without_covers = Book.query.filter(
@@ -345,24 +396,17 @@ def api_download_missing_covers():
     
     success_count = 0
     errors = []
+    fetched = fetch_books_info_bulk([book.isbn for book in books_to_process],
+                                    refresh=bool(options.get('refresh')))
     
+    # Kapakları paralel indir
+    downloaded = download_cover_images({
+        book.isbn: (fetched.get(book.isbn) or {}).get('image_url') for book in books_to_process
+    })
     for book in books_to_process:
-        try:
-            # Get book info with image URL
-            book_info = fetch_book_info_from_api(book.isbn)
-            
-            if book_info and book_info.get('image_url'):
-                image_url = book_info['image_url']
-                
-                # Download image
-                downloaded = download_cover_image(image_url, book.isbn)
-                if downloaded:
-                    book.image_path = downloaded
-                    success_count += 1
-                
-        except Exception as e:
-            errors.append(f"{book.isbn}: {str(e)}")
-            continue
+        if downloaded.get(book.isbn):
+            book.image_path = downloaded[book.isbn]
+            success_count += 1
     
     # Save changes
     try:
@@ -499,11 +543,10 @@ def api_upload_book_cover(isbn):
         return jsonify({'success': False, 'message': 'Dosya seçilmedi'}), 400
 
     try:
-        filename = secure_filename(f"{isbn}.jpg")
-        save_dir = os.path.join(app.root_path, 'static', 'book_covers')
-        os.makedirs(save_dir, exist_ok=True)
-        save_path = os.path.join(save_dir, filename)
-        file.save(save_path)
+        try:
+            filename = store_cover(file.read())
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
 
         book.image_path = filename
         db.session.commit()
@@ -550,7 +593,7 @@ def api_get_book(isbn):
         'quantity': book.quantity,
         'shelf': book.shelf,
         'cupboard': book.cupboard,
-        'image_path': normalize_cover_url(book.image_path)
+        'image_path': normalize_cover_url(book.image_path, size='detail')
     })
 
 @app.route('/api/books/<isbn>', methods=['DELETE'])
@@ -624,8 +667,7 @@ def reserve_book(isbn):
     book = Book.query.get_or_404(isbn)
     
     # Check if book is available
-    borrowed_count = Transaction.query.filter_by(isbn=isbn, return_date=None).count()
-    if book.quantity > borrowed_count:
+    if book.available_count > 0:
         return jsonify({'success': False, 'message': 'Kitap zaten mevcut, direkt ödünç alabilirsiniz'}), 400
     
     # Use default user_id for EXE compatibility
@@ -678,8 +720,8 @@ def reserve_book(isbn):
 def api_book_availability(isbn):
     """Check book availability"""
     book = Book.query.get_or_404(isbn)
-    borrowed_count = Transaction.query.filter_by(isbn=isbn, return_date=None).count()
-    available_count = book.quantity - borrowed_count
+    borrowed_count = book.borrowed_count or 0
+    available_count = book.available_count
     
     return jsonify({
         'available': available_count > 0,
@@ -733,7 +775,7 @@ def api_get_book_details(isbn):
         category_name = category.name if category else 'Genel'
         
         # Kapak yolunu normalize et
-        image_url = normalize_cover_url(book.image_path)
+        image_url = normalize_cover_url(book.image_path, size='detail')
         
         return jsonify({
             'success': True,
@@ -899,8 +941,8 @@ def api_member_borrows(id):
             'id': trans.id,
             'isbn': trans.isbn,
             'book_title': book.title,
-            'borrow_date': trans.borrow_date,
-            'due_date': trans.due_date
+            'borrow_date': format_datetime(trans.borrow_date),
+            'due_date': format_datetime(trans.due_date)
         })
     
     return jsonify({'borrows': borrows_data})
@@ -912,16 +954,16 @@ def api_member_details(member_id):
     if not member:
         return jsonify({'success': False, 'message': 'Üye bulunamadı'}), 404
     
-    # Aktif ödünç alınan kitaplar
-    active_transactions = db.session.query(Transaction, Book)\
-        .join(Book, Transaction.isbn == Book.isbn)\
+    # Aktif ödünç alınan kitaplar (kalan gün SQL'de hesaplanır)
+    active_transactions = db.session.query(
+        Transaction, Book, days_between(datetime.now(), Transaction.due_date).label('days_remaining')
+    ).join(Book, Transaction.isbn == Book.isbn)\
         .filter(Transaction.member_id == member_id, Transaction.return_date == None)\
         .all()
     
     active_books = []
-    for transaction, book in active_transactions:
-        due_date = datetime.strptime(transaction.due_date, '%Y-%m-%d')
-        days_remaining = (due_date.date() - datetime.now().date()).days
+    for transaction, book, days_remaining in active_transactions:
+        days_remaining = days_remaining or 0
         is_overdue = days_remaining < 0
         
         active_books.append({
@@ -929,8 +971,8 @@ def api_member_details(member_id):
             'isbn': book.isbn,
             'title': book.title,
             'authors': book.authors,
-            'borrow_date': transaction.borrow_date,
-            'due_date': transaction.due_date,
+            'borrow_date': format_datetime(transaction.borrow_date),
+            'due_date': format_datetime(transaction.due_date),
             'days_remaining': days_remaining,
             'is_overdue': is_overdue,
             'fine_amount': abs(days_remaining) * float(get_setting('daily_fine_amount', '1.0')) if is_overdue else 0
@@ -947,8 +989,8 @@ def api_member_details(member_id):
     for transaction, book in recent_transactions:
         recent_activity.append({
             'book_title': book.title,
-            'borrow_date': transaction.borrow_date,
-            'return_date': transaction.return_date,
+            'borrow_date': format_datetime(transaction.borrow_date),
+            'return_date': format_datetime(transaction.return_date),
             'status': 'Aktif' if not transaction.return_date else 'İade edildi'
         })
     
@@ -986,7 +1028,9 @@ def api_get_transactions():
     status = request.args.get('status', 'all')  # all, active, returned
     search = request.args.get('search', '').strip()  # Arama terimi
     
-    query = db.session.query(Transaction, Book, Member)\
+    # Gecikme SQL'de hesaplanır
+    is_overdue = db.and_(Transaction.return_date.is_(None), Transaction.due_date < day_start())
+    query = db.session.query(Transaction, Book, Member, is_overdue.label('is_overdue'))\
         .join(Book, Transaction.isbn == Book.isbn)\
         .join(Member, Transaction.member_id == Member.id)
     
@@ -1010,34 +1054,18 @@ def api_get_transactions():
     
     max_renew = int(get_setting('max_renew_count', '2'))
     transactions_data = []
-    for trans, book, member in transactions.items:
+    for trans, book, member, is_overdue in transactions.items:
         can_renew = (trans.return_date is None and trans.renew_count < max_renew)
-        # Gecikme hesabı: hem 'YYYY-MM-DD' hem de 'YYYY-MM-DD HH:MM:SS' destekle
-        is_overdue = False
-        try:
-            if trans.return_date is None and trans.due_date:
-                due_dt = None
-                try:
-                    due_dt = datetime.strptime(trans.due_date, '%Y-%m-%d %H:%M:%S')
-                except Exception:
-                    try:
-                        due_dt = datetime.strptime(trans.due_date, '%Y-%m-%d')
-                    except Exception:
-                        due_dt = None
-                if due_dt:
-                    is_overdue = due_dt.date() < datetime.now().date()
-        except Exception:
-            is_overdue = False
         transactions_data.append({
             'id': trans.id,
             'isbn': trans.isbn,
             'book_title': book.title,
             'member_id': trans.member_id,
             'member_name': member.ad_soyad,
-            'borrow_date': trans.borrow_date,
-            'due_date': trans.due_date,
-            'return_date': trans.return_date,
-            'is_overdue': is_overdue,
+            'borrow_date': format_datetime(trans.borrow_date),
+            'due_date': format_datetime(trans.due_date),
+            'return_date': format_datetime(trans.return_date),
+            'is_overdue': bool(is_overdue),
             'can_renew': can_renew
         })
     
@@ -1078,22 +1106,23 @@ def api_borrow_book():
     if not book:
         return jsonify({'success': False, 'message': 'Kitap bulunamadı'}), 404
     
-    borrowed_count = Transaction.query.filter_by(isbn=isbn, return_date=None).count()
-    if book.quantity <= borrowed_count:
+    if book.available_count <= 0:
         return jsonify({'success': False, 'message': 'Kitap mevcut değil'}), 400
     
-    # Create transaction (saat/dakika ile kaydet) ve due_date boşsa hesapla
+    # Create transaction ve due_date boşsa hesapla; yalnızca tarih verilirse gün sonuna kadar
     if not due_date:
         loan_days = int(get_setting('max_borrow_days', '14'))
-        computed_due = datetime.now() + timedelta(days=loan_days)
-        due_date_final = computed_due.strftime('%Y-%m-%d %H:%M:%S')
+        due_date_final = now + timedelta(days=loan_days)
     else:
-        due_date_final = due_date if len(due_date) > 10 else f"{due_date} 23:59:59"
+        try:
+            due_date_final = parse_datetime(due_date, end_of_day=True)
+        except ValueError:
+            return jsonify({'success': False, 'message': f'Geçersiz teslim tarihi: {due_date}'}), 400
 
     transaction = Transaction(
         isbn=isbn,
         member_id=member.id,
-        borrow_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        borrow_date=now,
         due_date=due_date_final
     )
     
@@ -1102,6 +1131,7 @@ def api_borrow_book():
     book.total_borrow_count += 1
     
     db.session.add(transaction)
+    adjust_borrowed_count(isbn, 1)
     db.session.commit()
     
     return jsonify({'success': True, 'message': 'Kitap ödünç verildi'})
@@ -1129,7 +1159,8 @@ def api_return_book():
         return jsonify({'success': False, 'message': 'Aktif ödünç işlemi bulunamadı'}), 404
     
     # Update transaction - saat/dakika ile
-    transaction.return_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    transaction.return_date = datetime.now()
+    adjust_borrowed_count(transaction.isbn, -1)
     
     # İade sonrası kitap/üye istatistiklerini güncelle (güvenli)
     try:
@@ -1147,22 +1178,23 @@ def api_return_book():
 @app.route('/api/transactions/overdue')
 def api_get_overdue():
     """Get overdue transactions"""
-    overdue = db.session.query(Transaction, Book, Member)\
-        .join(Book, Transaction.isbn == Book.isbn)\
+    overdue = db.session.query(
+        Transaction, Book, Member, days_between(Transaction.due_date, datetime.now()).label('days_overdue')
+    ).join(Book, Transaction.isbn == Book.isbn)\
         .join(Member, Transaction.member_id == Member.id)\
         .filter(Transaction.return_date == None)\
-        .filter(Transaction.due_date < datetime.now().strftime("%Y-%m-%d"))\
+        .filter(Transaction.due_date < day_start())\
         .order_by(Transaction.due_date).all()
     
     overdue_data = []
-    for trans, book, member in overdue:
+    for trans, book, member, days_overdue in overdue:
         overdue_data.append({
             'id': trans.id,
             'isbn': trans.isbn,
             'book_title': book.title,
             'member_name': member.ad_soyad,
-            'due_date': trans.due_date,
-            'days_overdue': (datetime.now() - datetime.strptime(trans.due_date, "%Y-%m-%d")).days
+            'due_date': format_datetime(trans.due_date),
+            'days_overdue': days_overdue
         })
     
     return jsonify({'overdue': overdue_data})
@@ -1187,14 +1219,7 @@ def api_renew_transaction(id):
     
     # Extend due date by original loan period
     loan_days = int(get_setting('max_borrow_days', '14'))
-    # due_date hem tarih hem tarih-saat formatında olabilir
-    try:
-        current_due = datetime.strptime(transaction.due_date, '%Y-%m-%d %H:%M:%S')
-    except Exception:
-        current_due = datetime.strptime(transaction.due_date, '%Y-%m-%d')
-    new_due = current_due + timedelta(days=loan_days)
-    
-    transaction.due_date = new_due.strftime('%Y-%m-%d %H:%M:%S')
+    transaction.due_date = (transaction.due_date or datetime.now()) + timedelta(days=loan_days)
     transaction.renew_count += 1
     
     db.session.commit()
@@ -1203,7 +1228,7 @@ def api_renew_transaction(id):
     
     return jsonify({
         'success': True,
-        'message': f'Süre {loan_days} gün uzatıldı. Yeni teslim tarihi: {transaction.due_date}'
+        'message': f'Süre {loan_days} gün uzatıldı. Yeni teslim tarihi: {format_datetime(transaction.due_date)}'
     })
 
 @app.route('/api/transactions/<int:id>/quick-return', methods=['POST'])
@@ -1214,7 +1239,8 @@ def api_quick_return(id):
     if transaction.return_date:
         return jsonify({'success': False, 'message': 'Kitap zaten iade edilmiş'}), 400
     
-    transaction.return_date = datetime.now().strftime('%Y-%m-%d')
+    transaction.return_date = datetime.now()
+    adjust_borrowed_count(transaction.isbn, -1)
     
     # Calculate fine if overdue
     fine_amount = calculate_fine(transaction.due_date, transaction.return_date)
@@ -1249,12 +1275,13 @@ def api_quick_return(id):
 @app.route('/api/transactions/stats')
 def api_transaction_stats():
     """Get transaction statistics"""
-    today = datetime.now().strftime('%Y-%m-%d')
+    today, tomorrow = day_start(), day_start() + timedelta(days=1)
     
     active = Transaction.query.filter_by(return_date=None).count()
     today_due = Transaction.query.filter(
         Transaction.return_date == None,
-        Transaction.due_date == today
+        Transaction.due_date >= today,
+        Transaction.due_date < tomorrow
     ).count()
     overdue = Transaction.query.filter(
         Transaction.return_date == None,
@@ -1262,8 +1289,8 @@ def api_transaction_stats():
     ).count()
     today_transactions = Transaction.query.filter(
         db.or_(
-            Transaction.borrow_date == today,
-            Transaction.return_date == today
+            db.and_(Transaction.borrow_date >= today, Transaction.borrow_date < tomorrow),
+            db.and_(Transaction.return_date >= today, Transaction.return_date < tomorrow)
         )
     ).count()
     
@@ -1293,15 +1320,15 @@ def api_check_transaction():
     if not transaction:
         return jsonify({'error': 'Transaction not found'}), 404
     
-    due_date = datetime.strptime(transaction.due_date, '%Y-%m-%d')
-    today = datetime.now()
-    days_overdue = max(0, (today - due_date).days)
+    days_overdue = 0
+    if transaction.due_date:
+        days_overdue = max(0, (datetime.now().date() - transaction.due_date.date()).days)
     
     return jsonify({
         'transaction': {
             'id': transaction.id,
-            'borrow_date': transaction.borrow_date,
-            'due_date': transaction.due_date,
+            'borrow_date': format_datetime(transaction.borrow_date),
+            'due_date': format_datetime(transaction.due_date),
             'days_overdue': days_overdue
         }
     })
@@ -1320,6 +1347,10 @@ def api_delete_transaction(id):
         book_title = book.title if book else f"ISBN: {transaction.isbn}"
         member_name = member.ad_soyad if member else f"ID: {transaction.member_id}"
         
+        # Aktif ödünç siliniyorsa sayacı geri al
+        if transaction.return_date is None:
+            adjust_borrowed_count(transaction.isbn, -1)
+        
         db.session.delete(transaction)
         db.session.commit()
         
@@ -1352,12 +1383,19 @@ def api_bulk_delete_transactions():
             return jsonify({'success': False, 'message': 'Silinecek işlem bulunamadı'}), 404
         
         deleted_info = []
+        active_per_isbn = {}
         for trans in transactions:
             book = Book.query.get(trans.isbn)
             member = Member.query.get(trans.member_id)
             book_title = book.title if book else f"ISBN: {trans.isbn}"
             member_name = member.ad_soyad if member else f"ID: {trans.member_id}"
             deleted_info.append(f"{book_title} - {member_name}")
+            if trans.return_date is None:
+                active_per_isbn[trans.isbn] = active_per_isbn.get(trans.isbn, 0) + 1
+        
+        # Silinen aktif ödünçlerin sayaçlarını geri al
+        for trans_isbn, active_count in active_per_isbn.items():
+            adjust_borrowed_count(trans_isbn, -active_count)
         
         # Delete transactions
         deleted_count = Transaction.query.filter(Transaction.id.in_(transaction_ids)).delete(synchronize_session=False)
@@ -1412,40 +1450,15 @@ def api_delete_all_returned_transactions():
 # Export/Import APIs
 @app.route('/api/export/books', methods=['GET'])
 def api_export_books():
-    """Export books to Excel"""
-    books = Book.query.all()
-    
-    data = []
-    for book in books:
-        data.append({
-            'ISBN': book.isbn,
-            'Başlık': book.title,
-            'Yazar': book.authors,
-            'Yayın Yılı': book.publish_date,
-            'Sayfa Sayısı': book.number_of_pages,
-            'Yayınevi': book.publishers,
-            'Diller': book.languages,
-            'Adet': book.quantity,
-            'Raf': book.shelf,
-            'Dolap': book.cupboard,
-            'Kategori': book.category
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # Create temporary file
-    temp = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-    df.to_excel(temp.name, index=False)
-    temp.close()
-    
-    return send_file(temp.name, as_attachment=True, download_name='kitaplar.xlsx')
+    """Export books to Excel/CSV - akışlı (?format=csv&category=&status=available|borrowed)"""
+    try:
+        return export_response('books', request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
 
 @app.route('/api/import/books', methods=['POST'])
 def api_import_books():
-    """Import books from Excel - BULK OPTİMİZE EDİLMİŞ"""
-    import time
-    start_time = time.time()
-    
+    """Import books from Excel/CSV - parça parça okuma + bulk upsert (bkz. book_import.py)"""
     if 'file' not in request.files:
         return jsonify({'success': False, 'message': 'Dosya bulunamadı'}), 400
     
@@ -1453,7 +1466,7 @@ def api_import_books():
     if file.filename == '':
         return jsonify({'success': False, 'message': 'Dosya seçilmedi'}), 400
     
-    if not file or not file.filename.endswith(('.xlsx', '.xls')):
+    if not file or not file.filename.lower().endswith(IMPORT_EXTENSIONS):
         return jsonify({'success': False, 'message': 'Geçersiz dosya formatı'}), 400
     
     filename = secure_filename(file.filename)
@@ -1461,155 +1474,65 @@ def api_import_books():
     file.save(filepath)
     
     try:
-        df = pd.read_excel(filepath)
-        total_rows = len(df)
-        
-        # Sütun eşleme
-        column_mappings = {
-            'isbn': ['ISBN', 'isbn', 'Isbn', 'kitap_no', 'book_id'],
-            'title': ['Başlık', 'title', 'Title', 'baslik', 'kitap_adi'],
-            'authors': ['Yazar', 'authors', 'Authors', 'author', 'yazar'],
-            'publish_date': ['Yayın Yılı', 'publish_date', 'yayin_yili', 'year'],
-            'number_of_pages': ['Sayfa Sayısı', 'pages', 'sayfa', 'page_count'],
-            'publishers': ['Yayınevi', 'publishers', 'publisher', 'yayinevi'],
-            'languages': ['Diller', 'languages', 'language', 'dil'],
-            'quantity': ['Adet', 'quantity', 'miktar', 'count'],
-            'shelf': ['Raf', 'shelf', 'raf_no'],
-            'cupboard': ['Dolap', 'cupboard', 'dolap_no'],
-            'category': ['Kategori', 'category', 'kategori', 'tur']
-        }
-        
-        # Sütun eşlemesi yap
-        mapped_columns = {}
-        for system_col, possible_names in column_mappings.items():
-            for col_name in df.columns:
-                if col_name.strip() in possible_names:
-                    mapped_columns[system_col] = col_name
-                    break
-        
-        # En az ISBN ve Başlık olmalı
-        if 'isbn' not in mapped_columns or 'title' not in mapped_columns:
-            missing = [col for col in ['isbn', 'title'] if col not in mapped_columns]
-            return jsonify({
-                'success': False,
-                'message': f'Gerekli sütunlar bulunamadı: {", ".join(missing)}\\nBulunan sütunlar: {", ".join(df.columns)}'
-            }), 400
-        
-        # BULK PROCESSING
-        BATCH_SIZE = 200
-        COMMIT_FREQUENCY = 50
-        
-        stats = {
-            'added_count': 0,
-            'updated_count': 0,
-            'error_count': 0,
-            'skipped_count': 0
-        }
-        
-        # Mevcut ISBN'leri çek
-        existing_isbns = {isbn[0] for isbn in db.session.query(Book.isbn).all()}
-        
-        batch_books = []
-        errors = []
-        
-        for batch_start in range(0, total_rows, BATCH_SIZE):
-            batch_end = min(batch_start + BATCH_SIZE, total_rows)
-            
-            for index in range(batch_start, batch_end):
-                row = df.iloc[index]
-                
-                try:
-                    isbn = str(row.get(mapped_columns['isbn'], '')).strip()
-                    title = str(row.get(mapped_columns.get('title'), '')).strip()
-                    
-                    if not isbn or not title:
-                        stats['skipped_count'] += 1
-                        continue
-                    
-                    # Kitap mevcut mu kontrol et
-                    if isbn in existing_isbns:
-                        # Güncelle
-                        book = Book.query.get(isbn)
-                        stats['updated_count'] += 1
-                    else:
-                        # Yeni ekle
-                        book = Book(isbn=isbn)
-                        existing_isbns.add(isbn)
-                        stats['added_count'] += 1
-                    
-                    # Verileri ata
-                    book.title = title
-                    book.authors = str(row.get(mapped_columns.get('authors', ''), '')).strip()
-                    book.publish_date = str(row.get(mapped_columns.get('publish_date', ''), ''))
-                    
-                    # Sayısal değerler
-                    try:
-                        book.number_of_pages = int(row.get(mapped_columns.get('number_of_pages', ''), 0) or 0)
-                        book.quantity = int(row.get(mapped_columns.get('quantity', ''), 1) or 1)
-                    except:
-                        book.number_of_pages = 0
-                        book.quantity = 1
-                    
-                    book.publishers = str(row.get(mapped_columns.get('publishers', ''), '')).strip()
-                    book.languages = str(row.get(mapped_columns.get('languages', ''), '')).strip()
-                    book.shelf = str(row.get(mapped_columns.get('shelf', ''), '')).strip()
-                    book.cupboard = str(row.get(mapped_columns.get('cupboard', ''), '')).strip()
-                    book.category = str(row.get(mapped_columns.get('category', ''), '')).strip()
-                    
-                    batch_books.append(book)
-                    
-                    # Belirli aralıklarla commit
-                    if len(batch_books) >= COMMIT_FREQUENCY:
-                        db.session.add_all(batch_books)
-                        db.session.commit()
-                        batch_books = []
-                        
-                except Exception as e:
-                    stats['error_count'] += 1
-                    if len(errors) < 20:
-                        errors.append(f"Satır {index+2}: {str(e)}")
-        
-        # Kalan kayıtları commit et
-        if batch_books:
-            db.session.add_all(batch_books)
-            db.session.commit()
-        
+        # En az ISBN ve Başlık sütunu olmalı (yoksa ValueError)
+        importer, mapped_columns = import_file(filepath)
         os.remove(filepath)
         
-        # Performans metrikleri
-        processing_time = time.time() - start_time
-        total_processed = stats['added_count'] + stats['updated_count']
-        records_per_second = int(total_processed / processing_time) if processing_time > 0 else 0
-        
-        message = f"🚀 {stats['added_count']} kitap eklendi, {stats['updated_count']} güncellendi"
-        message += f"\\n⚡ İşlem süresi: {processing_time:.2f}s ({records_per_second} kayıt/saniye)"
-        
-        if stats['skipped_count'] > 0:
-            message += f"\\n📋 {stats['skipped_count']} satır atlandı"
-        if stats['error_count'] > 0:
-            message += f"\\n❌ {stats['error_count']} satırda hata"
-        
-        result = {
+        summary = importer.summary()
+        summary['mapped_columns'] = mapped_columns
+        print(f"📥 Kitap içe aktarma: {summary['stats']}, {summary['records_per_second']} kayıt/saniye")
+        return jsonify({
             'success': True,
-            'message': message,
-            'details': {
-                'stats': stats,
-                'mapped_columns': mapped_columns,
-                'processing_time': processing_time,
-                'records_per_second': records_per_second,
-                'errors': errors
-            }
-        }
-        
-        return jsonify(result)
+            'message': importer.message(),
+            'details': summary
+        })
         
+    except ValueError as e:
+        os.remove(filepath)
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
+        db.session.rollback()
         try:
             os.remove(filepath)
         except:
             pass
         return jsonify({'success': False, 'message': f'Excel işleme hatası: {str(e)}'}), 400
 
+@app.route('/api/import/books/async', methods=['POST'])
+def api_import_books_async():
+    """Büyük dosyalar için arka planda içe aktarma; ilerleme /api/jobs/<id> ile izlenir"""
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({'success': False, 'message': 'Dosya bulunamadı'}), 400
+    
+    file = request.files['file']
+    if not file.filename.lower().endswith(IMPORT_EXTENSIONS):
+        return jsonify({'success': False, 'message': 'Geçersiz dosya formatı'}), 400
+    
+    # İş bitene (ya da devam ettirilene) kadar dosya saklanır; aynı adlı yüklemeler çakışmasın
+    filename = f"import_{secrets.token_hex(8)}_{secure_filename(file.filename)}"
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    file.save(filepath)
+    
+    try:
+        columns = read_columns(filepath)
+        missing = missing_columns(map_columns(columns))
+        if missing:
+            os.remove(filepath)
+            return jsonify({
+                'success': False,
+                'message': f'Gerekli sütunlar bulunamadı: {", ".join(missing)}\nBulunan sütunlar: {", ".join(map(str, columns))}'
+            }), 400
+        
+        job = enqueue_job('import_books_file', {'path': filepath, 'filename': file.filename})
+        return jsonify({'success': True, 'message': 'İçe aktarma kuyruğa alındı', 'job': job_to_dict(job)}), 202
+    except Exception as e:
+        db.session.rollback()
+        try:
+            os.remove(filepath)
+        except:
+            pass
+        return jsonify({'success': False, 'message': f'Dosya işleme hatası: {str(e)}'}), 400
+
 # Category Management APIs
 @app.route('/api/categories', methods=['GET'])
 def api_get_categories():
@@ -1719,14 +1642,24 @@ def api_advanced_search():
             return column.like(f"{value}%")
         return column.contains(value)
     
-    if criteria.get('title'):
-        cond = apply_match(Book.title, criteria['title'], title_match_type)
-        if cond is not None:
-            query = query.filter(cond)
-    if criteria.get('author'):
-        cond = apply_match(Book.authors, criteria['author'], author_match_type)
-        if cond is not None:
-            query = query.filter(cond)
+    # 'contains' eşleşmeleri tam metin indeksinden (varsa) alaka puanıyla gelir
+    fts_ranks = []
+    fts_fields = [
+        ('q', None, 'contains'),
+        ('title', ('title',), title_match_type),
+        ('author', ('authors',), author_match_type),
+    ]
+    for key, columns, match_type in fts_fields:
+        if not criteria.get(key):
+            continue
+        fts = match_subquery(criteria[key], columns=columns, name=f'fts_{key}') if match_type == 'contains' else None
+        if fts is not None:
+            query = query.join(fts, fts.c.isbn == Book.isbn)
+            fts_ranks.append(fts.c.rank)
+        elif key == 'title':
+            query = query.filter(apply_match(Book.title, criteria['title'], title_match_type))
+        elif key == 'author':
+            query = query.filter(apply_match(Book.authors, criteria['author'], author_match_type))
     if criteria.get('publisher'):
         query = query.filter(Book.publishers.contains(criteria['publisher']))
     if criteria.get('languages'):
@@ -1791,7 +1724,10 @@ def api_advanced_search():
         'average_rating': Book.average_rating
     }
     order_col = sort_map.get(sort_by, Book.title)
-    if sort_dir == 'asc':
+    if fts_ranks and not criteria.get('sort_by'):
+        # Açık sıralama istenmediyse BM25 alaka sırası
+        query = query.order_by(sum(fts_ranks[1:], fts_ranks[0]))
+    elif sort_dir == 'asc':
         query = query.order_by(order_col.asc())
     else:
         query = query.order_by(order_col.desc())
@@ -1812,11 +1748,11 @@ def api_advanced_search():
     scored = []
     q_title = criteria.get('title') or criteria.get('q') or ''
     for book in books:
-        borrowed_count = Transaction.query.filter_by(isbn=book.isbn, return_date=None).count()
-        available = (book.quantity or 0) - borrowed_count
+        available = book.available_count
         if available_only and available <= 0:
             continue
-        relevance = compute_relevance_score(q_title or '', book.title, book.authors, book.publishers)
+        # İndeks kullanıldıysa sıra veritabanından gelir; Python puanı yalnızca LIKE yolunda
+        relevance = 0 if fts_ranks else compute_relevance_score(q_title or '', book.title, book.authors, book.publishers)
         # ISBN tam eşleşme ek puan
         if criteria.get('isbn') and str(book.isbn).strip() == str(criteria['isbn']).strip():
             relevance += 150
@@ -1846,74 +1782,8 @@ def api_search_smart():
         if len(query_text) < 2:
             return jsonify({'suggestions': [], 'ai_suggestions': []})
 
-        suggestions = []
-
-        # Book suggestions
-        books = Book.query.filter(
-            db.or_(
-                Book.title.ilike(f"%{query_text}%"),
-                Book.authors.ilike(f"%{query_text}%"),
-                Book.isbn.contains(query_text)
-            )
-        ).limit(max_results).all()
-
-        # Optional: category name lookup per book
-        for book in books:
-            borrowed_count = Transaction.query.filter_by(isbn=book.isbn, return_date=None).count()
-            available = (book.quantity or 0) - borrowed_count
-            # Try to resolve a category name if possible
-            category_name = book.category
-            try:
-                category_obj = db.session.query(Category).join(BookCategory, Category.id == BookCategory.category_id) \
-                    .filter(BookCategory.book_isbn == book.isbn).first()
-                if category_obj:
-                    category_name = category_obj.name
-            except Exception:
-                pass
-
-            suggestions.append({
-                'type': 'book',
-                'title': book.title,
-                'authors': book.authors,
-                'isbn': book.isbn,
-                'available': available > 0,
-                'category': category_name
-            })
-
-        # Author suggestions (grouped by authors field)
-        try:
-            author_rows = db.session.query(Book.authors.label('name'), db.func.count(Book.isbn).label('book_count')) \
-                .filter(Book.authors.ilike(f"%{query_text}%")) \
-                .group_by(Book.authors) \
-                .order_by(db.text('book_count DESC')) \
-                .limit(max_results).all()
-            for row in author_rows:
-                if not row.name:
-                    continue
-                suggestions.append({
-                    'type': 'author',
-                    'name': row.name,
-                    'book_count': int(row.book_count or 0)
-                })
-        except Exception:
-            pass
-
-        # Category suggestions
-        try:
-            category_rows = db.session.query(Category.name.label('name'), db.func.count(BookCategory.book_isbn).label('book_count')) \
-                .join(BookCategory, Category.id == BookCategory.category_id) \
-                .filter(Category.name.ilike(f"%{query_text}%")) \
-                .group_by(Category.id) \
-                .order_by(db.text('book_count DESC')) \
-                .limit(max_results).all()
-            for row in category_rows:
-                suggestions.append({
-                    'type': 'category',
-                    'name': row.name,
-                    'book_count': int(row.book_count or 0)
-                })
-        except Exception:
-            pass
+        # Kitap, yazar ve kategori önerileri bellekteki önek indeksinden (DB'ye gidilmez)
+        suggestions = book_typeahead.suggest(query_text, limit=max_results)
 
         # AI suggestions (opsiyonel, şu an kapalı)
         ai_suggestions = []
@@ -1953,7 +1823,7 @@ def api_complete_book_info():
     try:
         # API'den bilgi çek
         from utils import fetch_book_info_from_api
-        book_info = fetch_book_info_from_api(isbn)
+        book_info = fetch_book_info_from_api(isbn, refresh=bool(data.get('refresh')))
         
         if not book_info:
             return jsonify({'success': False, 'message': 'ISBN için bilgi bulunamadı'}), 404
@@ -2004,33 +1874,10 @@ def api_complete_book_info():
         
         # Kapak resmi tamamla
         if (not book.image_path or book.image_path.strip() == '') and book_info.get('image_url'):
-            import requests
-            import os
-            
-            try:
-                image_filename = f"{book.isbn}.jpg"
-                image_path = os.path.join('static', 'book_covers', image_filename)
-                full_image_path = os.path.join(app.root_path, image_path)
-                
-                # Create directory if not exists
-                os.makedirs(os.path.dirname(full_image_path), exist_ok=True)
-                
-                # SSL certificate verification disabled for PyInstaller executable compatibility
-                import sys
-                if hasattr(sys, 'frozen'):
-                    # Running as PyInstaller executable
-                    response = requests.get(book_info['image_url'], verify=False, timeout=10)
-                else:
-                    # Running normally
-                    response = requests.get(book_info['image_url'], timeout=10)
-                if response.status_code == 200:
-                    with open(full_image_path, 'wb') as f:
-                        f.write(response.content)
-                    
-                    book.image_path = image_filename
-                    updated_fields.append('Kapak Resmi')
-            except Exception as e:
-                print(f"Cover download error for {isbn}: {e}")
+            downloaded = download_cover_image(book_info['image_url'], book.isbn)
+            if downloaded:
+                book.image_path = downloaded
+                updated_fields.append('Kapak Resmi')
         
         if updated_fields:
             db.session.commit()
@@ -2049,27 +1896,13 @@ def api_complete_all_books_info():
     offset = data.get('offset', 0)
     limit = 20  # Process 20 books at a time
     
+    # Tüm kataloğu sunucu tarafında işle (tarayıcı açık kalmak zorunda değil)
+    if data.get('background'):
+        return _enqueue_background_job('complete_all_info', {'refresh': bool(data.get('refresh'))})
+    
     try:
         # Get books with missing information
-        books_query = Book.query.filter(
-            db.or_(
-                Book.title == None,
-                Book.title == '',
-                Book.title == 'nan',
-                Book.authors == None,
-                Book.authors == '',
-                Book.authors == 'nan',
-                Book.publishers == None,
-                Book.publishers == '',
-                Book.publishers == 'nan',
-                Book.publish_date == None,
-                Book.publish_date == '',
-                Book.number_of_pages == None,
-                Book.number_of_pages == 0,
-                Book.image_path == None,
-                Book.image_path == ''
-            )
-        )
+        books_query = missing_info_books_query()
         
         # Get total count for progress tracking
         total_count = books_query.count()
@@ -2091,68 +1924,17 @@ def api_complete_all_books_info():
         error_count = 0
         updated_books = []
         errors = []
+        fetched = fetch_books_info_bulk([book.isbn for book in books], refresh=bool(data.get('refresh')))
         
         for book in books:
             try:
-                # Fetch book info from API
-                book_info = fetch_book_info_from_api(book.isbn)
+                book_info = fetched.get(book.isbn)
                 
                 if not book_info:
                     error_count += 1
                     continue
                 
-                updated_fields = []
-                
-                # Helper function to check if value is empty or invalid
-                def is_empty_or_invalid(value):
-                    if not value:
-                        return True
-                    if isinstance(value, str):
-                        clean_value = value.strip().lower()
-                        return clean_value == '' or clean_value == 'nan' or clean_value == 'n/a' or clean_value == 'null' or clean_value == 'none'
-                    return False
-                
-                # Update title
-                if is_empty_or_invalid(book.title) and book_info.get('title'):
-                    book.title = book_info['title']
-                    updated_fields.append('title')
-                
-                # Update authors
-                if is_empty_or_invalid(book.authors) and book_info.get('authors'):
-                    book.authors = book_info['authors']
-                    updated_fields.append('authors')
-                
-                # Update publishers
-                if is_empty_or_invalid(book.publishers) and book_info.get('publishers'):
-                    if book_info['publishers'] != 'N/A':
-                        book.publishers = book_info['publishers']
-                        updated_fields.append('publishers')
-                
-                # Update publish date
-                if is_empty_or_invalid(book.publish_date) and book_info.get('publish_date'):
-                    book.publish_date = book_info['publish_date']
-                    updated_fields.append('publish_date')
-                
-                # Update page count
-                if (not book.number_of_pages or book.number_of_pages == 0) and book_info.get('number_of_pages'):
-                    if book_info['number_of_pages'] > 0:
-                        book.number_of_pages = book_info['number_of_pages']
-                        updated_fields.append('pages')
-                
-                # Update language
-                if is_empty_or_invalid(book.languages) and book_info.get('languages'):
-                    book.languages = book_info['languages']
-                    updated_fields.append('languages')
-                
-                # Download cover image
-                if (not book.image_path or book.image_path.strip() == '') and book_info.get('image_url'):
-                    try:
-                        downloaded = download_cover_image(book_info['image_url'], book.isbn)
-                        if downloaded:
-                            book.image_path = downloaded
-                            updated_fields.append('image')
-                    except Exception:
-                        pass
+                updated_fields = fill_missing_book_info(book, book_info)
                 
                 if updated_fields:
                     success_count += 1
@@ -2220,7 +2002,7 @@ def api_fetch_book_from_isbn():
         logger = logging.getLogger(__name__)
         logger.info(f"Fetching book info for ISBN: {isbn}")
         
-        book_info = fetch_book_info_from_api(isbn)
+        book_info = fetch_book_info_from_api(isbn, refresh=bool(data.get('refresh')))
         
         if not book_info:
             logger.warning(f"No book info found for ISBN: {isbn}")
@@ -2301,10 +2083,21 @@ def api_verify_and_update_batch():
     verify_all_fields = data.get('verify_all_fields', True)  # Tüm alanları kontrol et
     include_covers = data.get('include_covers', True)
     
+    if data.get('background'):
+        # isbns boşsa tüm katalog doğrulanır
+        return _enqueue_background_job('verify_and_update', {
+            'isbns': isbns,
+            'force_update': force_update,
+            'include_covers': include_covers,
+            'refresh': bool(data.get('refresh'))
+        })
+    
     if not isbns:
         return jsonify({'success': False, 'message': 'ISBN listesi gerekli'}), 400
     
     results = []
+    # API bilgilerini paralel ön-yükle
+    fetched = fetch_books_info_bulk(isbns, refresh=bool(data.get('refresh')))
     
     for isbn in isbns:
         try:
@@ -2318,8 +2111,8 @@ def api_verify_and_update_batch():
                 })
                 continue
             
-            # API'den güncel bilgileri al
-            book_info = fetch_book_info_from_api(isbn)
+            # API'den gelen güncel bilgiler
+            book_info = fetched.get(isbn)
             
             if not book_info:
                 results.append({
@@ -2330,62 +2123,9 @@ def api_verify_and_update_batch():
                 continue
             
             # Değişiklikleri takip et
-            changes = []
-            was_updated = False
-            
-            # Helper function - değeri kontrol et ve güncelle
-            def update_field(field_name, api_value, display_name):
-                nonlocal was_updated
-                current_value = getattr(book, field_name)
-                
-                # API'den gelen değer varsa ve mevcut değerden farklıysa
-                if api_value and api_value != 'N/A':
-                    # Force update modunda VEYA alan boşsa/geçersizse güncelle
-                    should_update = False
-                    
-                    if force_update:
-                        # Zorla güncelleme modunda farklıysa güncelle
-                        if str(current_value) != str(api_value):
-                            should_update = True
-                    else:
-                        # Normal modda sadece boş/geçersiz alanları güncelle
-                        if not current_value or str(current_value).strip().lower() in ['', 'nan', 'n/a', 'null', 'none']:
-                            should_update = True
-                    
-                    if should_update:
-                        setattr(book, field_name, api_value)
-                        changes.append(f"{display_name}: {current_value} → {api_value}")
-                        was_updated = True
-            
-            # TÜM ALANLARI KONTROL ET VE GÜNCELLE
-            update_field('title', book_info.get('title'), 'Başlık')
-            update_field('authors', book_info.get('authors'), 'Yazarlar')
-            update_field('publishers', book_info.get('publishers'), 'Yayınevi')
-            update_field('publish_date', book_info.get('publish_date'), 'Yayın Tarihi')
-            update_field('languages', book_info.get('languages'), 'Diller')
-            
-            # Sayfa sayısı özel kontrolü
-            api_pages = book_info.get('number_of_pages', 0)
-            if api_pages and api_pages > 0:
-                if force_update or not book.number_of_pages or book.number_of_pages == 0:
-                    if book.number_of_pages != api_pages:
-                        old_pages = book.number_of_pages
-                        book.number_of_pages = api_pages
-                        changes.append(f"Sayfa Sayısı: {old_pages} → {api_pages}")
-                        was_updated = True
-            
-            # Kapak resmi güncelleme
-            if include_covers and book_info.get('image_url'):
-                if force_update or not book.image_path or book.image_path.strip() == '':
-                    try:
-                        downloaded = download_cover_image(book_info['image_url'], isbn)
-                        if downloaded:
-                            old_image = book.image_path
-                            book.image_path = downloaded
-                            changes.append(f"Kapak resmi güncellendi")
-                            was_updated = True
-                    except Exception as img_error:
-                        print(f"Kapak indirme hatası {isbn}: {img_error}")
+            changes = verify_and_update_book(book, book_info, force_update=force_update,
+                                             include_covers=include_covers)
+            was_updated = bool(changes)
             
             # Sonuçları kaydet
             if was_updated:
@@ -2448,7 +2188,7 @@ def api_shelf_map():
         books_data = []
         for book in books:
             # Kapak yolunu normalize et
-            image_url = normalize_cover_url(book.image_path) if book.image_path else '/static/img/no_cover.png'
+            image_url = normalize_cover_url(book.image_path, size='list') if book.image_path else '/static/img/no_cover.png'
             
             books_data.append({
                 'title': book.title,
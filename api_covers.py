@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kapak görsellerinin sunumu
+
+/covers/<parmak izi>/<dosya> adresi içerik özetini taşıdığından yanıt bir
+yıl "immutable" olarak önbelleklenir; kiosk ve mobil istemciler kapakları
+5 dakikada bir yeniden doğrulamaz. Accept başlığı AVIF/WebP kabul ediyorsa
+ilgili kodlama (ilk istekte üretilip diskte saklanır) döner. If-None-Match
+ile gelen isteklere 304 verilir.
+"""
+
+import os
+
+from flask import request, send_file, abort, redirect, make_response
+
+from config import app
+from cover_store import (cover_dir, cover_fingerprint, available_variant_formats, variant_path,
+                         VARIANT_FORMATS)
+
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+ORIGINAL_MIMETYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
+                      '.webp': 'image/webp', '.gif': 'image/gif'}
+
+
+def _negotiate_format():
+    """Accept başlığına göre en uygun kodlama; None = orijinal
+
+    Yalnızca açıkça listelenen türler sayılır: '*/*' ve 'image/*' AVIF/WebP
+    çözebildiğini göstermez (yanıt bir yıl önbelleğe alınır).
+    """
+    accepted = list(request.accept_mimetypes)
+    for fmt in available_variant_formats():
+        mime = VARIANT_FORMATS[fmt][1]
+        if any(value == mime and quality > 0 for value, quality in accepted):
+            return fmt
+    return None
+
+
+@app.route('/covers/<fingerprint>/<filename>')
+def serve_cover(fingerprint, filename):
+    """Parmak izli kapak; eski parmak izi güncel adrese yönlendirilir"""
+    if filename != os.path.basename(filename) or filename.startswith('.'):
+        abort(404)
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ORIGINAL_MIMETYPES:
+        abort(404)
+
+    current = cover_fingerprint(filename)
+    if not current:
+        abort(404)
+    if current != fingerprint:
+        # Dosya değişmiş (ör. eski {isbn}.jpg yeniden yüklendi): güncel adrese
+        return redirect(f"/covers/{current}/{filename}", code=302)
+
+    fmt = _negotiate_format()
+    path = variant_path(filename, fmt, current) if fmt else None
+    if path is None:
+        fmt = None
+        path = os.path.join(cover_dir(), filename)
+    etag = f"{current}-{fmt or 'orig'}"
+
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        mimetype = VARIANT_FORMATS[fmt][1] if fmt else ORIGINAL_MIMETYPES[ext]
+        response = send_file(path, mimetype=mimetype, etag=False, conditional=False)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    response.vary.add('Accept')
+    return response
@@ -6,6 +6,7 @@ import tempfile
 import os
 import json
 import secrets
+import pandas as pd  # Excel işlemleri için gerekli
 from io import BytesIO
 # from logging_system import library_logger, log_performance  # Removed - module doesn't exist
 from reportlab.pdfgen import canvas
@@ -21,15 +22,21 @@ from config import app, get_setting
 from models import db, User, Book, Member, Transaction, Category, BookCategory, Notification, SearchHistory, Review, Reservation, Fine, ActivityLog, Settings, EmailTemplate, OnlineBorrowRequest, QRCode, KioskRequest
 from utils import (log_activity, send_email, add_notification, generate_qr_code, 
                    save_qr_code, process_borrow_transaction, process_return_transaction,
-                   generate_books_qr_pdf, generate_members_qr_pdf, export_to_excel,
+                   generate_books_qr_pdf, generate_members_qr_pdf,
                    process_online_borrow_request, approve_online_borrow_request,
                    reject_online_borrow_request, get_inventory_summary, get_member_statistics,
                    quick_search_books, quick_search_members, generate_user_qr, verify_qr_code, use_qr_code,
-                   generate_books_list_pdf, generate_members_list_pdf, generate_transactions_list_pdf,
                    normalize_cover_url, fuzzy_match_books, fuzzy_match_members, 
                    merge_duplicate_books, merge_duplicate_members, generate_shelf_map_pdf, 
-                   generate_label_templates_pdf)
+                   generate_label_templates_pdf, reconcile_book_availability, send_temp_file)
 from routes import role_required
+from provider_client import provider_client
+from report_engine import write_list_report, REPORTS
+import report_cache
+from settings_cache import invalidate_settings
+from shared_cache import result_cache
+from export_engine import export_response
+import analytics_export
 
 # Notifications API
 @app.route('/api/notifications')
@@ -161,6 +168,8 @@ def api_update_settings():
             db.session.add(setting)
     
     db.session.commit()
+    # Diğer worker'lar 'settings' sürüm sayacından görür
+    invalidate_settings()
     log_activity('update_settings', 'System settings updated')
     
     return jsonify({'success': True, 'message': 'Ayarlar güncellendi'})
@@ -386,9 +395,11 @@ def api_delete_backup(filename):
 # Export/Import Additional APIs
 @app.route('/api/export/members', methods=['GET'])
 def api_export_members():
-    """Export members to Excel"""
-    # Excel export temporarily disabled - pandas dependency removed
-    return jsonify({'success': False, 'message': 'Excel export özelliği geçici olarak devre dışı'}), 501
+    """Export members to Excel/CSV - akışlı (?format=csv&type=&class=&date_from=&date_to=)"""
+    try:
+        return export_response('members', request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
 
 @app.route('/api/import/members', methods=['POST'])
 # @log_performance  # Removed - decorator doesn't exist
@@ -485,90 +496,177 @@ def api_system_stats():
         'stats': stats
     })
 
+@app.route('/api/admin/reconcile-availability', methods=['POST'])
+# Authentication removed for EXE compatibility
+def api_reconcile_availability():
+    """Kitapların ödünç sayaçlarını (borrowed_count) işlemlerden yeniden hesapla"""
+    try:
+        result = reconcile_book_availability()
+        log_activity('reconcile_availability', f"{result['fixed']} kitabın ödünç sayacı düzeltildi")
+        return jsonify({
+            'success': True,
+            'message': f"{result['checked']} kitap kontrol edildi, {result['fixed']} sayaç düzeltildi",
+            'checked': result['checked'],
+            'fixed': result['fixed']
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Sayaç onarım hatası: {str(e)}'}), 500
+
+@app.route('/api/admin/provider-metrics', methods=['GET'])
+# Authentication removed for EXE compatibility
+def api_provider_metrics():
+    """Kitap bilgisi/kapak sağlayıcıları için çağrı, hata, gecikme ve devre durumu (bu süreç)"""
+    return jsonify({
+        'success': True,
+        'providers': provider_client.metrics()
+    })
+
+@app.route('/api/admin/report-cache', methods=['GET', 'DELETE'])
+# Authentication removed for EXE compatibility
+def api_report_cache():
+    """Rapor önbelleği istatistikleri; DELETE ile önbelleği temizle"""
+    if request.method == 'DELETE':
+        report_cache.clear()
+        return jsonify({'success': True, 'message': 'Rapor önbelleği temizlendi'})
+    return jsonify({'success': True, 'cache': report_cache.stats()})
+
+@app.route('/api/admin/result-cache', methods=['GET', 'DELETE'])
+# Authentication removed for EXE compatibility
+def api_result_cache():
+    """Paylaşılan sonuç önbelleği (cache_with_ttl) istatistikleri; DELETE ile (?tag= verilirse yalnızca o etiketi) temizle"""
+    if request.method == 'DELETE':
+        tag = request.args.get('tag')
+        if tag:
+            removed = result_cache.invalidate_tags(tag)
+            return jsonify({'success': True, 'message': f'{removed} kayıt silindi'})
+        result_cache.clear()
+        return jsonify({'success': True, 'message': 'Önbellek temizlendi'})
+    return jsonify({'success': True, 'cache': result_cache.stats()})
+
 @app.route('/api/export/transactions', methods=['GET'])
 def api_export_transactions():
-    """Export transactions to Excel"""
-    # Excel export temporarily disabled - pandas dependency removed
-    return jsonify({'success': False, 'message': 'Excel export özelliği geçici olarak devre dışı'}), 501
+    """Export transactions to Excel/CSV - akışlı (?format=csv&status=active|returned|overdue&date_from=&date_to=)"""
+    try:
+        return export_response('transactions', request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+@app.route('/api/export/snapshot', methods=['GET'])
+# Authentication removed for EXE compatibility
+def api_export_snapshot():
+    """Analiz için tüm tabloların tutarlı Parquet/Arrow anlık görüntüsü (ZIP, ?format=parquet|arrow)"""
+    if not analytics_export.available():
+        return jsonify({'success': False, 'message': 'Parquet dışa aktarma için pyarrow kurulu değil'}), 501
+    file_format = request.args.get('format', 'parquet')
+    if file_format not in analytics_export.SNAPSHOT_FORMATS:
+        return jsonify({'success': False, 'message': 'Geçersiz biçim (parquet ya da arrow)'}), 400
+    try:
+        path, download_name = analytics_export.build_snapshot_zip(file_format)
+        return send_temp_file(path, download_name, 'application/zip')
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Anlık görüntü oluşturulamadı: {str(e)}'}), 500
 
 # Bulk QR and PDF generation APIs
+# Çıktılar report_cache ile (tür, parametreler, veri sürümü) anahtarlı diskte saklanır;
+# veri değişmediyse tekrar indirmede yeniden üretilmez.
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def _selected_keys(field):
+    """POST form alanındaki JSON listesi (yoksa None = hepsi); önbellek anahtarı için sıralı"""
+    if request.method == 'POST' and request.form.get(field):
+        return sorted(json.loads(request.form.get(field)), key=str)
+    return None
+
 @app.route('/api/members/qr-bulk')
 # Authentication removed for EXE compatibility
 def api_members_qr_bulk():
-    members = Member.query.all()
-    buffer = generate_members_qr_pdf(members)
-    return send_file(buffer, as_attachment=True, download_name='uyeler_qr.pdf', mimetype='application/pdf')
+    def build(target):
+        # Etiket için yalnızca gereken sütunlar
+        members = Member.query.options(db.load_only(Member.id, Member.ad_soyad, Member.numara)).all()
+        report_cache.write_buffer(generate_members_qr_pdf(members), target)
+    
+    path = report_cache.cached_report('members_qr', {}, '.pdf', build)
+    return send_file(path, as_attachment=True, download_name='uyeler_qr.pdf', mimetype='application/pdf')
 
 @app.route('/api/books/qr-bulk', methods=['GET', 'POST'])
 # Authentication removed for EXE compatibility
 def api_books_qr_bulk():
-    if request.method == 'POST':
-        isbns = request.form.get('isbns')
+    isbns = _selected_keys('isbns')
+    
+    def build(target):
+        # Etiket için yalnızca gereken sütunlar
+        query = Book.query.options(db.load_only(Book.isbn, Book.title))
         if isbns:
-            isbns = json.loads(isbns)
-            books = Book.query.filter(Book.isbn.in_(isbns)).all()
-        else:
-            books = Book.query.all()
-    else:
-        books = Book.query.all()
+            query = query.filter(Book.isbn.in_(isbns))
+        report_cache.write_buffer(generate_books_qr_pdf(query.all()), target)
     
-    buffer = generate_books_qr_pdf(books)
-    return send_file(buffer, as_attachment=True, download_name='kitaplar_qr.pdf', mimetype='application/pdf')
+    path = report_cache.cached_report('books_qr', {'isbns': isbns}, '.pdf', build)
+    return send_file(path, as_attachment=True, download_name='kitaplar_qr.pdf', mimetype='application/pdf')
 
 @app.route('/api/books/pdf-bulk', methods=['GET', 'POST'])
 # Authentication removed for EXE compatibility
 def api_books_pdf_bulk():
-    if request.method == 'POST':
-        isbns = request.form.get('isbns')
-        if isbns:
-            isbns = json.loads(isbns)
-            books = Book.query.filter(Book.isbn.in_(isbns)).all()
-        else:
-            books = Book.query.all()
-    else:
-        books = Book.query.all()
-    
-    data = []
-    for book in books:
-        borrowed = Transaction.query.filter_by(isbn=book.isbn, return_date=None).count()
-        data.append({
-            'ISBN': book.isbn,
-            'Kitap Adı': book.title,
-            'Yazar': book.authors,
-            'Yayınevi': book.publishers,
-            'Mevcut/Toplam': f"{book.quantity - borrowed}/{book.quantity}"
-        })
+    isbns = _selected_keys('isbns')
     
-    temp_file = export_to_excel(data, 'Kitaplar')
-    return send_file(temp_file, as_attachment=True, download_name='kitaplar_liste.xlsx', 
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    def build(target):
+        query = Book.query
+        if isbns:
+            query = query.filter(Book.isbn.in_(isbns))
+        data = []
+        for book in query.all():
+            borrowed = book.borrowed_count or 0
+            data.append({
+                'ISBN': book.isbn,
+                'Kitap Adı': book.title,
+                'Yazar': book.authors,
+                'Yayınevi': book.publishers,
+                'Mevcut/Toplam': f"{book.quantity - borrowed}/{book.quantity}"
+            })
+        pd.DataFrame(data).to_excel(target, sheet_name='Kitaplar', index=False)
+    
+    path = report_cache.cached_report('books_list_xlsx', {'isbns': isbns}, '.xlsx', build)
+    return send_file(path, as_attachment=True, download_name='kitaplar_liste.xlsx', mimetype=XLSX_MIMETYPE)
 
 @app.route('/api/members/pdf-bulk', methods=['GET', 'POST'])
 # Authentication removed for EXE compatibility
 def api_members_pdf_bulk():
-    if request.method == 'POST':
-        ids = request.form.get('ids')
+    ids = _selected_keys('ids')
+    
+    def build(target):
+        query = Member.query
         if ids:
-            ids = json.loads(ids)
-            members = Member.query.filter(Member.id.in_(ids)).all()
-        else:
-            members = Member.query.all()
-    else:
-        members = Member.query.all()
-    
-    data = []
-    for m in members:
-        data.append({
-            'Ad Soyad': m.ad_soyad,
-            'Numara': m.numara,
-            'Sınıf': m.sinif,
-            'E-posta': m.email,
-            'Üye Türü': m.uye_turu
-        })
+            query = query.filter(Member.id.in_(ids))
+        data = []
+        for m in query.all():
+            data.append({
+                'Ad Soyad': m.ad_soyad,
+                'Numara': m.numara,
+                'Sınıf': m.sinif,
+                'E-posta': m.email,
+                'Üye Türü': m.uye_turu
+            })
+        pd.DataFrame(data).to_excel(target, sheet_name='Üyeler', index=False)
+    
+    path = report_cache.cached_report('members_list_xlsx', {'ids': ids}, '.xlsx', build)
+    return send_file(path, as_attachment=True, download_name='uyeler_liste.xlsx', mimetype=XLSX_MIMETYPE)
+
+@app.route('/api/books/list-pdf', methods=['GET'], defaults={'report_type': 'books'})
+@app.route('/api/members/list-pdf', methods=['GET'], defaults={'report_type': 'members'})
+@app.route('/api/transactions/list-pdf', methods=['GET'], defaults={'report_type': 'transactions'})
+# Authentication removed for EXE compatibility
+def api_list_report_pdf(report_type):
+    """Kitap/üye/işlem listesi PDF'i; satırlar veritabanından akışlı okunur, sonuç önbellekten gönderilir"""
+    try:
+        path = report_cache.cached_report(f'list_{report_type}', {}, '.pdf',
+                                          lambda target: write_list_report(report_type, target))
+    except Exception as e:
+        # Liste sayfaları hata metnini 'error' alanından okur
+        message = f'Rapor oluşturma hatası: {str(e)}'
+        return jsonify({'success': False, 'message': message, 'error': message}), 500
     
-    temp_file = export_to_excel(data, 'Üyeler')
-    return send_file(temp_file, as_attachment=True, download_name='uyeler_liste.xlsx', 
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return send_file(path, as_attachment=True, download_name=REPORTS[report_type]['filename'],
+                     mimetype='application/pdf')
 
 # Inventory APIs
 @app.route('/api/inventory/summary')
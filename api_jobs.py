@@ -0,0 +1,66 @@
+from flask import request, jsonify
+from flask_login import current_user
+
+from config import app
+from models import db, BackgroundJob
+from background_jobs import JOB_HANDLERS, enqueue_job, cancel_job, resume_job, job_to_dict
+
+# Background Jobs API
+@app.route('/api/jobs', methods=['GET'])
+def api_list_jobs():
+    """Son arka plan işlerini listele (?status=running&limit=20)"""
+    query = BackgroundJob.query
+    status = request.args.get('status')
+    if status:
+        query = query.filter(BackgroundJob.status == status)
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    jobs = query.order_by(BackgroundJob.id.desc()).limit(limit).all()
+    return jsonify({'success': True, 'jobs': [job_to_dict(job) for job in jobs]})
+
+@app.route('/api/jobs', methods=['POST'])
+def api_create_job():
+    """Yeni arka plan işi başlat: {"type": "complete_all_info", "params": {...}}"""
+    data = request.json or {}
+    job_type = data.get('type')
+    if job_type not in JOB_HANDLERS:
+        return jsonify({
+            'success': False,
+            'message': f'Geçersiz iş türü. Geçerli türler: {", ".join(sorted(JOB_HANDLERS))}'
+        }), 400
+
+    try:
+        created_by = current_user.id if current_user.is_authenticated else None
+        job = enqueue_job(job_type, data.get('params') or {}, created_by=created_by)
+        return jsonify({'success': True, 'message': 'İş kuyruğa alındı', 'job': job_to_dict(job)}), 202
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'İş oluşturulamadı: {str(e)}'}), 500
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def api_get_job(job_id):
+    """İş durumu ve ilerlemesi"""
+    job = db.session.get(BackgroundJob, job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'İş bulunamadı'}), 404
+    return jsonify({'success': True, 'job': job_to_dict(job)})
+
+@app.route('/api/jobs/<int:job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    """İşi iptal et (çalışan iş mevcut partiyi bitirip durur)"""
+    job = db.session.get(BackgroundJob, job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'İş bulunamadı'}), 404
+    if job.status not in ('pending', 'running'):
+        return jsonify({'success': False, 'message': f'İş zaten {job.status} durumunda'}), 400
+    cancel_job(job)
+    return jsonify({'success': True, 'message': 'İptal isteği alındı', 'job': job_to_dict(job)})
+
+@app.route('/api/jobs/<int:job_id>/resume', methods=['POST'])
+def api_resume_job(job_id):
+    """İptal edilen ya da hata veren işi kaldığı yerden devam ettir"""
+    job = db.session.get(BackgroundJob, job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'İş bulunamadı'}), 404
+    if not resume_job(job):
+        return jsonify({'success': False, 'message': 'Yalnızca iptal edilen ya da hata veren işler devam ettirilebilir'}), 400
+    return jsonify({'success': True, 'message': 'İş kaldığı yerden devam edecek', 'job': job_to_dict(job)})
@@ -2,6 +2,7 @@ from flask import request, jsonify
 from flask_login import login_required, current_user
 from datetime import datetime
 from models import db, User, Book, Member, Transaction, KioskRequest
+from transaction_dates import format_datetime, days_between
 from utils import log_activity, add_notification, process_borrow_transaction, process_return_transaction, get_setting
 from routes import role_required
 from uuid import uuid4
@@ -231,8 +232,7 @@ def register_kiosk_routes(app):
                 return jsonify({'success': False, 'message': 'Üye bulunamadı'}), 404
             
             # Kitap müsaitlik kontrolü
-            borrowed_count = Transaction.query.filter_by(isbn=isbn, return_date=None).count()
-            if book.quantity <= borrowed_count:
+            if book.available_count <= 0:
                 return jsonify({'success': False, 'message': 'Kitap şu anda mevcut değil'}), 400
             
             # Zaten bir talebi var mı kontrol et
@@ -397,7 +397,7 @@ def register_kiosk_routes(app):
                     send_email(member.email, 'book_returned', {
                         'member_name': member.ad_soyad,
                         'book_title': book.title,
-                        'return_date': active_transaction.return_date,
+                        'return_date': format_datetime(active_transaction.return_date),
                         'fine_amount': 0,  # Ceza bilgisi process_return_transaction içinde hesaplanır
                         'days_overdue': 0
                     })
@@ -405,7 +405,7 @@ def register_kiosk_routes(app):
                 return jsonify({
                     'success': True,
                     'message': 'Kitap başarıyla iade edildi',
-                    'return_date': active_transaction.return_date
+                    'return_date': format_datetime(active_transaction.return_date)
                 })
             else:
                 return jsonify(result), 400
@@ -421,42 +421,23 @@ def register_kiosk_routes(app):
             if not member:
                 return jsonify({'success': False, 'message': 'Üye bulunamadı'}), 404
             
-            active_transactions = Transaction.query.filter_by(member_id=member_id, return_date=None).all()
+            # Kalan gün SQL'de hesaplanır
+            active_transactions = db.session.query(
+                Transaction, days_between(datetime.now(), Transaction.due_date).label('days_remaining')
+            ).filter(Transaction.member_id == member_id, Transaction.return_date.is_(None)).all()
             
             active_books = []
-            for transaction in active_transactions:
-                # Convert dates
-                # due_date
-                if isinstance(transaction.due_date, str):
-                    try:
-                        due_date_dt = datetime.strptime(transaction.due_date, '%Y-%m-%d').date()
-                    except Exception:
-                        due_date_dt = datetime.utcnow().date()
-                else:
-                    try:
-                        due_date_dt = transaction.due_date
-                        if hasattr(due_date_dt, 'date'):
-                            due_date_dt = due_date_dt.date()
-                    except Exception:
-                        due_date_dt = datetime.utcnow().date()
-                
-                # borrow_date
-                if isinstance(transaction.borrow_date, str):
-                    try:
-                        borrow_date_dt = datetime.strptime(transaction.borrow_date, '%Y-%m-%d')
-                    except Exception:
-                        borrow_date_dt = datetime.utcnow()
-                else:
-                    borrow_date_dt = transaction.borrow_date or datetime.utcnow()
-                
-                days_remaining = (due_date_dt - datetime.utcnow().date()).days
+            for transaction, days_remaining in active_transactions:
+                days_remaining = days_remaining or 0
                 is_overdue = days_remaining < 0
+                borrow_date_dt = transaction.borrow_date or datetime.now()
+                due_date_dt = transaction.due_date or datetime.now()
                 
                 book = transaction.book
                 if book:
                     try:
                         from utils import normalize_cover_url
-                        cover_path = normalize_cover_url(book.image_path)
+                        cover_path = normalize_cover_url(book.image_path, size='kiosk')
                     except Exception:
                         cover_path = '/static/img/no_cover.png'
                 else:
@@ -28,6 +28,8 @@ from routes import *
 # Import all API endpoints
 from api import *
 from api_extended import *
+from api_jobs import *
+from api_covers import *
 
 # Kiosk routes (optional)
 try:
@@ -37,6 +39,25 @@ try:
 except ImportError:
     print("⚠️ Kiosk routes not available")
 
+# Bellekteki arama indekslerini açılışta kur (ilk aramalar beklemesin)
+try:
+    from fuzzy_index import book_fuzzy_index
+    from typeahead import book_typeahead
+    with app.app_context():
+        book_fuzzy_index.rebuild()
+        book_typeahead.rebuild()
+    print("✅ Arama indeksleri hazır!")
+except Exception as e:
+    print(f"⚠️ Arama indeksleri kurulamadı: {e}")
+
+# Arka plan iş kuyruğu (bu süreçte bir worker thread)
+try:
+    from background_jobs import start_job_worker
+    if start_job_worker():
+        print("✅ Arka plan iş worker'ı başlatıldı!")
+except Exception as e:
+    print(f"⚠️ Arka plan iş worker'ı başlatılamadı: {e}")
+
 # Clear database API endpoint
 try:
     from api_clear_database import clear_db_bp
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Uzun süren katalog işleri için arka plan iş kuyruğu
+
+İşler background_jobs tablosunda tutulur; harici servis (Celery/Redis)
+gerekmez. Her uygulama süreci bir worker thread'i çalıştırır ve bekleyen
+işleri atomik UPDATE ile sahiplenir, böylece birden fazla gunicorn
+worker'ı aynı işi iki kez almaz.
+
+İş işleyicileri her partiden sonra ctx.report() çağırır: ilerleme,
+checkpoint ve partinin veri değişiklikleri aynı commit'te yazılır. Süreç
+ölürse (heartbeat eskirse) iş tekrar 'pending' olur ve checkpoint'ten
+devam eder. İptal istekleri bir sonraki report() çağrısında uygulanır.
+"""
+
+import json
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from config import app
+from models import db, Book, BackgroundJob
+
+
+app.config.setdefault('BACKGROUND_JOBS_ENABLED', True)
+app.config.setdefault('BACKGROUND_JOBS_POLL_INTERVAL', 2)
+# Bu süre boyunca heartbeat gelmeyen 'running' iş sahipsiz sayılır ve yeniden kuyruğa alınır
+app.config.setdefault('BACKGROUND_JOBS_STALE_AFTER', 300)
+app.config.setdefault('BACKGROUND_JOBS_BATCH_SIZE', 20)
+
+JOB_HANDLERS = {}
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job_handler(job_type):
+    """İş türü için işleyici kaydet: handler(ctx)"""
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+def _loads(value, default=None):
+    return json.loads(value) if value else default
+
+
+def job_to_dict(job):
+    total = job.progress_total
+    return {
+        'id': job.id,
+        'type': job.job_type,
+        'status': job.status,
+        'params': _loads(job.params, {}),
+        'result': _loads(job.result, {}),
+        'error': job.error,
+        'progress': {
+            'current': job.progress_current or 0,
+            'total': total,
+            'percent': round((job.progress_current or 0) * 100 / total, 1) if total else None
+        },
+        'cancel_requested': bool(job.cancel_requested),
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S') if job.created_at else None,
+        'started_at': job.started_at.strftime('%Y-%m-%d %H:%M:%S') if job.started_at else None,
+        'finished_at': job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.finished_at else None
+    }
+
+
+def enqueue_job(job_type, params=None, created_by=None):
+    """Yeni iş oluştur (commit eder) ve worker'ı uyandır"""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f'Bilinmeyen iş türü: {job_type}')
+    job = BackgroundJob(job_type=job_type, params=json.dumps(params or {}, ensure_ascii=False),
+                        status='pending', created_by=created_by)
+    db.session.add(job)
+    db.session.commit()
+    if _worker is not None:
+        _worker.wake()
+    return job
+
+
+def cancel_job(job):
+    """Bekleyen işi hemen, çalışan işi bir sonraki checkpoint'te iptal et"""
+    if job.status == 'pending':
+        job.status = 'cancelled'
+        job.finished_at = datetime.utcnow()
+    elif job.status == 'running':
+        job.cancel_requested = True
+    db.session.commit()
+
+
+def resume_job(job):
+    """İptal edilen ya da hata veren işi checkpoint'ten devam etmek üzere kuyruğa al"""
+    if job.status not in ('cancelled', 'failed'):
+        return False
+    job.status = 'pending'
+    job.cancel_requested = False
+    job.error = None
+    job.finished_at = None
+    db.session.commit()
+    if _worker is not None:
+        _worker.wake()
+    return True
+
+
+class JobContext:
+    """İşleyiciye verilen bağlam: parametreler, checkpoint ve ilerleme bildirimi"""
+
+    def __init__(self, job):
+        self.job_id = job.id
+        self.params = _loads(job.params, {})
+        self.checkpoint = _loads(job.checkpoint, {})
+        self.result = _loads(job.result, {})
+
+    def report(self, current=None, total=None, checkpoint=None, result=None):
+        """İlerlemeyi ve checkpoint'i, bekleyen veri değişiklikleriyle birlikte commit et.
+
+        İptal istenmişse JobCancelled fırlatır (bu partinin işi kaydedilmiş olur).
+        """
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        if result is not None:
+            self.result = result
+        job = db.session.get(BackgroundJob, self.job_id)
+        if current is not None:
+            job.progress_current = current
+        if total is not None:
+            job.progress_total = total
+        job.checkpoint = json.dumps(self.checkpoint, ensure_ascii=False)
+        job.result = json.dumps(self.result, ensure_ascii=False)
+        job.heartbeat_at = datetime.utcnow()
+        db.session.commit()
+        # Başka süreçten gelen iptal isteğini görmek için tazele
+        db.session.refresh(job)
+        if job.cancel_requested:
+            raise JobCancelled()
+
+
+class JobWorker(threading.Thread):
+    """Bekleyen işleri sırayla çalıştıran daemon thread"""
+
+    def __init__(self):
+        super().__init__(name='background-jobs', daemon=True)
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._wake = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def run(self):
+        while True:
+            try:
+                with app.app_context():
+                    self._requeue_stale()
+                    job_id = self._claim_next()
+                    if job_id is not None:
+                        self._execute(job_id)
+                        continue
+            except Exception as e:
+                print(f"⚠️ Arka plan iş döngüsü hatası: {e}")
+            self._wake.wait(app.config['BACKGROUND_JOBS_POLL_INTERVAL'])
+            self._wake.clear()
+
+    def _requeue_stale(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=app.config['BACKGROUND_JOBS_STALE_AFTER'])
+        requeued = BackgroundJob.query.filter(
+            BackgroundJob.status == 'running',
+            BackgroundJob.heartbeat_at < cutoff
+        ).update({BackgroundJob.status: 'pending', BackgroundJob.worker_id: None}, synchronize_session=False)
+        db.session.commit()
+        if requeued:
+            print(f"🔁 {requeued} sahipsiz arka plan işi yeniden kuyruğa alındı")
+
+    def _claim_next(self):
+        candidates = [row.id for row in BackgroundJob.query.with_entities(BackgroundJob.id)
+                      .filter(BackgroundJob.status == 'pending')
+                      .order_by(BackgroundJob.id).limit(5)]
+        now = datetime.utcnow()
+        for job_id in candidates:
+            claimed = BackgroundJob.query.filter(
+                BackgroundJob.id == job_id,
+                BackgroundJob.status == 'pending'
+            ).update({
+                BackgroundJob.status: 'running',
+                BackgroundJob.worker_id: self.worker_id,
+                BackgroundJob.started_at: db.func.coalesce(BackgroundJob.started_at, now),
+                BackgroundJob.heartbeat_at: now
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return job_id
+        return None
+
+    def _execute(self, job_id):
+        job = db.session.get(BackgroundJob, job_id)
+        handler = JOB_HANDLERS.get(job.job_type)
+        ctx = JobContext(job)
+        print(f"▶️ Arka plan işi başladı: #{job_id} {job.job_type}")
+        try:
+            if handler is None:
+                raise ValueError(f'Bilinmeyen iş türü: {job.job_type}')
+            handler(ctx)
+            status, error = 'completed', None
+        except JobCancelled:
+            status, error = 'cancelled', None
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            status, error = 'failed', str(e)
+        db.session.rollback()
+
+        job = db.session.get(BackgroundJob, job_id)
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        job.result = json.dumps(ctx.result, ensure_ascii=False)
+        db.session.commit()
+        print(f"⏹️ Arka plan işi bitti: #{job_id} {status}")
+
+
+def start_job_worker():
+    """Bu süreç için worker thread'ini (bir kez) başlat"""
+    global _worker
+    if not app.config['BACKGROUND_JOBS_ENABLED']:
+        return None
+    with _worker_lock:
+        if _worker is None:
+            _worker = JobWorker()
+            _worker.start()
+    return _worker
+
+
+# --- İş işleyicileri ---
+
+def _process_books_in_batches(ctx, query, process_batch):
+    """Kitapları ISBN sırasıyla partiler halinde işle; checkpoint son işlenen ISBN'dir"""
+    batch_size = app.config['BACKGROUND_JOBS_BATCH_SIZE']
+    last_isbn = ctx.checkpoint.get('last_isbn')
+    processed = ctx.checkpoint.get('processed', 0)
+    total = processed + query.filter(Book.isbn > last_isbn).count() if last_isbn else query.count()
+    ctx.report(current=processed, total=total)
+
+    while True:
+        batch_query = query.order_by(Book.isbn)
+        if last_isbn:
+            batch_query = batch_query.filter(Book.isbn > last_isbn)
+        books = batch_query.limit(batch_size).all()
+        if not books:
+            break
+        process_batch(books)
+        last_isbn = books[-1].isbn
+        processed += len(books)
+        ctx.report(current=processed, checkpoint={'last_isbn': last_isbn, 'processed': processed},
+                   result=ctx.result)
+
+
+def _count(ctx, key, amount=1):
+    ctx.result[key] = ctx.result.get(key, 0) + amount
+
+
+@job_handler('complete_all_info')
+def complete_all_info_job(ctx):
+    """Eksik bilgili tüm kitapları API'den tamamla (api_complete_all_books_info'nun sunucu tarafı hali)"""
+    from utils import fetch_books_info_bulk, missing_info_books_query, fill_missing_book_info
+    refresh = bool(ctx.params.get('refresh'))
+
+    def process_batch(books):
+        fetched = fetch_books_info_bulk([book.isbn for book in books], refresh=refresh)
+        for book in books:
+            book_info = fetched.get(book.isbn)
+            if not book_info:
+                _count(ctx, 'errors')
+                continue
+            try:
+                if fill_missing_book_info(book, book_info):
+                    _count(ctx, 'updated')
+            except Exception as e:
+                _count(ctx, 'errors')
+                print(f"Bilgi tamamlama hatası {book.isbn}: {e}")
+
+    _process_books_in_batches(ctx, missing_info_books_query(), process_batch)
+
+
+@job_handler('verify_and_update')
+def verify_and_update_job(ctx):
+    """Kitap bilgilerini API ile doğrula/güncelle; isbns verilmezse tüm katalog"""
+    from utils import fetch_books_info_bulk, verify_and_update_book
+    force_update = ctx.params.get('force_update', True)
+    include_covers = ctx.params.get('include_covers', True)
+    refresh = bool(ctx.params.get('refresh'))
+    query = Book.query
+    if ctx.params.get('isbns'):
+        query = query.filter(Book.isbn.in_(ctx.params['isbns']))
+
+    def process_batch(books):
+        fetched = fetch_books_info_bulk([book.isbn for book in books], refresh=refresh)
+        for book in books:
+            book_info = fetched.get(book.isbn)
+            if not book_info:
+                _count(ctx, 'errors')
+                continue
+            try:
+                if verify_and_update_book(book, book_info, force_update=force_update,
+                                          include_covers=include_covers):
+                    _count(ctx, 'updated')
+                else:
+                    _count(ctx, 'verified')
+            except Exception as e:
+                _count(ctx, 'errors')
+                print(f"Doğrulama hatası {book.isbn}: {e}")
+
+    _process_books_in_batches(ctx, query, process_batch)
+
+
+@job_handler('download_missing_covers')
+def download_missing_covers_job(ctx):
+    """Kapağı olmayan tüm kitaplar için kapak indir (20 kitap sınırı olmadan)"""
+    from utils import fetch_books_info_bulk, download_cover_images
+    refresh = bool(ctx.params.get('refresh'))
+    query = Book.query.filter(db.or_(Book.image_path.is_(None), Book.image_path == ''))
+
+    def process_batch(books):
+        fetched = fetch_books_info_bulk([book.isbn for book in books], refresh=refresh)
+        urls = {book.isbn: (fetched.get(book.isbn) or {}).get('image_url') for book in books}
+        downloaded = download_cover_images(urls)
+        for book in books:
+            if not urls[book.isbn]:
+                _count(ctx, 'not_found')
+            elif downloaded.get(book.isbn):
+                book.image_path = downloaded[book.isbn]
+                _count(ctx, 'downloaded')
+            else:
+                _count(ctx, 'errors')
+
+    _process_books_in_batches(ctx, query, process_batch)
+
+
+@job_handler('import_books_file')
+def import_books_file_job(ctx):
+    """Yüklenen Excel/CSV dosyasını parça parça içe aktar (bkz. book_import.py)"""
+    from book_import import BookImporter, import_file, estimate_rows
+    path = ctx.params['path']
+    rows_done = ctx.checkpoint.get('rows', 0)
+    importer = BookImporter(stats=ctx.result.get('stats'), errors=ctx.result.get('errors'))
+    ctx.report(current=rows_done, total=estimate_rows(path))
+
+    def progress(rows_read):
+        # Parti commit'lerinden sonra yazılır; süreç arada ölürse son parça
+        # devamda yeniden yazılır (upsert olduğu için veri bozulmaz)
+        ctx.report(current=rows_read, checkpoint={'rows': rows_read}, result=importer.summary())
+
+    import_file(path, importer=importer, progress=progress, skip_rows=rows_done)
+    ctx.result = importer.summary()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
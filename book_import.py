@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel/CSV kitap içe aktarma motoru
+
+Satır satır df.iloc + Book.query.get yerine tüm sütunlar üzerinde vektörel
+pandas işlemleri kullanılır: sütun eşleme, temizleme, tür dönüşümü ve
+doğrulama tek seferde yapılır. Kayıtlar BOOK_IMPORT_BATCH_SIZE'lık partiler
+halinde yazılır: partideki mevcut ISBN'ler tek sorguda yüklenir, yeniler ORM
+bulk INSERT, mevcutlar birincil anahtara göre bulk UPDATE ile yazılır.
+
+Toplu yazmalar mapper olaylarını tetiklemediği için arama indeksi
+(reindex_books) ve süreç içi bulanık/typeahead indeksleri her partiden sonra
+burada güncellenir (büyük partilerde indeksler bir sonraki aramada kurulur). Veri sürümü do_orm_execute üzerinden kendiliğinden artar.
+"""
+
+import codecs
+import csv
+import os
+import time
+
+import pandas as pd
+from sqlalchemy import insert, update
+
+from config import app
+from models import db, Book
+from search_index import reindex_books
+from fuzzy_index import book_fuzzy_index
+from typeahead import book_typeahead
+
+
+app.config.setdefault('BOOK_IMPORT_BATCH_SIZE', 2000)
+app.config.setdefault('BOOK_IMPORT_MAX_ERRORS', 20)
+app.config.setdefault('BOOK_IMPORT_CHUNK_ROWS', 5000)
+
+IMPORT_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+# Sistem sütunu -> dosyada kabul edilen başlıklar
+COLUMN_MAPPINGS = {
+    'isbn': ['ISBN', 'isbn', 'Isbn', 'kitap_no', 'book_id'],
+    'title': ['Başlık', 'title', 'Title', 'baslik', 'kitap_adi'],
+    'authors': ['Yazar', 'authors', 'Authors', 'author', 'yazar'],
+    'publish_date': ['Yayın Yılı', 'publish_date', 'yayin_yili', 'year'],
+    'number_of_pages': ['Sayfa Sayısı', 'pages', 'sayfa', 'page_count'],
+    'publishers': ['Yayınevi', 'publishers', 'publisher', 'yayinevi'],
+    'languages': ['Diller', 'languages', 'language', 'dil'],
+    'quantity': ['Adet', 'quantity', 'miktar', 'count'],
+    'shelf': ['Raf', 'shelf', 'raf_no'],
+    'cupboard': ['Dolap', 'cupboard', 'dolap_no'],
+    'category': ['Kategori', 'category', 'kategori', 'tur']
+}
+REQUIRED_COLUMNS = ('isbn', 'title')
+TEXT_COLUMNS = ('isbn', 'title', 'authors', 'publish_date', 'publishers',
+                'languages', 'shelf', 'cupboard', 'category')
+# Yeni kayıtlarda eksik sütunların değeri (güncellemede eksik sütuna dokunulmaz)
+INSERT_DEFAULTS = {column: '' for column in TEXT_COLUMNS}
+INSERT_DEFAULTS.update({'number_of_pages': 0, 'quantity': 1})
+ISBN_MAX_LENGTH = Book.__table__.c.isbn.type.length
+INCREMENTAL_INDEX_LIMIT = 500
+
+
+def map_columns(columns):
+    """{sistem sütunu: dosyadaki başlık}"""
+    mapped = {}
+    for system_col, possible_names in COLUMN_MAPPINGS.items():
+        for col_name in columns:
+            if str(col_name).strip() in possible_names:
+                mapped[system_col] = col_name
+                break
+    return mapped
+
+
+def missing_columns(mapped):
+    return [col for col in REQUIRED_COLUMNS if col not in mapped]
+
+
+def _text(series):
+    # Excel tam sayıları float okunabilir (978...0.0); tam değerler ondalıksız yazılır
+    if pd.api.types.is_float_dtype(series):
+        whole = series.notna() & (series % 1 == 0)
+        series = series.astype(object).where(~whole, series[whole].astype('int64').astype(str))
+    return series.astype(object).where(series.notna(), '').astype(str).str.strip()
+
+
+def prepare_frame(df, mapped):
+    """Ham DataFrame'i temizlenmiş kayıtlara çevir.
+
+    Dönüş: (kayıtlar, istatistik, hatalar). kayıtlar ISBN'e göre tekilleştirilmiş,
+    yalnızca eşlenen sütunları içeren DataFrame'dir. df'in indeksi dosyadaki
+    veri satırı sırasıdır (hata mesajlarında satır numarası = indeks + 2).
+    """
+    frame = pd.DataFrame(index=df.index)
+    for column, source in mapped.items():
+        if column in TEXT_COLUMNS:
+            frame[column] = _text(df[source])
+    if 'number_of_pages' in mapped:
+        pages = pd.to_numeric(df[mapped['number_of_pages']], errors='coerce')
+        frame['number_of_pages'] = pages.fillna(0).astype('int64')
+    if 'quantity' in mapped:
+        quantity = pd.to_numeric(df[mapped['quantity']], errors='coerce').fillna(0).astype('int64')
+        frame['quantity'] = quantity.where(quantity > 0, 1)
+
+    stats = {'skipped_count': 0, 'error_count': 0, 'duplicate_count': 0}
+    errors = []
+
+    # ISBN ya da başlığı boş satırlar atlanır
+    blank = (frame['isbn'] == '') | (frame['title'] == '')
+    stats['skipped_count'] = int(blank.sum())
+    frame = frame[~blank]
+
+    too_long = frame['isbn'].str.len() > ISBN_MAX_LENGTH
+    if too_long.any():
+        stats['error_count'] = int(too_long.sum())
+        for index in frame.index[too_long][:app.config['BOOK_IMPORT_MAX_ERRORS']]:
+            errors.append(f"Satır {index + 2}: ISBN {ISBN_MAX_LENGTH} karakterden uzun")
+        frame = frame[~too_long]
+
+    # Aynı ISBN birden fazla satırda varsa son satır geçerlidir
+    duplicated = frame['isbn'].duplicated(keep='last')
+    stats['duplicate_count'] = int(duplicated.sum())
+    frame = frame[~duplicated]
+    return frame, stats, errors
+
+
+def _existing_isbns(isbns):
+    existing = set()
+    batch_size = 900  # SQLite parametre sınırının altında
+    for i in range(0, len(isbns), batch_size):
+        chunk = isbns[i:i + batch_size]
+        existing.update(row[0] for row in db.session.query(Book.isbn).filter(Book.isbn.in_(chunk)))
+    return existing
+
+
+def _refresh_memory_indexes(isbns):
+    """Bulk yazmalar mapper olayı üretmez; bu süreçteki indeksler elle güncellenir"""
+    if book_fuzzy_index.loaded_at is None and book_typeahead.loaded_at is None:
+        return
+    if len(isbns) > INCREMENTAL_INDEX_LIMIT:
+        # Büyük partide satır satır güncellemek yeniden kurmaktan pahalı; ilk aramada kurulur
+        book_fuzzy_index.loaded_at = None
+        book_typeahead.loaded_at = None
+        return
+    for i in range(0, len(isbns), 900):
+        rows = db.session.query(Book.isbn, Book.title, Book.authors, Book.publishers, Book.quantity,
+                                Book.total_borrow_count).filter(Book.isbn.in_(isbns[i:i + 900])).all()
+        for isbn, title, authors, publishers, quantity, popularity in rows:
+            if book_fuzzy_index.loaded_at is not None:
+                book_fuzzy_index.update(isbn, title, authors, publishers)
+            if book_typeahead.loaded_at is not None:
+                book_typeahead.set_book(isbn, title, authors, quantity, None, popularity)
+
+
+class BookImporter:
+    """Hazırlanmış kayıtları partiler halinde veritabanına yazar.
+
+    Tek DataFrame için import_dataframe(); parça parça okunan dosyalar için
+    her parçada write() çağrılabilir. Her parti ayrı commit edilir.
+    """
+
+    def __init__(self, batch_size=None, stats=None, errors=None):
+        self.batch_size = batch_size or app.config['BOOK_IMPORT_BATCH_SIZE']
+        self.stats = {'added_count': 0, 'updated_count': 0, 'error_count': 0,
+                      'skipped_count': 0, 'duplicate_count': 0}
+        # Yarıda kalan işe devam ederken önceki sayaçlar verilir
+        self.stats.update(stats or {})
+        self.errors = list(errors or [])
+        self.started = time.time()
+
+    def _add_errors(self, errors):
+        room = app.config['BOOK_IMPORT_MAX_ERRORS'] - len(self.errors)
+        if room > 0:
+            self.errors.extend(errors[:room])
+
+    def write(self, frame):
+        """Temizlenmiş kayıtları (prepare_frame çıktısı) yaz"""
+        for start in range(0, len(frame), self.batch_size):
+            batch = frame.iloc[start:start + self.batch_size]
+            isbns = batch['isbn'].tolist()
+            existing = _existing_isbns(isbns)
+            is_new = ~batch['isbn'].isin(existing)
+
+            new_rows = batch[is_new].to_dict('records')
+            for row in new_rows:
+                for column, default in INSERT_DEFAULTS.items():
+                    row.setdefault(column, default)
+            updated_rows = batch[~is_new].to_dict('records')
+
+            try:
+                if new_rows:
+                    db.session.execute(insert(Book), new_rows)
+                if updated_rows:
+                    db.session.execute(update(Book), updated_rows)
+                reindex_books(isbns)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.stats['error_count'] += len(batch)
+                self._add_errors([f"Satır {batch.index.min() + 2}-{batch.index.max() + 2}: {str(e)[:200]}"])
+                print(f"❌ Kitap içe aktarma partisi yazılamadı: {e}")
+                continue
+
+            self.stats['added_count'] += len(new_rows)
+            self.stats['updated_count'] += len(updated_rows)
+            _refresh_memory_indexes(isbns)
+
+    def import_dataframe(self, df, mapped):
+        frame, stats, errors = prepare_frame(df, mapped)
+        for key, value in stats.items():
+            self.stats[key] += value
+        self._add_errors(errors)
+        self.write(frame)
+
+    def summary(self):
+        processing_time = time.time() - self.started
+        total_processed = self.stats['added_count'] + self.stats['updated_count']
+        records_per_second = int(total_processed / processing_time) if processing_time > 0 else 0
+        return {
+            'stats': dict(self.stats),
+            'processing_time': processing_time,
+            'records_per_second': records_per_second,
+            'errors': list(self.errors)
+        }
+
+    def message(self):
+        summary = self.summary()
+        stats = summary['stats']
+        message = f"🚀 {stats['added_count']} kitap eklendi, {stats['updated_count']} güncellendi"
+        message += f"\n⚡ İşlem süresi: {summary['processing_time']:.2f}s ({summary['records_per_second']} kayıt/saniye)"
+        if stats['skipped_count'] > 0:
+            message += f"\n📋 {stats['skipped_count']} satır atlandı"
+        if stats['duplicate_count'] > 0:
+            message += f"\n🔁 {stats['duplicate_count']} tekrar eden ISBN satırı (son satır kullanıldı)"
+        if stats['error_count'] > 0:
+            message += f"\n❌ {stats['error_count']} satırda hata"
+        return message
+
+
+# --- Dosyayı parça parça okuma ---
+
+def _extension(path):
+    return os.path.splitext(path)[1].lower()
+
+
+def _csv_dialect(path):
+    """(kodlama, ayraç): UTF-8 (BOM'lu/BOM'suz) değilse Türkçe Windows kodlaması varsayılır"""
+    with open(path, 'rb') as f:
+        head = f.read(64 * 1024)
+    try:
+        # Parçanın sonunda yarım kalmış çok baytlı karakter hata sayılmaz
+        sample = codecs.getincrementaldecoder('utf-8-sig')().decode(head)
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError:
+        encoding = 'cp1254'
+        sample = head.decode(encoding, errors='replace')
+    try:
+        delimiter = csv.Sniffer().sniff(sample.split('\n', 1)[0], delimiters=',;\t|').delimiter
+    except csv.Error:
+        delimiter = ','
+    return encoding, delimiter
+
+
+def _cell(value):
+    # pandas.read_excel ile aynı: tam sayı değerli float -> int (ISBN 978...0.0 olmasın)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _header(values):
+    return [str(v).strip() if v is not None else f'Unnamed: {i}' for i, v in enumerate(values)]
+
+
+def read_columns(path):
+    """Dosyanın başlık satırı (sütun eşlemesini veri okumadan doğrulamak için)"""
+    ext = _extension(path)
+    if ext == '.csv':
+        encoding, delimiter = _csv_dialect(path)
+        return list(pd.read_csv(path, sep=delimiter, encoding=encoding, nrows=0).columns)
+    if ext == '.xls':
+        return list(pd.read_excel(path, nrows=0).columns)
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        header = next(workbook.active.iter_rows(max_row=1, values_only=True), ())
+        return _header(header)
+    finally:
+        workbook.close()
+
+
+def estimate_rows(path):
+    """İlerleme yüzdesi için yaklaşık veri satırı sayısı (bilinmiyorsa None)"""
+    ext = _extension(path)
+    if ext == '.csv':
+        lines = 0
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                lines += block.count(b'\n')
+        return max(lines - 1, 0)
+    if ext == '.xls':
+        return None
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        # read_only modda boyut, sayfa XML'indeki dimension etiketinden okunur
+        max_row = workbook.active.max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
+
+
+def _xlsx_chunks(path, chunk_rows, skip_rows):
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _header(header)
+        width = len(columns)
+        values, index = [], []
+        for position, row in enumerate(rows):
+            if position < skip_rows or all(v is None for v in row):
+                continue
+            row = tuple(_cell(v) for v in row[:width])
+            values.append(row + (None,) * (width - len(row)))
+            index.append(position)
+            if len(values) >= chunk_rows:
+                yield pd.DataFrame(values, columns=columns, index=index)
+                values, index = [], []
+        if values:
+            yield pd.DataFrame(values, columns=columns, index=index)
+    finally:
+        workbook.close()
+
+
+def _csv_chunks(path, chunk_rows, skip_rows):
+    encoding, delimiter = _csv_dialect(path)
+    reader = pd.read_csv(path, sep=delimiter, encoding=encoding, dtype=str, chunksize=chunk_rows,
+                         skiprows=range(1, skip_rows + 1) if skip_rows else None)
+    with reader:
+        for chunk in reader:
+            if skip_rows:
+                chunk.index = chunk.index + skip_rows
+            yield chunk
+
+
+def iter_chunks(path, chunk_rows=None, skip_rows=0):
+    """Dosyayı en fazla chunk_rows satırlık DataFrame'ler halinde oku.
+
+    İndeks, başlıktan sonraki veri satırı sırasıdır; skip_rows kadar satır
+    atlanır (yarıda kalan içe aktarmaya devam için).
+    """
+    chunk_rows = chunk_rows or app.config['BOOK_IMPORT_CHUNK_ROWS']
+    ext = _extension(path)
+    if ext == '.csv':
+        yield from _csv_chunks(path, chunk_rows, skip_rows)
+    elif ext == '.xls':
+        df = pd.read_excel(path)
+        for start in range(skip_rows, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    else:
+        yield from _xlsx_chunks(path, chunk_rows, skip_rows)
+
+
+def import_file(path, importer=None, progress=None, skip_rows=0):
+    """Dosyayı parça parça içe aktar; her parçadan sonra progress(okunan satır) çağrılır.
+
+    Gerekli sütunlar yoksa ValueError fırlatır. Dönüş: (importer, sütun eşlemesi).
+    """
+    importer = importer or BookImporter()
+    columns = read_columns(path)
+    mapped = map_columns(columns)
+    missing = missing_columns(mapped)
+    if missing:
+        raise ValueError(f'Gerekli sütunlar bulunamadı: {", ".join(missing)}\n'
+                         f'Bulunan sütunlar: {", ".join(map(str, columns))}')
+
+    rows_read = skip_rows
+    for chunk in iter_chunks(path, skip_rows=skip_rows):
+        importer.import_dataframe(chunk, mapped)
+        # Boş satırlar atlandığından son indeks okunan satır sayısını verir
+        rows_read = int(chunk.index[-1]) + 1
+        if progress:
+            progress(rows_read)
+    return importer, mapped
@@ -99,9 +99,9 @@ def load_user(user_id):
 
 # Helper Functions
 def get_setting(key, default=None):
-    """Get setting value from database"""
-    setting = Settings.query.filter_by(key=key).first()
-    return setting.value if setting else default
+    """Get setting value (süreç içi önbellekten; bkz. settings_cache)"""
+    from settings_cache import settings_cache
+    return settings_cache.get(key, default)
 
 # Add get_setting to template context
 @app.context_processor
@@ -119,6 +119,10 @@ def init_database():
     with app.app_context():
         db.create_all()
         
+        # Mevcut tablolara yeni sütun/indeksleri uygula
+        from schema_migrations import upgrade_schema
+        upgrade_schema()
+        
         # Add default categories if not exist
         default_categories = [
             ("Türk Edebiyatı", "Türk edebiyatı eserleri"),
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kitap kapakları için içerik adresli depo ve küçük boy (thumbnail) üretimi
+
+Kapaklar static/book_covers altında içeriğin SHA-256 özetiyle adlandırılır
+(ör. 3f2a...c1.jpg); aynı görsel farklı kitaplar ya da tekrar indirmeler için
+tek kez saklanır. Kaydedilen her kapak için COVER_THUMBNAIL_SIZES'taki
+boylar bir kez üretilip orijinalin yanına {ad}_{boy}.jpg olarak yazılır.
+
+Eski {isbn}.jpg dosyaları olduğu gibi çalışır; küçük boyları ilk istekte
+üretilir ya da toplu olarak:  python cover_store.py
+
+İstemciye verilen kapak adresleri /covers/<parmak izi>/<dosya> biçimindedir
+(bkz. api_covers.py). Parmak izi dosya içeriğinin özeti olduğundan adres
+içerik değişmedikçe değişmez ve bir yıl önbelleklenebilir. WebP/AVIF
+kodlamaları ilk istekte üretilip variants/ alt klasöründe saklanır.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlparse
+
+from PIL import Image, UnidentifiedImageError, features
+
+from config import app
+from provider_client import provider_client
+
+
+# Boy adı -> (en fazla genişlik, en fazla yükseklik); oran korunur
+app.config.setdefault('COVER_THUMBNAIL_SIZES', {
+    'list': (160, 240),
+    'kiosk': (240, 360),
+    'detail': (400, 600),
+})
+app.config.setdefault('COVER_THUMBNAIL_QUALITY', 82)
+app.config.setdefault('COVER_DOWNLOAD_WORKERS', 6)
+app.config.setdefault('COVER_DOWNLOAD_TIMEOUT', 10)
+# Bundan büyük indirmeler kapak sayılmaz (yanlış URL, HTML sayfası vb.)
+app.config.setdefault('COVER_MAX_BYTES', 5 * 1024 * 1024)
+# Accept başlığına göre sunulacak kodlamalar (tercih sırasıyla)
+app.config.setdefault('COVER_SERVE_FORMATS', ('avif', 'webp'))
+app.config.setdefault('COVER_WEBP_QUALITY', 80)
+app.config.setdefault('COVER_AVIF_QUALITY', 60)
+
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'image/webp', 'COVER_WEBP_QUALITY'),
+    'avif': ('AVIF', 'image/avif', 'COVER_AVIF_QUALITY'),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_write_lock = threading.Lock()
+_fingerprints = {}  # yol -> (mtime_ns, boyut, parmak izi)
+
+
+def cover_dir():
+    path = os.path.join(app.root_path, 'static', 'book_covers')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def thumbnail_filename(filename, size):
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}_{size}.jpg"
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def store_cover(content):
+    """Görsel baytlarını doğrula, içerik özetiyle kaydet ve küçük boyları üret.
+
+    Kaydedilen dosya adını döner; içerik görsel değilse ValueError fırlatır.
+    """
+    if not content:
+        raise ValueError('Boş kapak içeriği')
+    try:
+        with Image.open(BytesIO(content)) as img:
+            img_format = img.format
+            img.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise ValueError(f'Geçersiz kapak görseli: {e}')
+
+    ext = FORMAT_EXTENSIONS.get(img_format, 'jpg')
+    filename = f"{hashlib.sha256(content).hexdigest()[:32]}.{ext}"
+    path = os.path.join(cover_dir(), filename)
+    with _write_lock:
+        if not os.path.exists(path):
+            _write_atomic(path, content)
+    ensure_thumbnails(filename)
+    return filename
+
+
+def ensure_thumbnails(filename, sizes=None):
+    """Eksik küçük boyları üret; {boy: dosya adı} döner (üretilemeyenler hariç)"""
+    directory = cover_dir()
+    sizes = sizes or list(app.config['COVER_THUMBNAIL_SIZES'])
+    result = {}
+    missing = []
+    for size in sizes:
+        thumb = thumbnail_filename(filename, size)
+        if os.path.exists(os.path.join(directory, thumb)):
+            result[size] = thumb
+        else:
+            missing.append(size)
+    if not missing:
+        return result
+
+    source = os.path.join(directory, filename)
+    try:
+        with Image.open(source) as original:
+            original.load()
+            for size in missing:
+                box = app.config['COVER_THUMBNAIL_SIZES'][size]
+                thumb = original.convert('RGB')
+                thumb.thumbnail(box, Image.LANCZOS)
+                buffer = BytesIO()
+                thumb.save(buffer, 'JPEG', quality=app.config['COVER_THUMBNAIL_QUALITY'],
+                           optimize=True, progressive=True)
+                thumb_name = thumbnail_filename(filename, size)
+                _write_atomic(os.path.join(directory, thumb_name), buffer.getvalue())
+                result[size] = thumb_name
+    except Exception as e:
+        print(f"⚠️ Kapak küçük boyu üretilemedi ({filename}): {e}")
+    return result
+
+
+def thumbnail_for(filename, size):
+    """Yerel kapak dosyasının istenen boyu; yoksa üretilir, üretilemezse None"""
+    if size not in app.config['COVER_THUMBNAIL_SIZES']:
+        return None
+    if not os.path.exists(os.path.join(cover_dir(), filename)):
+        return None
+    return ensure_thumbnails(filename, [size]).get(size)
+
+
+def cover_fingerprint(filename):
+    """Dosya içeriğinin kısa özeti; dosya yoksa None. Değişmeyen dosya için bellekten"""
+    path = os.path.join(cover_dir(), filename)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    cached = _fingerprints.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()[:16]
+    _fingerprints[path] = (stat.st_mtime_ns, stat.st_size, fingerprint)
+    return fingerprint
+
+
+def cover_url(filename):
+    """Yerel kapak dosyası için parmak izli, kalıcı önbelleklenebilir adres"""
+    fingerprint = cover_fingerprint(filename)
+    if not fingerprint:
+        return f"/static/book_covers/{filename}"
+    return f"/covers/{fingerprint}/{filename}"
+
+
+def available_variant_formats():
+    return [fmt for fmt in app.config['COVER_SERVE_FORMATS']
+            if fmt in VARIANT_FORMATS and features.check(fmt)]
+
+
+def variant_path(filename, fmt, fingerprint):
+    """Kapağın fmt kodlamalı halinin yolu; yoksa üretilir, üretilemezse None"""
+    pil_format, _, quality_key = VARIANT_FORMATS[fmt]
+    directory = os.path.join(cover_dir(), 'variants')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.path.splitext(filename)[0]}.{fingerprint}.{fmt}")
+    if os.path.exists(path):
+        return path
+    try:
+        with Image.open(os.path.join(cover_dir(), filename)) as original:
+            image = original.convert('RGB')
+            buffer = BytesIO()
+            image.save(buffer, pil_format, quality=app.config[quality_key])
+        _write_atomic(path, buffer.getvalue())
+        return path
+    except Exception as e:
+        print(f"⚠️ Kapak {fmt} kodlaması üretilemedi ({filename}): {e}")
+        return None
+
+
+def download_cover(image_url):
+    """Kapak URL'sini indirip store_cover ile kaydet; dosya adı ya da None"""
+    # Devre kesici sunucu başına: yanıt vermeyen bir kapak sunucusu diğerlerini engellemez
+    response = provider_client.get('covers', image_url, timeout=app.config['COVER_DOWNLOAD_TIMEOUT'],
+                                   circuit_key=urlparse(image_url).netloc.lower() or None)
+    if response.status_code != 200 or not response.content:
+        return None
+    if len(response.content) > app.config['COVER_MAX_BYTES']:
+        return None
+    return store_cover(response.content)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config['COVER_DOWNLOAD_WORKERS'],
+                                           thread_name_prefix='cover-download')
+        return _executor
+
+
+def download_covers(items):
+    """Kapakları paralel indir: items = {anahtar: image_url} -> {anahtar: dosya adı}
+
+    Aynı URL bir kez indirilir. İndirilemeyen anahtarlar sonuçta yer almaz.
+    """
+    urls = {url for url in items.values() if url}
+    if not urls:
+        return {}
+
+    def _safe_download(url):
+        try:
+            return download_cover(url)
+        except Exception as e:
+            print(f"Kapak indirme hatası {url}: {e}")
+            return None
+
+    futures = {url: _get_executor().submit(_safe_download, url) for url in urls}
+    downloaded = {url: future.result() for url, future in futures.items()}
+    return {key: downloaded[url] for key, url in items.items() if url and downloaded.get(url)}
+
+
+if __name__ == '__main__':
+    directory = cover_dir()
+    sizes = app.config['COVER_THUMBNAIL_SIZES']
+    suffixes = tuple(f"_{size}.jpg" for size in sizes)
+    originals = [name for name in os.listdir(directory)
+                 if os.path.isfile(os.path.join(directory, name))
+                 and not name.endswith(suffixes) and not name.endswith('.tmp')]
+    for name in originals:
+        ensure_thumbnails(name)
+    print(f"🎉 {len(originals)} kapak için küçük boylar hazır")
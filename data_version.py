@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Veri sürüm sayaçları
+
+data_versions tablosunda adlandırılmış, sürekli artan sayaçlar tutulur.
+'catalog' sayacı kitap, üye ve işlem yazmalarında commit sonrası bir
+artırılır; önbelleğe alınmış raporlar bu sürümle anahtarlanır ve veri
+değişince kendiliğinden geçersiz olur. 'settings' sayacı Settings
+yazmalarında artar (bkz. settings_cache). Sayaçlar veritabanında
+olduğundan tüm gunicorn worker'ları aynı değeri görür.
+
+ORM olayları bulk_*_mappings ve ham SQL yazmalarını görmez; bu tür toplu
+yazmalardan sonra bump_version() elle çağrılmalıdır.
+"""
+
+from sqlalchemy import event, update, insert
+from sqlalchemy.orm import Session
+
+from models import db, Book, Member, Transaction, Settings, DataVersion
+
+
+CATALOG = 'catalog'
+SETTINGS = 'settings'
+# Sayaç adı -> yazıldığında sayacı artıran modeller
+TRACKED_MODELS = {
+    CATALOG: (Book, Member, Transaction),
+    SETTINGS: (Settings,),
+}
+
+
+def get_version(name=CATALOG):
+    """Sayacın güncel değeri (hiç artırılmadıysa 0)"""
+    version = db.session.query(DataVersion.version).filter(DataVersion.name == name).scalar()
+    return version or 0
+
+
+def bump_version(name=CATALOG, connection=None):
+    """Sayacı bir artır. connection verilmezse ayrı bir transaction'da hemen commit edilir."""
+    def _bump(conn):
+        result = conn.execute(
+            update(DataVersion.__table__)
+            .where(DataVersion.name == name)
+            .values(version=DataVersion.version + 1, updated_at=db.func.now())
+        )
+        if result.rowcount == 0:
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(DataVersion.__table__).values(name=name, version=1,
+                                                                      updated_at=db.func.now()))
+            except Exception:
+                # Başka süreç aynı anda satırı oluşturdu
+                conn.execute(update(DataVersion.__table__).where(DataVersion.name == name)
+                             .values(version=DataVersion.version + 1))
+
+    if connection is not None:
+        _bump(connection)
+    else:
+        with db.engine.begin() as conn:
+            _bump(conn)
+
+
+# --- Takip edilen modellerde yazma olursa commit sonrası ilgili sayaç artırılır ---
+
+def _changed_names(session):
+    return session.info.setdefault('data_version_changed', set())
+
+
+def _mark(session, cls):
+    for name, models in TRACKED_MODELS.items():
+        if issubclass(cls, models):
+            _changed_names(session).add(name)
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_changed(session, flush_context):
+    for cls in {type(obj) for obj in list(session.new) + list(session.dirty) + list(session.deleted)}:
+        _mark(session, cls)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_bulk_changed(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        _mark(orm_execute_state.session, mapper.class_)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_after_commit(session):
+    for name in sorted(session.info.pop('data_version_changed', ())):
+        try:
+            bump_version(name)
+        except Exception as e:
+            print(f"⚠️ Veri sürümü artırılamadı ({name}): {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed(session):
+    session.info.pop('data_version_changed', None)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kitap, üye ve işlem listeleri için akışlı Excel/CSV dışa aktarma
+
+Satırlar veritabanından yield_per ile sayfa sayfa okunur; liste, DataFrame
+ya da ORM nesnesi bellekte biriktirilmez.
+- CSV: satırlar üretildikçe yanıt olarak gönderilir (geçici dosya yok).
+- XLSX: openpyxl write-only çalışma kitabı geçici dosyaya yazılır ve
+  utils.send_temp_file ile gönderildikten sonra silinir.
+
+Kitap dışa aktarmasının sütun başlıkları book_import ile aynıdır; indirilen
+dosya değiştirilip tekrar içe aktarılabilir.
+"""
+
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from config import app
+from models import db, Book, Member, Transaction
+from transaction_dates import day_start
+
+
+app.config.setdefault('EXPORT_FETCH_SIZE', 1000)
+
+EXPORT_FORMATS = ('xlsx', 'csv')
+TRANSACTION_STATUSES = ('active', 'returned', 'overdue')
+BOOK_STATUSES = ('available', 'borrowed')
+
+
+def _date_arg(args, name):
+    value = (args.get(name) or '').strip()
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'Geçersiz tarih ({name}): {value} - beklenen biçim YYYY-AA-GG')
+
+
+def _choice_arg(args, name, choices):
+    value = (args.get(name) or '').strip()
+    if value and value not in choices:
+        raise ValueError(f'Geçersiz {name}: {value} - geçerli değerler: {", ".join(choices)}')
+    return value or None
+
+
+# --- Sorgular (filtreler request.args'tan) ---
+
+def books_export_query(args):
+    """?category=&status=available|borrowed"""
+    query = db.session.query(
+        Book.isbn, Book.title, Book.authors, Book.publish_date, Book.number_of_pages,
+        Book.publishers, Book.languages, Book.quantity, Book.shelf, Book.cupboard,
+        Book.category, Book.borrowed_count
+    )
+    category = (args.get('category') or '').strip()
+    if category:
+        query = query.filter(Book.category == category)
+    status = _choice_arg(args, 'status', BOOK_STATUSES)
+    if status == 'available':
+        query = query.filter(db.func.coalesce(Book.quantity, 0) > db.func.coalesce(Book.borrowed_count, 0))
+    elif status == 'borrowed':
+        query = query.filter(Book.borrowed_count > 0)
+    return query.order_by(Book.isbn)
+
+
+def members_export_query(args):
+    """?type=&class=&date_from=&date_to= (kayıt tarihi)"""
+    query = db.session.query(
+        Member.id, Member.ad_soyad, Member.sinif, Member.numara, Member.email, Member.phone,
+        Member.uye_turu, Member.join_date, Member.total_borrowed, Member.current_borrowed
+    )
+    member_type = (args.get('type') or '').strip()
+    if member_type:
+        query = query.filter(Member.uye_turu == member_type)
+    sinif = (args.get('class') or '').strip()
+    if sinif:
+        query = query.filter(Member.sinif == sinif)
+    date_from, date_to = _date_arg(args, 'date_from'), _date_arg(args, 'date_to')
+    if date_from:
+        query = query.filter(Member.join_date >= date_from)
+    if date_to:
+        query = query.filter(Member.join_date < date_to + timedelta(days=1))
+    return query.order_by(Member.id)
+
+
+def transactions_export_query(args):
+    """?status=active|returned|overdue&date_from=&date_to= (ödünç tarihi)&isbn=&member_id="""
+    query = db.session.query(
+        Transaction.id, Transaction.isbn, Book.title.label('book_title'),
+        Transaction.member_id, Member.ad_soyad.label('member_name'), Member.numara.label('member_number'),
+        Transaction.borrow_date, Transaction.due_date, Transaction.return_date,
+        Transaction.renew_count, Transaction.fine_amount
+    ).outerjoin(Book, Book.isbn == Transaction.isbn)\
+     .outerjoin(Member, Member.id == Transaction.member_id)
+
+    status = _choice_arg(args, 'status', TRANSACTION_STATUSES)
+    if status == 'active':
+        query = query.filter(Transaction.return_date.is_(None))
+    elif status == 'returned':
+        query = query.filter(Transaction.return_date.isnot(None))
+    elif status == 'overdue':
+        query = query.filter(Transaction.return_date.is_(None),
+                             Transaction.due_date < day_start())
+
+    date_from, date_to = _date_arg(args, 'date_from'), _date_arg(args, 'date_to')
+    if date_from:
+        query = query.filter(Transaction.borrow_date >= date_from)
+    if date_to:
+        query = query.filter(Transaction.borrow_date < date_to + timedelta(days=1))
+    if args.get('isbn'):
+        query = query.filter(Transaction.isbn == args.get('isbn').strip())
+    if args.get('member_id'):
+        try:
+            query = query.filter(Transaction.member_id == int(args.get('member_id')))
+        except ValueError:
+            raise ValueError('Geçersiz member_id')
+    return query.order_by(Transaction.id)
+
+
+def _transaction_status(row):
+    if row.return_date:
+        return 'İade Edildi'
+    if row.due_date and row.due_date < day_start():
+        return 'Gecikmiş'
+    return 'Ödünçte'
+
+
+# Her dışa aktarma: (başlık, satırdan değer) sütunları
+EXPORTS = {
+    'books': {
+        'query': books_export_query,
+        'sheet': 'Kitaplar',
+        'filename': 'kitaplar',
+        'columns': [
+            ('ISBN', lambda r: r.isbn),
+            ('Başlık', lambda r: r.title),
+            ('Yazar', lambda r: r.authors),
+            ('Yayın Yılı', lambda r: r.publish_date),
+            ('Sayfa Sayısı', lambda r: r.number_of_pages),
+            ('Yayınevi', lambda r: r.publishers),
+            ('Diller', lambda r: r.languages),
+            ('Adet', lambda r: r.quantity),
+            ('Raf', lambda r: r.shelf),
+            ('Dolap', lambda r: r.cupboard),
+            ('Kategori', lambda r: r.category),
+            ('Ödünçteki', lambda r: r.borrowed_count or 0),
+        ]
+    },
+    'members': {
+        'query': members_export_query,
+        'sheet': 'Üyeler',
+        'filename': 'uyeler',
+        'columns': [
+            ('ID', lambda r: r.id),
+            ('Ad Soyad', lambda r: r.ad_soyad),
+            ('Sınıf', lambda r: r.sinif),
+            ('Numara', lambda r: r.numara),
+            ('E-posta', lambda r: r.email),
+            ('Telefon', lambda r: r.phone),
+            ('Üye Türü', lambda r: r.uye_turu),
+            ('Kayıt Tarihi', lambda r: r.join_date),
+            ('Toplam Ödünç', lambda r: r.total_borrowed or 0),
+            ('Mevcut Ödünç', lambda r: r.current_borrowed or 0),
+        ]
+    },
+    'transactions': {
+        'query': transactions_export_query,
+        'sheet': 'İşlemler',
+        'filename': 'islemler',
+        'columns': [
+            ('ID', lambda r: r.id),
+            ('ISBN', lambda r: r.isbn),
+            ('Kitap', lambda r: r.book_title),
+            ('Üye ID', lambda r: r.member_id),
+            ('Üye', lambda r: r.member_name),
+            ('Üye Numarası', lambda r: r.member_number),
+            ('Ödünç Tarihi', lambda r: r.borrow_date),
+            ('Son Teslim', lambda r: r.due_date),
+            ('İade Tarihi', lambda r: r.return_date),
+            ('Uzatma', lambda r: r.renew_count or 0),
+            ('Ceza', lambda r: r.fine_amount or 0),
+            ('Durum', _transaction_status),
+        ]
+    },
+}
+
+
+def export_rows(export_type, args):
+    """Filtreleri doğrula ve satır değerlerini akışlı üret (ilk satır başlıklar).
+
+    Geçersiz filtrede ValueError hemen (ilk satır istenmeden) fırlatılır.
+    """
+    spec = EXPORTS[export_type]
+    query = spec['query'](args)
+    getters = [getter for _, getter in spec['columns']]
+
+    def generate():
+        yield [header for header, _ in spec['columns']]
+        rows = query.execution_options(stream_results=True).yield_per(app.config['EXPORT_FETCH_SIZE'])
+        for row in rows:
+            yield [getter(row) for getter in getters]
+
+    return generate()
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def iter_csv(rows):
+    """CSV satırlarını UTF-8 (BOM'lu, Excel Türkçe karakterleri doğru açar) baytlar olarak üret"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield '\ufeff'.encode('utf-8')
+    count = 0
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        count += 1
+        # Her satır için ayrı parça göndermek yerine yaklaşık 64 KB'lık parçalar
+        if count % 500 == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx(rows, path, sheet_name):
+    """Satırları openpyxl write-only çalışma kitabına yaz (bellek satır sayısından bağımsız)"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    bold = Font(bold=True)
+    rows = iter(rows)
+    headers = next(rows)
+    # write-only modda sütun genişlikleri satırlardan önce ayarlanmalı
+    for index, header in enumerate(headers, 1):
+        sheet.column_dimensions[get_column_letter(index)].width = max(12, len(header) + 4)
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(sheet, value=header)
+        cell.font = bold
+        header_cells.append(cell)
+    sheet.append(header_cells)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def build_xlsx(export_type, args):
+    """Dışa aktarmayı geçici .xlsx dosyasına yaz; (yol, indirme adı) döner"""
+    spec = EXPORTS[export_type]
+    rows = export_rows(export_type, args)
+    fd, path = tempfile.mkstemp(suffix='.xlsx', prefix=f'export_{export_type}_')
+    os.close(fd)
+    try:
+        write_xlsx(rows, path, spec['sheet'])
+    except Exception:
+        os.remove(path)
+        raise
+    return path, f"{spec['filename']}.xlsx"
+
+
+def csv_filename(export_type):
+    return f"{EXPORTS[export_type]['filename']}.csv"
+
+
+def export_response(export_type, args):
+    """?format=xlsx (varsayılan) | csv için indirme yanıtı; geçersiz filtrede ValueError"""
+    from flask import Response, stream_with_context
+    from utils import send_temp_file
+
+    export_format = _choice_arg(args, 'format', EXPORT_FORMATS) or 'xlsx'
+    if export_format == 'csv':
+        rows = export_rows(export_type, args)
+        # Yanıt gövdesi istek bağlamı içinde üretilir (yield_per oturumu açık kalır)
+        response = Response(stream_with_context(iter_csv(rows)), mimetype='text/csv')
+        response.headers.set('Content-Disposition', 'attachment', filename=csv_filename(export_type))
+        return response
+
+    path, download_name = build_xlsx(export_type, args)
+    return send_temp_file(path, download_name,
+                          'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Yazım hatasına dayanıklı kitap araması için trigram indeksi
+
+Başlık, yazarlar ve yayınevleri normalize_text_tr ile katlanıp 3'lü harf
+gruplarına (trigram) bölünür ve süreç içinde ters indekste tutulur. Sorgu, ortak
+trigram sayısına göre puanlanır; "sefiler" -> "Sefiller" gibi eksik/yanlış
+harfli aramalar da bulunur.
+
+İndeks ilk kullanımda veritabanından kurulur. Bu süreçteki Book
+değişiklikleri commit sonrası indekse işlenir; diğer gunicorn worker'larının
+yaptığı değişiklikler için indeks SEARCH_FUZZY_MAX_AGE saniyede bir arka
+planda yeniden kurulur; kurulum sürerken istekler mevcut indeksten yanıtlanır.
+"""
+
+import heapq
+import threading
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from config import app
+from models import db, Book
+from search_index import normalize_text_tr
+
+
+# /search bulanık eşleşme ayarları (app.config ile değiştirilebilir)
+app.config.setdefault('SEARCH_FUZZY_TOP_K', 200)
+app.config.setdefault('SEARCH_FUZZY_AUTHOR_WEIGHT', 0.8)
+app.config.setdefault('SEARCH_FUZZY_PUBLISHER_WEIGHT', 0.6)
+# (en az sorgu uzunluğu, en düşük benzerlik): uzun sorgu -> daha yüksek eşik
+app.config.setdefault('SEARCH_FUZZY_THRESHOLDS', ((9, 0.45), (6, 0.4), (3, 0.35), (0, 0.0)))
+app.config.setdefault('SEARCH_FUZZY_MAX_AGE', 300)
+
+
+def trigrams(value, normalized=False):
+    """Kelime başı/sonu boşlukla doldurulmuş trigram kümesi (pg_trgm ile aynı mantık)"""
+    text = value if normalized else normalize_text_tr(value)
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_similarity(a, b):
+    """İki metin arasında 0..1 arası trigram benzerliği (Jaccard)"""
+    ga, gb = trigrams(a), trigrams(b)
+    if not ga or not gb:
+        return 0.0
+    shared = len(ga & gb)
+    return shared / (len(ga) + len(gb) - shared)
+
+
+class TrigramIndex:
+    """Anahtar -> metin eşlemesi için trigram ters indeksi"""
+
+    def __init__(self):
+        self._postings = {}  # trigram -> {anahtar}
+        self._grams = {}     # anahtar -> trigram kümesi
+
+    def __len__(self):
+        return len(self._grams)
+
+    def add(self, key, value):
+        self.remove(key)
+        grams = trigrams(value)
+        if not grams:
+            return
+        self._grams[key] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key):
+        grams = self._grams.pop(key, None)
+        if not grams:
+            return
+        for gram in grams:
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def scores(self, query_grams):
+        """Sorgu trigramlarını paylaşan her anahtar için benzerlik.
+
+        Puan, sorgu trigramlarının belgede bulunma oranı (uzun başlık içindeki
+        kelimeyi bulmak için) ile Jaccard benzerliğinin ortalamasıdır.
+        """
+        shared = {}
+        for gram in query_grams:
+            for key in self._postings.get(gram, ()):
+                shared[key] = shared.get(key, 0) + 1
+        q_len = len(query_grams)
+        result = {}
+        for key, count in shared.items():
+            d_len = len(self._grams[key])
+            result[key] = (count / q_len + count / (q_len + d_len - count)) / 2
+        return result
+
+
+class BookFuzzyIndex:
+    """Kitap başlık, yazar ve yayınevleri için trigram indeksleri"""
+
+    def __init__(self):
+        self.titles = TrigramIndex()
+        self.authors = TrigramIndex()
+        self.publishers = TrigramIndex()
+        self.loaded_at = None
+        self._lock = threading.RLock()
+
+    def update(self, isbn, title, authors, publishers=None):
+        with self._lock:
+            self.titles.add(isbn, title)
+            self.authors.add(isbn, authors)
+            self.publishers.add(isbn, publishers)
+
+    def remove(self, isbn):
+        with self._lock:
+            self.titles.remove(isbn)
+            self.authors.remove(isbn)
+            self.publishers.remove(isbn)
+
+    def rebuild(self):
+        titles, authors, publishers = TrigramIndex(), TrigramIndex(), TrigramIndex()
+        rows = db.session.query(Book.isbn, Book.title, Book.authors, Book.publishers).yield_per(1000)
+        for isbn, title, author, publisher in rows:
+            titles.add(isbn, title)
+            authors.add(isbn, author)
+            publishers.add(isbn, publisher)
+        with self._lock:
+            self.titles, self.authors, self.publishers = titles, authors, publishers
+            self.loaded_at = time.monotonic()
+
+    def ensure_loaded(self):
+        if self.loaded_at is None:
+            self.rebuild()
+        elif is_stale(self.loaded_at):
+            refresh_in_background(self, 'fuzzy')
+
+    def search(self, query, limit=None, title_only=False, min_similarity=None):
+        """En benzer kitaplar: [(isbn, puan)] puana göre azalan.
+
+        min_similarity verilmezse SEARCH_FUZZY_THRESHOLDS'tan sorgu uzunluğuna göre seçilir.
+        """
+        self.ensure_loaded()
+        normalized = normalize_text_tr(query)
+        query_grams = trigrams(normalized, normalized=True)
+        if not query_grams:
+            return []
+        if limit is None:
+            limit = app.config['SEARCH_FUZZY_TOP_K']
+        if min_similarity is None:
+            min_similarity = fuzzy_threshold(normalized)
+
+        with self._lock:
+            combined = self.titles.scores(query_grams)
+            if not title_only:
+                for index, weight in ((self.authors, app.config['SEARCH_FUZZY_AUTHOR_WEIGHT']),
+                                      (self.publishers, app.config['SEARCH_FUZZY_PUBLISHER_WEIGHT'])):
+                    for isbn, score in index.scores(query_grams).items():
+                        combined[isbn] = max(combined.get(isbn, 0.0), score * weight)
+
+        candidates = ((isbn, score) for isbn, score in combined.items() if score >= min_similarity)
+        return heapq.nlargest(limit, candidates, key=lambda item: item[1])
+
+
+def is_stale(loaded_at):
+    max_age = app.config['SEARCH_FUZZY_MAX_AGE']
+    return bool(max_age) and time.monotonic() - loaded_at > max_age
+
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def refresh_in_background(index, name):
+    """index.rebuild()'i istek thread'ini bekletmeden çalıştır (aynı indeks için tek kurulum)"""
+    with _refreshing_lock:
+        if name in _refreshing:
+            return
+        _refreshing.add(name)
+
+    def run():
+        try:
+            with app.app_context():
+                index.rebuild()
+        except Exception as e:
+            # Bir sonraki denemeye kadar eski indeksle devam edilir
+            index.loaded_at = time.monotonic()
+            print(f"⚠️ {name} indeksi yenilenemedi: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(name)
+
+    threading.Thread(target=run, name=f'{name}-index-refresh', daemon=True).start()
+
+
+def fuzzy_threshold(normalized_query):
+    for min_len, threshold in app.config['SEARCH_FUZZY_THRESHOLDS']:
+        if len(normalized_query) >= min_len:
+            return threshold
+    return 0.0
+
+
+book_fuzzy_index = BookFuzzyIndex()
+
+
+# --- Artımlı güncelleme: değişiklikler commit sonrası indekse işlenir ---
+
+def _pending(session):
+    return session.info.setdefault('fuzzy_index_pending', {})
+
+
+@event.listens_for(Book, 'after_insert')
+@event.listens_for(Book, 'after_update')
+def _book_changed(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in ('isbn', 'title', 'authors', 'publishers')):
+        _pending(state.session)[target.isbn] = (target.title, target.authors, target.publishers)
+
+
+@event.listens_for(Book, 'after_delete')
+def _book_deleted(mapper, connection, target):
+    _pending(inspect(target).session)[target.isbn] = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session):
+    pending = session.info.pop('fuzzy_index_pending', None)
+    if not pending or book_fuzzy_index.loaded_at is None:
+        return
+    for isbn, values in pending.items():
+        if values is None:
+            book_fuzzy_index.remove(isbn)
+        else:
+            book_fuzzy_index.update(isbn, *values)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('fuzzy_index_pending', None)
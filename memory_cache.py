@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Süreç içi, boyutu sınırlı LRU + TTL önbellek
+
+utils.cache_with_ttl ile sarılan fonksiyonların sonuçları burada tutulur.
+- En fazla MEMORY_CACHE_MAX_ENTRIES kayıt; dolunca en uzun süredir
+  kullanılmayan kayıt atılır.
+- Her kaydın kendi süresi (TTL) vardır; süresi dolan kayıtlar okunurken ve
+  arka plandaki temizlik iş parçacığıyla MEMORY_CACHE_SWEEP_INTERVAL
+  saniyede bir silinir.
+- get_or_set tek uçuşludur: aynı anahtarı aynı anda isteyenlerden yalnızca
+  biri değeri hesaplar, diğerleri onun sonucunu bekler.
+- Kayıtlar etiketlerle ('books', 'transactions', ...) geçersiz kılınır;
+  anahtar metni taranmaz.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from config import app
+
+
+app.config.setdefault('MEMORY_CACHE_MAX_ENTRIES', 1024)
+app.config.setdefault('MEMORY_CACHE_SWEEP_INTERVAL', 60)
+
+MISSING = object()
+
+
+class MemoryCache:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or app.config['MEMORY_CACHE_MAX_ENTRIES']
+        self._entries = OrderedDict()   # anahtar -> (değer, son geçerlilik, etiketler)
+        self._tags = {}                 # etiket -> anahtarlar
+        self._inflight = {}             # anahtar -> hesaplayan çağrının kilidi
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0,
+                       'expirations': 0, 'invalidations': 0, 'coalesced': 0}
+
+    # --- İç yardımcılar (self._lock tutulurken çağrılır) ---
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        value, expires_at, _ = entry
+        if expires_at <= now:
+            self._discard(key)
+            self._stats['expirations'] += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    # --- Genel arayüz ---
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            self._stats['hits' if value is not MISSING else 'misses'] += 1
+        return default if value is MISSING else value
+
+    def set(self, key, value, ttl, tags=()):
+        tags = frozenset(tags)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (value, time.monotonic() + ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            self._stats['sets'] += 1
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self._stats['evictions'] += 1
+        self._ensure_sweeper()
+
+    def get_or_set(self, key, factory, ttl, tags=()):
+        """Önbellekte varsa değeri, yoksa factory() sonucunu kaydedip döner (tek uçuşlu)"""
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            if value is not MISSING:
+                self._stats['hits'] += 1
+                return value
+            self._stats['misses'] += 1
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Beklerken başka çağrı hesaplamış olabilir
+            with self._lock:
+                value = self._lookup(key, time.monotonic())
+                if value is not MISSING:
+                    self._stats['coalesced'] += 1
+                    return value
+            try:
+                value = factory()
+                self.set(key, value, ttl, tags)
+                return value
+            finally:
+                with self._lock:
+                    if self._inflight.get(key) is key_lock:
+                        del self._inflight[key]
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def invalidate_tags(self, *tags):
+        """Etiketlerden herhangi birini taşıyan kayıtları sil; silinen sayısını döner"""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                self._discard(key)
+            self._stats['invalidations'] += len(keys)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+
+    def sweep(self):
+        """Süresi dolan kayıtları sil"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                self._discard(key)
+            self._stats['expirations'] += len(expired)
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats)
+            result.update({
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'tags': sorted(self._tags)
+            })
+        # Başka çağrının hesaplamasını bekleyenler de önbellekten karşılanmış sayılır
+        lookups = result['hits'] + result['misses']
+        result['hit_rate'] = round((result['hits'] + result['coalesced']) / lookups, 3) if lookups else None
+        return result
+
+    # --- Arka plan temizliği ---
+
+    def _ensure_sweeper(self):
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='memory-cache-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(app.config['MEMORY_CACHE_SWEEP_INTERVAL'])
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ Önbellek temizliği hatası: {e}")
+
+
+memory_cache = MemoryCache()
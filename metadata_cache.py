@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kitap bilgisi sağlayıcıları için kalıcı önbellek
+
+Google Books ve Open Library'nin ham JSON yanıtları (sağlayıcı, ISBN)
+anahtarıyla metadata_cache tablosunda tutulur. Bulunan kayıtlar
+METADATA_CACHE_TTL, bulunamayanlar (negatif kayıt) daha kısa
+METADATA_CACHE_NEGATIVE_TTL süresince geçerlidir. Tablo
+METADATA_CACHE_MAX_ENTRIES kaydı aşınca en uzun süredir kullanılmayanlar
+silinir (LRU). Ağ hataları önbelleğe yazılmaz.
+
+Önbellek ayrı bir oturumla okunup yazılır; isteğin kendi transaction'ı
+commit edilmez. Önbellek hatası veri çekmeyi asla durdurmaz.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from config import app
+from models import db, MetadataCacheEntry
+
+
+app.config.setdefault('METADATA_CACHE_TTL', 30 * 24 * 3600)
+app.config.setdefault('METADATA_CACHE_NEGATIVE_TTL', 24 * 3600)
+app.config.setdefault('METADATA_CACHE_MAX_ENTRIES', 50000)
+
+_CHUNK = 500
+
+
+def get_many(keys):
+    """Geçerli önbellek kayıtları: {(sağlayıcı, isbn): ham yanıt}"""
+    keys = set(keys)
+    if not keys:
+        return {}
+    now = datetime.utcnow()
+    isbns = sorted({isbn for _, isbn in keys})
+    found = {}
+    try:
+        with Session(db.engine) as session:
+            for i in range(0, len(isbns), _CHUNK):
+                rows = session.query(MetadataCacheEntry).filter(
+                    MetadataCacheEntry.isbn.in_(isbns[i:i + _CHUNK]),
+                    MetadataCacheEntry.expires_at > now
+                ).all()
+                for row in rows:
+                    key = (row.provider, row.isbn)
+                    if key in keys:
+                        found[key] = json.loads(row.payload) if row.payload else None
+            # LRU için son kullanım zamanını tek sorguda güncelle
+            hit_isbns = sorted({isbn for _, isbn in found})
+            for i in range(0, len(hit_isbns), _CHUNK):
+                session.query(MetadataCacheEntry).filter(
+                    MetadataCacheEntry.isbn.in_(hit_isbns[i:i + _CHUNK])
+                ).update({MetadataCacheEntry.last_used_at: now}, synchronize_session=False)
+            session.commit()
+    except Exception as e:
+        print(f"⚠️ Kitap bilgisi önbelleği okunamadı: {e}")
+    return found
+
+
+def put_many(entries):
+    """entries: {(sağlayıcı, isbn): (ham yanıt, bulundu_mu)}"""
+    if not entries:
+        return
+    now = datetime.utcnow()
+    ttl = timedelta(seconds=app.config['METADATA_CACHE_TTL'])
+    negative_ttl = timedelta(seconds=app.config['METADATA_CACHE_NEGATIVE_TTL'])
+    rows = [{
+        'provider': provider,
+        'isbn': isbn,
+        'payload': json.dumps(payload, ensure_ascii=False) if payload is not None else None,
+        'is_miss': not found,
+        'fetched_at': now,
+        'expires_at': now + (ttl if found else negative_ttl),
+        'last_used_at': now,
+    } for (provider, isbn), (payload, found) in entries.items()]
+
+    try:
+        with Session(db.engine) as session:
+            # Taşınabilir upsert: eski kaydı sil, yenisini ekle
+            by_provider = {}
+            for row in rows:
+                by_provider.setdefault(row['provider'], []).append(row['isbn'])
+            for provider, isbns in by_provider.items():
+                for i in range(0, len(isbns), _CHUNK):
+                    session.query(MetadataCacheEntry).filter(
+                        MetadataCacheEntry.provider == provider,
+                        MetadataCacheEntry.isbn.in_(isbns[i:i + _CHUNK])
+                    ).delete(synchronize_session=False)
+            session.bulk_insert_mappings(MetadataCacheEntry, rows)
+            _evict(session, now)
+            session.commit()
+    except Exception as e:
+        print(f"⚠️ Kitap bilgisi önbelleğe yazılamadı: {e}")
+
+
+def _evict(session, now):
+    """Süresi dolanları ve kapasite üstündeki en eski kullanılanları sil"""
+    session.query(MetadataCacheEntry).filter(
+        MetadataCacheEntry.expires_at <= now
+    ).delete(synchronize_session=False)
+    max_entries = app.config['METADATA_CACHE_MAX_ENTRIES']
+    if session.query(MetadataCacheEntry).count() <= max_entries:
+        return
+    cutoff = session.query(MetadataCacheEntry.last_used_at)\
+        .order_by(MetadataCacheEntry.last_used_at.desc())\
+        .offset(max_entries).limit(1).scalar()
+    if cutoff is not None:
+        session.query(MetadataCacheEntry).filter(
+            MetadataCacheEntry.last_used_at <= cutoff
+        ).delete(synchronize_session=False)
+
+
+def clear():
+    """Tüm önbelleği temizle; silinen kayıt sayısını döner"""
+    with Session(db.engine) as session:
+        deleted = session.query(MetadataCacheEntry).delete(synchronize_session=False)
+        session.commit()
+    return deleted
@@ -1,8 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.ext.hybrid import hybrid_property
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
+from transaction_dates import TransactionDateTime
+
 # Create db instance here to avoid circular imports
 db = SQLAlchemy()
 
@@ -47,7 +50,6 @@ class Book(db.Model):
     shelf = db.Column(db.Text)
     cupboard = db.Column(db.Text)
     image_path = db.Column(db.Text)
-    cover_image = db.Column(db.LargeBinary)
     last_borrowed_date = db.Column(db.Text)
     total_borrow_count = db.Column(db.Integer, default=0)
     qr_code = db.Column(db.Text)  # QR code path
@@ -57,11 +59,43 @@ class Book(db.Model):
     average_rating = db.Column(db.Float, default=0.0)
     review_count = db.Column(db.Integer, default=0)
     category = db.Column(db.String(100))  # Kategori alanı eklendi
+    borrowed_count = db.Column(db.Integer, default=0, server_default='0')  # Şu an ödünçteki kopya sayısı (sayaç)
     
     # Relationships
     reviews = db.relationship('Review', backref='book', lazy='dynamic')
     reservations = db.relationship('Reservation', backref='book', lazy='dynamic')
     categories = db.relationship('Category', secondary='book_categories', backref='books')
+    # Kapak baytları ayrı tabloda; yalnızca erişildiğinde yüklenir
+    cover = db.relationship('BookCover', uselist=False, lazy='select', cascade='all, delete-orphan')
+    
+    @property
+    def cover_image(self):
+        return self.cover.image if self.cover else None
+    
+    @cover_image.setter
+    def cover_image(self, value):
+        if value is None:
+            self.cover = None
+        elif self.cover:
+            self.cover.image = value
+        else:
+            self.cover = BookCover(image=value)
+    
+    @hybrid_property
+    def available_count(self):
+        """Rafta bulunan kopya sayısı (quantity - borrowed_count)"""
+        return (self.quantity or 0) - (self.borrowed_count or 0)
+    
+    @available_count.expression
+    def available_count(cls):
+        return db.func.coalesce(cls.quantity, 0) - db.func.coalesce(cls.borrowed_count, 0)
+
+class BookCover(db.Model):
+    """Kitap kapağı BLOB'u; books tablosundaki taramalar görsel baytlarını taşımasın diye ayrı"""
+    __tablename__ = 'book_covers'
+    isbn = db.Column(db.String(20), db.ForeignKey('books.isbn'), primary_key=True)
+    image = db.Column(db.LargeBinary)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Member(db.Model):
     __tablename__ = 'members'
@@ -90,9 +124,10 @@ class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     isbn = db.Column(db.String(20), db.ForeignKey('books.isbn'))
     member_id = db.Column(db.Integer, db.ForeignKey('members.id'))
-    borrow_date = db.Column(db.Text)
-    due_date = db.Column(db.Text)
-    return_date = db.Column(db.Text)
+    # Tarih-saat; SQLite'ta 'YYYY-MM-DD HH:MM:SS' metni (bkz. transaction_dates, migration 0005)
+    borrow_date = db.Column(TransactionDateTime)
+    due_date = db.Column(TransactionDateTime)
+    return_date = db.Column(TransactionDateTime)
     renew_count = db.Column(db.Integer, default=0)
     fine_amount = db.Column(db.Float, default=0.0)
     condition_on_borrow = db.Column(db.String(50), default='good')  # good, fair, poor
@@ -102,6 +137,20 @@ class Transaction(db.Model):
     # Relationships
     book = db.relationship('Book', backref='transactions')
     member = db.relationship('Member', backref='transactions')
+    
+    # Sıcak sorgular: kitabın/üyenin aktif ödünçleri, gecikenler, tarih aralıkları.
+    # Mevcut veritabanlarına schema_migrations 0004 ile eklenir; planlar query_plan_check.py ile denetlenir.
+    __table_args__ = (
+        db.Index('ix_transactions_isbn_return_date', 'isbn', 'return_date'),
+        db.Index('ix_transactions_member_return_date', 'member_id', 'return_date'),
+        db.Index('ix_transactions_active_due_date', 'due_date',
+                 sqlite_where=db.text('return_date IS NULL'),
+                 postgresql_where=db.text('return_date IS NULL')),
+        db.Index('ix_transactions_active_isbn', 'isbn',
+                 sqlite_where=db.text('return_date IS NULL'),
+                 postgresql_where=db.text('return_date IS NULL')),
+        db.Index('ix_transactions_borrow_date', 'borrow_date'),
+    )
 
 class KioskRequest(db.Model):
     __tablename__ = 'kiosk_requests'
@@ -243,3 +292,43 @@ class QRCode(db.Model):
     
     # Relationships
     user = db.relationship('User', backref='qr_codes')
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    id = db.Column(db.String(100), primary_key=True)  # Adım adı, örn. '0001_book_borrowed_count'
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class MetadataCacheEntry(db.Model):
+    __tablename__ = 'metadata_cache'
+    provider = db.Column(db.String(30), primary_key=True)  # google_books, openlibrary
+    isbn = db.Column(db.String(20), primary_key=True)
+    payload = db.Column(db.Text)  # Sağlayıcının ham JSON yanıtı
+    is_miss = db.Column(db.Boolean, default=False)  # Sağlayıcı bu ISBN'i bulamadı (negatif kayıt)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class BackgroundJob(db.Model):
+    __tablename__ = 'background_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)  # complete_all_info, verify_and_update, download_missing_covers
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, running, completed, failed, cancelled
+    params = db.Column(db.Text)  # JSON
+    checkpoint = db.Column(db.Text)  # JSON - kaldığı yerden devam için
+    result = db.Column(db.Text)  # JSON - özet sayaçlar
+    error = db.Column(db.Text)
+    progress_current = db.Column(db.Integer, default=0)
+    progress_total = db.Column(db.Integer)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    worker_id = db.Column(db.String(100))  # host:pid
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+    name = db.Column(db.String(50), primary_key=True)  # 'catalog': kitap/üye/işlem yazmaları
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
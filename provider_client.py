@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kitap bilgisi sağlayıcıları için ortak HTTP istemcisi
+
+Tüm Google Books / Open Library / kapak istekleri buradan geçer:
+- Tek, bağlantı havuzlu requests.Session
+- Sağlayıcı başına eşzamanlılık sınırı ve token bucket hız sınırı
+- 429/5xx ve bağlantı hatalarında jitter'lı üstel geri çekilmeyle tekrar
+  (Retry-After başlığına uyulur)
+- Devre kesici: art arda hata veren sağlayıcı bir süre hiç çağrılmaz.
+  Tekrarları tükenen her çağrı tek hata sayılır. Kapaklar gibi çok sunuculu
+  sağlayıcılarda devre sunucu başınadır (circuit_key), kötü bir sunucu
+  diğerlerini kapatmaz.
+- Sağlayıcı başına metrikler (çağrı, hata, tekrar, gecikme)
+
+Ayarlar app.config üzerinden değiştirilebilir.
+"""
+
+import random
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import app
+
+
+# Sağlayıcı başına aynı anda açık istek sınırı
+app.config.setdefault('METADATA_PROVIDER_CONCURRENCY', {'google_books': 4, 'openlibrary': 4, 'covers': 8})
+# Sağlayıcı başına (saniyedeki istek, ani yük kapasitesi)
+app.config.setdefault('PROVIDER_RATE_LIMITS', {'google_books': (5, 10), 'openlibrary': (3, 6), 'covers': (10, 20)})
+app.config.setdefault('PROVIDER_MAX_RETRIES', 3)
+app.config.setdefault('PROVIDER_BACKOFF_BASE', 0.5)
+app.config.setdefault('PROVIDER_BACKOFF_MAX', 8)
+# Art arda bu kadar hata sonrası sağlayıcı PROVIDER_CIRCUIT_RESET saniye atlanır
+app.config.setdefault('PROVIDER_CIRCUIT_THRESHOLD', 5)
+app.config.setdefault('PROVIDER_CIRCUIT_RESET', 60)
+app.config.setdefault('PROVIDER_POOL_SIZE', 16)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class ProviderUnavailable(requests.exceptions.RequestException):
+    """Devre açık ya da süre yetmedi; istek gönderilmedi"""
+
+
+class TokenBucket:
+    """Saniyede rate jeton dolan, en fazla capacity jeton tutan kova"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Jeton alınana kadar bekle; deadline'a yetişmeyecekse False"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait_time = (1 - self.tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait_time > deadline:
+                return False
+            time.sleep(wait_time)
+
+
+class CircuitBreaker:
+    """closed -> (threshold hata) -> open -> (reset süresi) -> half-open -> tek deneme"""
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.half_open_trial = False
+        self._trial_thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.half_open_trial:
+                # Yalnızca bir deneme isteği geçsin
+                self.half_open_trial = True
+                self._trial_thread = threading.get_ident()
+                return True
+            return False
+
+    def release_trial(self):
+        """Deneme isteği sağlayıcıya hiç ulaşmadan bittiyse (hız sınırı/süre) hakkı bırak"""
+        with self._lock:
+            if self.half_open_trial and self._trial_thread == threading.get_ident():
+                self.half_open_trial = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.half_open_trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.half_open_trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self.half_open_trial = False
+
+
+class ProviderMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.successes = 0
+        self.errors = 0
+        self.retries = 0
+        self.rate_limited = 0  # 429 yanıtları
+        self.short_circuited = 0  # devre açıkken atlanan çağrılar
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def observe_latency(self, seconds):
+        with self._lock:
+            self.total_latency += seconds
+            self.max_latency = max(self.max_latency, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            attempts = self.successes + self.errors
+            return {
+                'calls': self.calls,
+                'successes': self.successes,
+                'errors': self.errors,
+                'retries': self.retries,
+                'rate_limited': self.rate_limited,
+                'short_circuited': self.short_circuited,
+                'avg_latency_ms': round(self.total_latency * 1000 / attempts, 1) if attempts else None,
+                'max_latency_ms': round(self.max_latency * 1000, 1)
+            }
+
+
+class ProviderClient:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self._providers = {}
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=app.config['PROVIDER_POOL_SIZE'])
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                # SSL certificate verification disabled for PyInstaller executable compatibility
+                if hasattr(sys, 'frozen'):
+                    session.verify = False
+                self._session = session
+            return self._session
+
+    def _state(self, provider):
+        with self._lock:
+            state = self._providers.get(provider)
+            if state is None:
+                rate, burst = app.config['PROVIDER_RATE_LIMITS'].get(provider, (5, 10))
+                state = self._providers[provider] = {
+                    'semaphore': threading.BoundedSemaphore(
+                        app.config['METADATA_PROVIDER_CONCURRENCY'].get(provider, 4)),
+                    'bucket': TokenBucket(rate, burst),
+                    'breakers': {},
+                    'metrics': ProviderMetrics()
+                }
+            return state
+
+    def _breaker(self, state, circuit_key):
+        with self._lock:
+            breaker = state['breakers'].get(circuit_key)
+            if breaker is None:
+                breaker = state['breakers'][circuit_key] = CircuitBreaker(
+                    app.config['PROVIDER_CIRCUIT_THRESHOLD'], app.config['PROVIDER_CIRCUIT_RESET'])
+            return breaker
+
+    def get(self, provider, url, timeout=15, circuit_key=None):
+        """Sağlayıcıya GET; tekrar/hız sınırı/devre kesici uygulanır.
+
+        timeout, tekrarlar dahil bu çağrının toplam süre sınırıdır. Son denemenin
+        yanıtı döner (çağıran raise_for_status ile kontrol eder); ağ hatası ya da
+        devre açıksa exception fırlatır. circuit_key verilirse (ör. kapak sunucusu)
+        devre kesici o anahtara özeldir; hız ve eşzamanlılık sınırı sağlayıcı geneldir.
+        """
+        state = self._state(provider)
+        metrics = state['metrics']
+        breaker = self._breaker(state, circuit_key)
+        deadline = time.monotonic() + timeout
+        metrics.add(calls=1)
+
+        if not breaker.allow():
+            metrics.add(short_circuited=1)
+            raise ProviderUnavailable(f'{provider} geçici olarak devre dışı (art arda hatalar)')
+
+        max_retries = app.config['PROVIDER_MAX_RETRIES']
+        attempt = 0
+        while True:
+            if not state['bucket'].acquire(deadline):
+                self._abandon(breaker, attempt)
+                raise ProviderUnavailable(f'{provider} hız sınırı nedeniyle süre yetmedi')
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._abandon(breaker, attempt)
+                raise ProviderUnavailable(f'{provider} için süre doldu')
+
+            response, error = None, None
+            started = time.monotonic()
+            try:
+                with state['semaphore']:
+                    response = self.session.get(url, timeout=remaining)
+            except requests.exceptions.RequestException as e:
+                error = e
+            metrics.observe_latency(time.monotonic() - started)
+
+            retryable = error is not None or response.status_code in RETRY_STATUS_CODES
+            if not retryable:
+                metrics.add(successes=1)
+                breaker.record_success()
+                return response
+
+            metrics.add(errors=1, rate_limited=1 if response is not None and response.status_code == 429 else 0)
+            delay = self._backoff(attempt, response)
+            # Başka çağrılar devreyi açtıysa tekrar etme
+            if attempt >= max_retries or breaker.state == 'open' or time.monotonic() + delay >= deadline:
+                breaker.record_failure()  # Tekrarları tükenen çağrı tek hata sayılır
+                if error is not None:
+                    raise error
+                return response
+            metrics.add(retries=1)
+            attempt += 1
+            time.sleep(delay)
+
+    @staticmethod
+    def _abandon(breaker, attempt):
+        """Süre bittiği için tekrar gönderilemeyen çağrı"""
+        if attempt:
+            breaker.record_failure()  # Önceki denemeler hata verdi: çağrı başarısız
+        else:
+            breaker.release_trial()  # İstek hiç gönderilmedi; sağlayıcı hakkında bilgi yok
+
+    @staticmethod
+    def _backoff(attempt, response):
+        """Jitter'lı üstel bekleme; sunucu Retry-After verdiyse ona uy"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        cap = min(app.config['PROVIDER_BACKOFF_MAX'], app.config['PROVIDER_BACKOFF_BASE'] * (2 ** attempt))
+        return random.uniform(0, cap)  # full jitter
+
+    def metrics(self):
+        with self._lock:
+            providers = dict(self._providers)
+        result = {}
+        for name, state in providers.items():
+            breakers = dict(state['breakers'])
+            default = breakers.pop(None, None)
+            result[name] = dict(state['metrics'].snapshot(), circuit=default.state if default else 'closed')
+            if breakers:
+                # Anahtarlı devreler (ör. kapak sunucuları): yalnızca kapalı olmayanlar
+                result[name]['circuits'] = {key: breaker.state for key, breaker in breakers.items()
+                                            if breaker.state != 'closed'}
+        return result
+
+
+provider_client = ProviderClient()
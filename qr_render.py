@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Toplu etiket PDF'leri için vektörel QR çizimi
+
+QR matrisleri (çizim yolu olarak) içerik başına LRU önbellekte tutulur;
+aynı ISBN ya da üye numarası tekrar istendiğinde qrcode kütüphanesi ve yol
+üretimi yeniden çalışmaz.
+Matris, ReportLab tuvaline raster görüntü yerine dolu dikdörtgenler olarak
+bir kez form XObject şeklinde çizilir ve doForm ile yerleştirilir; aynı
+PDF'te tekrar eden QR'lar tek nesneyi paylaşır. Çıktı hem küçük hem de her
+ölçekte keskin olur.
+"""
+
+import hashlib
+from functools import lru_cache
+
+import qrcode
+from reportlab.pdfgen.pathobject import PDFPathObject
+
+from config import app
+
+
+app.config.setdefault('QR_MATRIX_CACHE_SIZE', 20000)
+
+
+def _build_matrix(payload):
+    # qrcode.make() ile aynı ayarlar (hata düzeltme M, 4 modül kenar boşluğu)
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=4)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return tuple(tuple(row) for row in qr.get_matrix())
+
+
+def _build_path(payload):
+    """(modül sayısı, yol): 1 birim = 1 modül.
+
+    Satırdaki yan yana koyu modüller tek dikdörtgen olur; alt satırda aynı
+    aralık tekrar ediyorsa dikdörtgen aşağı uzatılır (daha az PDF operatörü).
+    """
+    matrix = _build_matrix(payload)
+    n = len(matrix)
+    rects = []
+    open_runs = {}  # (başlangıç, genişlik) -> rects içindeki indeks
+    for r, row in enumerate(matrix):
+        runs = []
+        start = None
+        for col, dark in enumerate(row + (False,)):
+            if dark and start is None:
+                start = col
+            elif not dark and start is not None:
+                runs.append((start, col - start))
+                start = None
+        next_open = {}
+        for run in runs:
+            if run in open_runs:
+                index = open_runs[run]
+                rects[index][2] += 1
+            else:
+                index = len(rects)
+                rects.append([run[0], r, 1, run[1]])
+            next_open[run] = index
+        open_runs = next_open
+    path = PDFPathObject()
+    for col, top, height, width in rects:
+        path.rect(col, n - top - height, width, height)
+    return n, path
+
+
+# Yol nesnesi tuvalden bağımsızdır; PDF operatörleri bir kez üretilip tekrar kullanılır
+qr_path = lru_cache(maxsize=app.config['QR_MATRIX_CACHE_SIZE'])(_build_path)
+
+
+def _form_name(payload):
+    return 'qr_' + hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def draw_qr(c, payload, x, y, size):
+    """QR kodunu (x, y) sol alt köşesine size x size olarak vektörel çiz"""
+    payload = str(payload)
+    name = _form_name(payload)
+    n, path = qr_path(payload)
+    if not c.hasForm(name):
+        c.beginForm(name, 0, 0, n, n)
+        c.setFillColorRGB(0, 0, 0)
+        c.drawPath(path, stroke=0, fill=1)
+        c.endForm()
+    scale = size / n
+    c.saveState()
+    c.translate(x, y)
+    c.scale(scale, scale)
+    c.doForm(name)
+    c.restoreState()
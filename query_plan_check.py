@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sorgu planı regresyon kontrolü
+
+Ödünç/iade, gecikme, pano ve rapor sayfalarındaki sıcak transactions
+sorgularının EXPLAIN planlarını alır ve transactions tablosu baştan sona
+taranıyorsa (SQLite 'SCAN [TABLE] transactions', PostgreSQL 'Seq Scan') hata verir.
+Yalnızca aktif ödünçleri içeren kısmi indeksler üzerindeki tarama kabul edilir.
+
+Varsayılan olarak geçici bir SQLite veritabanı oluşturulur, şema
+güncellemeleri uygulanır ve örnek veriyle doldurulur; gerçek veritabanına
+dokunulmaz. PostgreSQL planlarını denetlemek için boş bir deneme
+veritabanı verilebilir:
+
+    python query_plan_check.py
+    python query_plan_check.py --database-url postgresql://.../deneme --rows 50000
+    python query_plan_check.py --database-url sqlite:///kopya.db --no-seed
+
+Çıkış kodu: 0 tüm planlar indeksli, 1 regresyon var.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Tam taramasına izin verilen (yalnızca aktif ödünçleri içeren) kısmi indeksler
+PARTIAL_INDEXES = ('ix_transactions_active_due_date', 'ix_transactions_active_isbn')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='transactions sorgu planı kontrolü')
+    parser.add_argument('--database-url', help='Deneme veritabanı (varsayılan: geçici SQLite)')
+    parser.add_argument('--rows', type=int, default=20000, help='Örnek işlem sayısı')
+    parser.add_argument('--no-seed', action='store_true', help='Örnek veri ekleme (mevcut veriyle kontrol)')
+    return parser.parse_args()
+
+
+def seed(rows):
+    """Gerçekçi dağılımda kitap, üye ve işlem (yaklaşık %5'i aktif ödünç) ekle"""
+    from models import db, Book, Member, Transaction
+
+    rng = random.Random(42)
+    book_count, member_count = max(rows // 10, 100), max(rows // 40, 50)
+    db.session.bulk_insert_mappings(Book, [
+        {'isbn': f'978{i:010d}', 'title': f'Kitap {i}', 'quantity': 2} for i in range(book_count)
+    ])
+    db.session.bulk_insert_mappings(Member, [
+        {'id': 100000 + i, 'ad_soyad': f'Üye {i}'} for i in range(member_count)
+    ])
+    start = datetime.now() - timedelta(days=730)
+    transactions = []
+    for i in range(rows):
+        borrowed = start + timedelta(minutes=rng.randrange(730 * 24 * 60))
+        due = borrowed + timedelta(days=14)
+        active = rng.random() < 0.05
+        returned = None if active else borrowed + timedelta(days=rng.randrange(1, 20))
+        transactions.append({
+            'isbn': f'978{rng.randrange(book_count):010d}',
+            'member_id': 100000 + rng.randrange(member_count),
+            'borrow_date': borrowed.replace(microsecond=0),
+            'due_date': due.replace(hour=23, minute=59, second=59, microsecond=0),
+            'return_date': returned.replace(microsecond=0) if returned else None
+        })
+    db.session.bulk_insert_mappings(Transaction, transactions)
+    db.session.commit()
+
+
+def key_queries():
+    """(ad, sorgu) çiftleri; uygulamadaki sorgularla aynı koşullar"""
+    from models import db, Book, Member, Transaction
+    from transaction_dates import day_start, days_between
+
+    sample = db.session.query(Transaction.isbn, Transaction.member_id).first()
+    isbn, member_id = sample if sample else ('9780000000000', 1)
+    today = day_start()
+    tomorrow = today + timedelta(days=1)
+    month_ago = today - timedelta(days=30)
+
+    return [
+        ('Kitabın aktif ödünçleri (müsaitlik)',
+         Transaction.query.filter(Transaction.isbn == isbn, Transaction.return_date.is_(None))),
+        ('Üyenin aktif ödünçleri',
+         Transaction.query.filter(Transaction.member_id == member_id, Transaction.return_date.is_(None))
+         .order_by(Transaction.due_date)),
+        ('Üyenin geçmişi',
+         Transaction.query.filter(Transaction.member_id == member_id).order_by(Transaction.borrow_date.desc())),
+        ('Geciken ödünçler listesi',
+         db.session.query(Transaction, Book, Member, days_between(Transaction.due_date, today))
+         .join(Book, Transaction.isbn == Book.isbn).join(Member, Transaction.member_id == Member.id)
+         .filter(Transaction.return_date.is_(None), Transaction.due_date < today)
+         .order_by(Transaction.due_date)),
+        ('Geciken ödünç sayısı (pano)',
+         db.session.query(db.func.count(Transaction.id))
+         .filter(Transaction.return_date.is_(None), Transaction.due_date < today)),
+        ('Bugün teslim edilecekler',
+         db.session.query(db.func.count(Transaction.id))
+         .filter(Transaction.return_date.is_(None), Transaction.due_date >= today,
+                 Transaction.due_date < tomorrow)),
+        ('Aktif ödünç sayısı (pano)',
+         db.session.query(db.func.count(Transaction.id)).filter(Transaction.return_date.is_(None))),
+        ('Bugünkü işlemler (pano)',
+         db.session.query(db.func.count(Transaction.id))
+         .filter(Transaction.borrow_date >= today, Transaction.borrow_date < tomorrow)),
+        ('Son 30 gün en çok okunanlar (rapor)',
+         db.session.query(Book.isbn, db.func.count(Transaction.id).label('borrow_count'))
+         .join(Transaction).filter(Transaction.borrow_date >= month_ago).group_by(Book.isbn)),
+        ('Ödünç sayaçlarını yeniden hesaplama',
+         db.session.query(Transaction.isbn, db.func.count(Transaction.id))
+         .filter(Transaction.return_date.is_(None)).group_by(Transaction.isbn)),
+    ]
+
+
+def _driver_params(compiled):
+    params = compiled.construct_params()
+    # EXPLAIN için tür dönüştürücüleri çalışmaz; tarihler metin olarak verilir
+    params = {k: str(v) if isinstance(v, (date, datetime)) else v for k, v in params.items()}
+    if compiled.positional:
+        return tuple(params[name] for name in compiled.positiontup)
+    return params
+
+
+def explain(connection, query):
+    """Plan satırları (metin)"""
+    statement = query.statement if hasattr(query, 'statement') else query
+    compiled = statement.compile(dialect=connection.dialect)
+    params = _driver_params(compiled)
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+        return [row[-1] for row in rows]
+    rows = connection.exec_driver_sql(f'EXPLAIN {compiled}', params).fetchall()
+    return [row[0] for row in rows]
+
+
+def full_scans(plan, dialect):
+    """Plandaki transactions tam taramaları"""
+    problems = []
+    for line in plan:
+        if dialect == 'sqlite':
+            match = re.search(r'\bSCAN (?:TABLE )?transactions\b(?: USING (?:COVERING )?INDEX (\w+))?', line)
+            if match and match.group(1) not in PARTIAL_INDEXES:
+                problems.append(line.strip())
+        elif re.search(r'Seq Scan on transactions\b', line):
+            problems.append(line.strip())
+    return problems
+
+
+def main():
+    args = parse_args()
+    temp_path = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        fd, temp_path = tempfile.mkstemp(suffix='.db', prefix='plan_check_')
+        os.close(fd)
+        os.environ['DATABASE_URL'] = f'sqlite:///{temp_path}'
+
+    from config import app, init_database
+    from models import db, Transaction
+
+    try:
+        init_database()
+        with app.app_context():
+            if not args.no_seed:
+                if Transaction.query.first() is not None:
+                    print("❌ Veritabanında işlem var; örnek veri yalnızca boş deneme veritabanına eklenir (--no-seed)")
+                    return False
+                print(f"🌱 {args.rows} örnek işlem ekleniyor...")
+                seed(args.rows)
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+            # SQLite istatistikleri bağlantı açılırken yükler; havuzdaki eski bağlantıları bırak
+            db.session.remove()
+            db.engine.dispose()
+
+            connection = db.session.connection()
+            dialect = connection.dialect.name
+            failures = 0
+            for name, query in key_queries():
+                plan = explain(connection, query)
+                problems = full_scans(plan, dialect)
+                if problems:
+                    failures += 1
+                    print(f"❌ {name}")
+                    for line in plan:
+                        print(f"      {line}")
+                else:
+                    print(f"✅ {name}")
+            if failures:
+                print(f"❌ {failures} sorgu transactions tablosunu tam tarıyor")
+                return False
+            print("🎉 Tüm sorgu planları indeks kullanıyor")
+            return True
+    finally:
+        if temp_path:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
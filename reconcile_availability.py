@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kitap ödünç sayaçlarını onarma scripti
+books.borrowed_count değerlerini transactions tablosundaki aktif ödünçlerden yeniden hesaplar
+"""
+
+import os
+import sys
+
+# Add current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import app
+from utils import reconcile_book_availability
+
+def main():
+    with app.app_context():
+        try:
+            print("🔄 Ödünç sayaçları yeniden hesaplanıyor...")
+            result = reconcile_book_availability()
+            print(f"✅ {result['checked']} kitap kontrol edildi, {result['fixed']} sayaç düzeltildi")
+            return True
+        except Exception as e:
+            print(f"❌ Hata: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
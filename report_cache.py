@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Üretilmiş rapor dosyaları (PDF/XLSX) için disk önbelleği
+
+Her dosya (rapor türü, parametreler, veri sürümü) ile anahtarlanır. Veri
+sürümü kitap/üye/işlem yazmalarında artan 'catalog' sayacıdır (bkz.
+data_version.py); hiçbir şey değişmediyse tekrar indirmeler diskten
+milisaniyeler içinde gönderilir. Aynı rapor için eski sürüm dosyaları yeni
+sürüm yazılınca silinir; toplam boyut REPORT_CACHE_MAX_BYTES'ı aşarsa en
+uzun süredir kullanılmayanlar silinir.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from config import app
+from data_version import get_version
+
+
+app.config.setdefault('REPORT_CACHE_ENABLED', True)
+app.config.setdefault('REPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+_stats_lock = threading.Lock()
+
+
+def cache_dir():
+    path = app.config.get('REPORT_CACHE_DIR') or os.path.join(app.root_path, 'reports', 'cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _report_prefix(report_type, params):
+    encoded = json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{report_type}-{hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:20]}-v"
+
+
+def cached_report(report_type, params, suffix, build):
+    """Raporun önbellekteki dosya yolunu döner; yoksa build(yol) ile üretir.
+
+    build verilen yola dosyayı yazmalıdır. Dönen dosya silinmemeli, doğrudan
+    send_file ile gönderilmelidir.
+    """
+    directory = cache_dir()
+    prefix = _report_prefix(report_type, params)
+    filename = f"{prefix}{get_version()}{suffix}"
+    path = os.path.join(directory, filename)
+
+    if app.config['REPORT_CACHE_ENABLED'] and os.path.exists(path):
+        try:
+            os.utime(path)  # LRU için son kullanım
+        except OSError:
+            pass
+        _count('hits')
+        return path
+
+    _count('misses')
+    # Uzantı korunur (pandas/openpyxl biçimi uzantıdan anlar); nokta ile başlayan adlar taramada atlanır
+    tmp_path = os.path.join(directory, f".{filename}.{os.getpid()}-{threading.get_ident()}{suffix}")
+    try:
+        build(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # Aynı raporun eski sürümleri artık kullanılmaz
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name != filename:
+            _remove(os.path.join(directory, name))
+    evict()
+    return path
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        # Windows'ta gönderilmekte olan dosya silinemez; sonraki temizlikte denenir
+        return False
+
+
+def _entries():
+    directory = cache_dir()
+    entries = []
+    for name in os.listdir(directory):
+        if name.startswith('.'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def evict(max_bytes=None):
+    """Toplam boyut sınırın altına inene kadar en eski kullanılan dosyaları sil"""
+    max_bytes = app.config['REPORT_CACHE_MAX_BYTES'] if max_bytes is None else max_bytes
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        if _remove(path):
+            total -= size
+            _count('evictions')
+    return total
+
+
+def clear():
+    for _, _, path in _entries():
+        _remove(path)
+
+
+def stats():
+    entries = _entries()
+    with _stats_lock:
+        result = dict(_stats)
+    result.update({
+        'files': len(entries),
+        'bytes': sum(size for _, size, _ in entries),
+        'max_bytes': app.config['REPORT_CACHE_MAX_BYTES'],
+        'data_version': get_version()
+    })
+    return result
+
+
+def write_buffer(buffer, path):
+    """BytesIO döndüren üreticiler için build yardımcısı"""
+    with open(path, 'wb') as f:
+        f.write(buffer.getvalue())
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Büyük liste raporları için akışlı PDF üretimi
+
+Satırlar veritabanından sunucu tarafı imleçle (yield_per) sayfa sayfa
+çekilir, her satır okunduğu anda tuvale çizilir ve sayfa dolunca
+showPage() ile kapatılır; satır listesi ya da ORM nesneleri bellekte
+biriktirilmez. Sıralama ve toplamlar SQL'de yapılır. Çıktı geçici dosyaya
+yazılır ve send_file ile gönderilir.
+
+Not: ReportLab tamamlanan sayfaları save() çağrısına kadar sıkıştırılmış
+olarak tutar; bu sayfa başına birkaç KB'tır, 100 bin satırlık işlem
+geçmişi için bile satır verisine göre ihmal edilebilir.
+"""
+
+import os
+import tempfile
+import unicodedata
+from datetime import datetime
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4, landscape
+
+from config import app
+from models import db, Book, Member, Transaction
+from transaction_dates import format_datetime
+
+
+app.config.setdefault('REPORT_FETCH_SIZE', 1000)
+
+REPORT_TITLE = "CUMHURİYET ANADOLU LİSESİ KÜTÜPHANESİ"
+
+_TR_ASCII = {
+    'İ': 'I', 'ı': 'i', 'Ğ': 'G', 'ğ': 'g', 'Ü': 'U', 'ü': 'u',
+    'Ş': 'S', 'ş': 's', 'Ö': 'O', 'ö': 'o', 'Ç': 'C', 'ç': 'c'
+}
+
+
+def to_ascii(text):
+    """Türkçe karakterleri ASCII'ye çevir (normalize + diacritic remove)"""
+    if not text:
+        return ''
+    for tr, en in _TR_ASCII.items():
+        text = text.replace(tr, en)
+    normalized = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in normalized if unicodedata.category(ch) != 'Mn')
+
+
+def column_layout(subtitle, headers):
+    """Liste türüne göre (x konumları, en fazla karakter) sütun dağılımı"""
+    subtitle_ascii = to_ascii(subtitle).lower()
+    # Kitap raporu - daha fazla sütun (Dolap, Raf eklenmiş -> 9 sütun)
+    if 'kitap' in subtitle_ascii and len(headers) >= 9:
+        # Sıra, ISBN, Kitap, Yazar, Yayınevi, Kategori, Dolap, Raf, Mevcut/Toplam
+        return [20, 70, 130, 300, 430, 520, 600, 680, 760], [4, 13, 32, 22, 20, 12, 6, 6, 10]
+    if 'kitap' in subtitle_ascii and len(headers) == 8:
+        # Sıra, ISBN, Kitap, Yazar, Yayınevi, Kategori, Raf, Mevcut/Toplam
+        return [20, 70, 130, 300, 430, 520, 680, 760], [4, 13, 34, 22, 20, 12, 6, 10]
+    # Kitap raporu - 7 sütun (landscape)
+    if 'kitap' in subtitle_ascii and len(headers) >= 7:
+        return [30, 90, 170, 380, 500, 590, 700], [4, 13, 42, 24, 30, 16, 12]
+    if 'kitap' in subtitle_ascii and len(headers) >= 6:
+        return [30, 90, 210, 400, 480, 540], [4, 13, 36, 22, 16, 12]
+    # Üyeler raporu - 5 sütun (Öğrenci No ve E-posta kaldırıldı)
+    if ('uye' in subtitle_ascii or 'üye' in subtitle.lower()) and len(headers) >= 5:
+        return [40, 220, 350, 480, 600], [4, 36, 14, 14, 14]
+    # İşlemler raporu - 7 sütun (landscape)
+    if ('islem' in subtitle_ascii or 'işlem' in subtitle.lower()) and len(headers) >= 7:
+        return [30, 120, 220, 480, 620, 720, 800], [4, 13, 34, 24, 14, 14, 10]
+    if ('islem' in subtitle_ascii or 'işlem' in subtitle.lower()) and len(headers) >= 6:
+        return [40, 100, 320, 430, 510, 560], [4, 30, 22, 14, 14, 10]
+    # Varsayılan dağılım
+    if len(headers) == 7:
+        return [30, 90, 180, 300, 400, 500, 560], [4, 13, 24, 18, 14, 14, 10]
+    if len(headers) == 6:
+        return [50, 120, 200, 320, 420, 500], [6, 12, 18, 14, 12, 10]
+    if len(headers) == 5:
+        return [50, 130, 230, 350, 470], [6, 18, 18, 16, 14]
+    return [50, 150, 250, 350, 450], [16, 16, 16, 16, 16]
+
+
+def render_list_pdf(output, title, subtitle, headers, rows, stats_text):
+    """Satırları geldikçe çizerek yatay A4 liste PDF'i yaz.
+
+    output: dosya yolu ya da yazılabilir dosya nesnesi. rows herhangi bir
+    iterable olabilir (üreteç önerilir). stats_text çağrılabilir ise satırlar
+    bittikten sonra çağrılır.
+    """
+    c = canvas.Canvas(output, pagesize=landscape(A4), pageCompression=1)
+    width, height = landscape(A4)
+
+    # Header
+    c.setFont('Helvetica-Bold', 8)
+    title_ascii = to_ascii(title)
+    title_width = c.stringWidth(title_ascii, 'Helvetica-Bold', 16)
+    c.drawString((width - title_width) / 2, height - 50, title_ascii)
+
+    subtitle_ascii = to_ascii(subtitle)
+    subtitle_width = c.stringWidth(subtitle_ascii, 'Helvetica-Bold', 14)
+    c.drawString((width - subtitle_width) / 2, height - 80, subtitle_ascii)
+
+    # Date
+    date_str = f"Rapor Tarihi: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+    c.setFont('Helvetica', 8)
+    date_width = c.stringWidth(date_str, 'Helvetica', 10)
+    c.drawString((width - date_width) / 2, height - 100, date_str)
+
+    # Table headers
+    y = height - 140
+    c.setFont('Helvetica-Bold', 9)
+    x_positions, max_lengths = column_layout(subtitle, headers)
+    for i, header in enumerate(headers[:len(x_positions)]):
+        c.drawString(x_positions[i], y, to_ascii(header))
+    c.line(40, y-5, width-40, y-5)
+
+    # Table rows
+    y -= 22
+    c.setFont('Helvetica', 8)
+    for row in rows:
+        if y < 50:  # New page
+            c.showPage()
+            y = height - 50
+            c.setFont('Helvetica', 8)
+
+        for i, cell in enumerate(row[:len(x_positions)]):
+            cell_ascii = to_ascii(str(cell))
+            # Sütun bazlı truncation
+            max_len = max_lengths[i] if i < len(max_lengths) else 15
+            if len(cell_ascii) > max_len:
+                cell_ascii = cell_ascii[:max(3, max_len - 3)] + '...'
+            c.drawString(x_positions[i], y, cell_ascii)
+        y -= 13
+
+    # Stats
+    if y < 80:
+        c.showPage()
+        y = height - 50
+    if callable(stats_text):
+        stats_text = stats_text()
+    c.setFont('Helvetica-Bold', 8)
+    c.drawString(50, y - 20, to_ascii(stats_text))
+
+    c.save()
+
+
+def _truncate(value, limit):
+    value = value or ''
+    return value[:limit - 3] + '...' if len(value) > limit else value
+
+
+def _stream(query):
+    """Sorgu sonuçlarını sunucu tarafı imleçle sayfa sayfa getir"""
+    return query.execution_options(stream_results=True).yield_per(app.config['REPORT_FETCH_SIZE'])
+
+
+# --- Satır biçimleyiciler (ORM nesnesi ya da aynı adlı sütunları olan satır) ---
+
+def book_rows(books):
+    for i, book in enumerate(books, 1):
+        quantity = book.quantity or 0
+        borrowed = book.borrowed_count or 0
+        yield [
+            str(i),
+            book.isbn or '-',
+            _truncate(book.title or 'Bilinmiyor', 30),
+            _truncate(book.authors or 'Bilinmiyor', 25),
+            _truncate(book.publishers or '-', 30),
+            book.category or 'Belirtilmemiş',
+            book.cupboard or '-',
+            book.shelf or '-',
+            f"{max(0, quantity - borrowed)}/{quantity}"
+        ]
+
+
+def member_rows(members):
+    for i, member in enumerate(members, 1):
+        yield [
+            str(i),
+            _truncate(member.ad_soyad or 'Bilinmiyor', 25),
+            member.sinif or '-',
+            member.numara or '-',
+            member.uye_turu or 'Öğrenci'
+        ]
+
+
+def transaction_rows(transactions):
+    for i, t in enumerate(transactions, 1):
+        if t.book_title is not None:
+            book_title = _truncate(t.book_title, 25)
+        else:
+            book_title = f"ISBN: {t.isbn}" if t.isbn else 'Bilinmiyor'
+        if t.member_name is not None:
+            member_name = _truncate(t.member_name, 20)
+        else:
+            member_name = f"ID: {t.member_id}" if t.member_id else 'Bilinmiyor'
+        return_date = format_datetime(t.return_date) or '-'
+        yield [
+            str(i),
+            t.isbn or '-',
+            book_title,
+            member_name,
+            format_datetime(t.borrow_date) or '-',
+            return_date,
+            'İade Edildi' if return_date != '-' else 'Ödünç'
+        ]
+
+
+# --- Veritabanından akışlı raporlar ---
+
+def _sort_text(column):
+    return db.func.lower(db.func.coalesce(db.func.trim(column), ''))
+
+
+def books_report_query():
+    """Dolap -> raf -> başlık sırasında rapor sütunları"""
+    return db.session.query(
+        Book.isbn, Book.title, Book.authors, Book.publishers, Book.category,
+        Book.cupboard, Book.shelf, Book.quantity, Book.borrowed_count
+    ).order_by(_sort_text(Book.cupboard), _sort_text(Book.shelf), _sort_text(Book.title), Book.isbn)
+
+
+def members_report_query():
+    """Sınıf -> numara -> ad sırasında rapor sütunları"""
+    return db.session.query(
+        Member.id, Member.ad_soyad, Member.sinif, Member.numara, Member.uye_turu
+    ).order_by(db.func.coalesce(Member.sinif, ''), db.func.coalesce(Member.numara, ''),
+               db.func.coalesce(Member.ad_soyad, ''), Member.id)
+
+
+def transactions_report_query():
+    """En yeni ödünç en üstte; kitap ve üye adı tek sorguda (satır başına sorgu yok)"""
+    return db.session.query(
+        Transaction.id, Transaction.isbn, Transaction.member_id, Transaction.borrow_date,
+        Transaction.return_date,
+        Book.title.label('book_title'), Member.ad_soyad.label('member_name')
+    ).outerjoin(Book, Book.isbn == Transaction.isbn)\
+     .outerjoin(Member, Member.id == Transaction.member_id)\
+     .order_by(Transaction.borrow_date.desc(), Transaction.id.desc())
+
+
+def _books_stats():
+    return f"Toplam Kitap Sayısı: {Book.query.count()}"
+
+
+def _members_stats():
+    return f"Toplam Üye Sayısı: {Member.query.count()}"
+
+
+def _transactions_stats():
+    total, active = db.session.query(
+        db.func.count(Transaction.id),
+        db.func.count(Transaction.id).filter(Transaction.return_date.is_(None))
+    ).one()
+    return f"Toplam İşlem: {total} | Aktif Ödünç: {active} | Tamamlanan: {total - active}"
+
+
+REPORTS = {
+    'books': {
+        'subtitle': 'Kitaplar Listesi',
+        'headers': ['Sıra', 'ISBN', 'Kitap Adı', 'Yazar', 'Yayınevi', 'Kategori', 'Dolap', 'Raf', 'Mevcut/Toplam'],
+        'query': books_report_query, 'rows': book_rows, 'stats': _books_stats,
+        'filename': 'kitaplar_liste.pdf'
+    },
+    'members': {
+        'subtitle': 'Üyeler Listesi',
+        'headers': ['Sıra', 'Ad Soyad', 'Sınıf', 'Numara', 'Üye Türü'],
+        'query': members_report_query, 'rows': member_rows, 'stats': _members_stats,
+        'filename': 'uyeler_liste.pdf'
+    },
+    'transactions': {
+        'subtitle': 'İşlemler Listesi',
+        'headers': ['Sıra', 'ISBN', 'Kitap', 'Üye', 'Ödünç Tarihi', 'İade Tarihi', 'Durum'],
+        'query': transactions_report_query, 'rows': transaction_rows, 'stats': _transactions_stats,
+        'filename': 'islemler_liste.pdf'
+    },
+}
+
+
+def write_list_report(report_type, path):
+    """Raporu verilen yola akışlı üret"""
+    spec = REPORTS[report_type]
+    rows = spec['rows'](_stream(spec['query']()))
+    render_list_pdf(path, REPORT_TITLE, spec['subtitle'], spec['headers'], rows, spec['stats'])
+
+
+def build_list_report(report_type, directory=None):
+    """Raporu geçici dosyaya akışlı üret; (dosya yolu, indirme adı) döner"""
+    fd, path = tempfile.mkstemp(suffix='.pdf', prefix=f'rapor_{report_type}_', dir=directory)
+    os.close(fd)
+    try:
+        write_list_report(report_type, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, REPORTS[report_type]['filename']
@@ -7,7 +7,10 @@ import os
 
 from config import app, get_setting
 from models import db, User, Book, Member, Transaction, Category, BookCategory, Notification, SearchHistory, Review, Reservation, Fine, ActivityLog, Settings, EmailTemplate, OnlineBorrowRequest, QRCode
-from utils import log_activity, save_qr_code, send_email, normalize_text_tr, compute_relevance_score
+from utils import log_activity, save_qr_code, send_email
+from search_index import search_books
+from fuzzy_index import book_fuzzy_index
+from transaction_dates import parse_datetime, day_start, days_between
 
 # Role required decorator
 def role_required(role):
@@ -110,13 +113,16 @@ def index():
     available_books = total_books - borrowed_books
     
     # Additional statistics
+    # date(borrow_date) indeksi kullanamaz; aynı gün aralık olarak sorgulanır
+    today = day_start()
     today_transactions = Transaction.query.filter(
-        db.func.date(Transaction.borrow_date) == datetime.now().date()
+        Transaction.borrow_date >= today,
+        Transaction.borrow_date < today + timedelta(days=1)
     ).count()
     
     overdue_books = db.session.query(Transaction).filter(
         Transaction.return_date == None,
-        Transaction.due_date < datetime.now().strftime("%Y-%m-%d")
+        Transaction.due_date < today
     ).count()
     
     active_reservations = Reservation.query.filter_by(status='active').count()
@@ -166,8 +172,8 @@ def book_detail(isbn):
     categories = [cat[0] for cat in categories]
     
     # Get availability info
-    borrowed_count = Transaction.query.filter_by(isbn=isbn, return_date=None).count()
-    available_count = book.quantity - borrowed_count
+    borrowed_count = book.borrowed_count or 0
+    available_count = book.available_count
     
     # Get reviews
     reviews = Review.query.filter_by(isbn=isbn)\
@@ -222,10 +228,10 @@ def dashboard():
         'borrowed_books': Transaction.query.filter_by(return_date=None).count(),
         'overdue_books': Transaction.query.filter(
             Transaction.return_date == None,
-            Transaction.due_date < datetime.now().strftime("%Y-%m-%d")
+            Transaction.due_date < day_start()
         ).count(),
         'monthly_transactions': Transaction.query.filter(
-            Transaction.borrow_date >= (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+            Transaction.borrow_date >= day_start() - timedelta(days=30)
         ).count(),
         'daily_average': 0
     }
@@ -235,15 +241,16 @@ def dashboard():
     # Monthly chart data
     monthly_data = []
     for i in range(11, -1, -1):
-        month_start = (datetime.now() - timedelta(days=i*30)).strftime("%Y-%m")
+        month_start = day_start((datetime.now() - timedelta(days=i*30)).date().replace(day=1))
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
         borrows = Transaction.query.filter(
-            Transaction.borrow_date.like(f"{month_start}%")
+            Transaction.borrow_date >= month_start, Transaction.borrow_date < next_month
         ).count()
         returns = Transaction.query.filter(
-            Transaction.return_date.like(f"{month_start}%")
+            Transaction.return_date >= month_start, Transaction.return_date < next_month
         ).count()
         monthly_data.append({
-            'month': month_start,
+            'month': month_start.strftime("%Y-%m"),
             'borrows': borrows,
             'returns': returns
         })
@@ -265,7 +272,7 @@ def dashboard():
         Book.isbn, Book.title, Book.authors, Book.average_rating,
         db.func.count(Transaction.id).label('borrow_count')
     ).join(Transaction).filter(
-        Transaction.borrow_date >= (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+        Transaction.borrow_date >= day_start() - timedelta(days=30)
     ).group_by(Book.isbn).order_by(db.text('borrow_count DESC')).limit(10).all()
     
     # None rating'leri 0'a çevir
@@ -285,7 +292,7 @@ def dashboard():
         Member.reliability_score.label('reliability'),
         db.func.count(Transaction.id).label('borrow_count')
     ).join(Transaction).filter(
-        Transaction.borrow_date >= (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+        Transaction.borrow_date >= day_start() - timedelta(days=30)
     ).group_by(Member.id).order_by(db.text('borrow_count DESC')).limit(10).all()
     
     # Recent activities
@@ -379,21 +386,20 @@ def my_books():
         flash('Henüz üyelik kaydınız oluşturulmamış', 'warning')
         return redirect(url_for('profile'))
     
-    # Current books with enhanced data
-    current_books_query = db.session.query(Transaction, Book).join(Book)\
+    # Current books with enhanced data (kalan gün SQL'de hesaplanır)
+    current_books_query = db.session.query(
+        Transaction, Book, days_between(datetime.now(), Transaction.due_date).label('days_left')
+    ).join(Book)\
         .filter(Transaction.member_id == member.id, Transaction.return_date == None)\
         .order_by(Transaction.due_date).all()
     
     # Process current books with additional calculations
+    max_renew = int(get_setting('max_renew_count', '2'))
     current_books_data = []
-    for transaction, book in current_books_query:
-        # Calculate days left
-        due_date = datetime.strptime(transaction.due_date, '%Y-%m-%d')
-        today = datetime.now()
-        days_left = (due_date.date() - today.date()).days
+    for transaction, book, days_left in current_books_query:
+        days_left = days_left or 0
         
         # Check if can renew
-        max_renew = int(get_setting('max_renew_count', '2'))
         can_renew = transaction.renew_count < max_renew and not transaction.return_date
         
         current_books_data.append({
@@ -468,69 +474,41 @@ def search():
         
         # Search books - geliştirilmiş alaka ve filtreleme
         if search_type in ['all', 'books']:
-            norm_query = normalize_isbn(query)
-            # Ön eleme (DB)
-            base = Book.query
-            like_q = f"%{query}%"
-            isbn_like = f"%{norm_query}%" if norm_query else like_q
-            if title_only:
-                base = base.filter(Book.title.ilike(like_q))
-            else:
-                base = base.filter(
-                    db.or_(
-                        Book.title.ilike(like_q),
-                        Book.authors.ilike(like_q),
-                        db.func.replace(db.func.replace(Book.isbn, '-', ''), ' ', '').like(isbn_like),
-                        Book.publishers.ilike(like_q)
-                    )
-                )
-            candidates = base.limit(500).all()
-
-            # Alaka puanı hesapla ve filtrele
-            scored = []
-            nq = normalize_text_tr(query)
-            # Dinamik eşik: daha uzun sorgu -> daha yüksek eşik
-            q_len = len(nq)
-            if q_len >= 9:
-                threshold = 65
-            elif q_len >= 6:
-                threshold = 55
-            elif q_len >= 3:
-                threshold = 45
-            else:
-                threshold = 0
-
-            # Token bazlı zorlama: tüm temel token'lar başlıkta geçsin (2+ karakterli tokenlar)
-            tokens = [t for t in nq.split(' ') if len(t) >= 2]
-
-            for book in candidates:
-                title_n = normalize_text_tr(book.title)
-                # Token şartı (yalnızca title_only açıkken sıkı uygula)
-                if title_only and tokens and not all(tok in title_n for tok in tokens):
-                    continue
-
-                score = compute_relevance_score(query, book.title, book.authors, book.publishers)
-                # ISBN tam eşleşme bonusu
-                if norm_query and normalize_isbn(book.isbn) == norm_query:
-                    score += 200
-                if score < threshold:
-                    continue
-                borrowed = Transaction.query.filter_by(isbn=book.isbn, return_date=None).count()
-                available = (book.quantity or 0) - borrowed
-                scored.append((score, book, available))
-
-            scored.sort(key=lambda x: x[0], reverse=True)
-
-            # Sayfalama (manuel)
             per_page = 20
-            start = (page - 1) * per_page
-            end = start + per_page
-            page_items = scored[start:end]
-
-            for _, book, available in page_items:
-                results['books'].append({'book': book, 'available': available})
-
-            results['total'] += len(scored)
+            # Tam metin indeksi (FTS5 / tsvector): sıralama ve sayfalama veritabanında
+            fts_result = search_books(query, page=page, per_page=per_page,
+                                      columns=('title',) if title_only else None)
+            if fts_result is not None and fts_result[1] > 0:
+                page_books, fts_total = fts_result
+                for book in page_books:
+                    results['books'].append({'book': book, 'available': book.available_count})
+                results['total'] += fts_total
+            else:
+                # İndeks yoksa ya da yazım hatası nedeniyle eşleşme yoksa: trigram ile bulanık arama
+                matches = book_fuzzy_index.search(query, title_only=title_only)
+
+                # ISBN eşleşmeleri (tam eşleşme en üstte, ardından kısmi ISBN) her zaman önce
+                norm_query = normalize_isbn(query)
+                if norm_query and not title_only and any(ch.isdigit() for ch in norm_query):
+                    plain_isbn = db.func.replace(db.func.replace(Book.isbn, '-', ''), ' ', '')
+                    isbn_hits = [row[0] for row in db.session.query(Book.isbn)
+                                 .filter(plain_isbn.like(f'%{norm_query}%'))
+                                 .order_by((plain_isbn == norm_query).desc(), Book.isbn)
+                                 .limit(app.config['SEARCH_FUZZY_TOP_K'])]
+                    if isbn_hits:
+                        hit_set = set(isbn_hits)
+                        matches = [(isbn, None) for isbn in isbn_hits] + [m for m in matches if m[0] not in hit_set]
+
+                # Sayfalama (manuel)
+                start = (page - 1) * per_page
+                page_isbns = [isbn for isbn, _ in matches[start:start + per_page]]
+                books_by_isbn = {book.isbn: book for book in Book.query.filter(Book.isbn.in_(page_isbns)).all()} if page_isbns else {}
+                for isbn in page_isbns:
+                    book = books_by_isbn.get(isbn)
+                    if book:
+                        results['books'].append({'book': book, 'available': book.available_count})
+
+                results['total'] += len(matches)
         
         # Search members (only for admins/librarians)
         if search_type in ['all', 'members'] and current_user.is_authenticated \
@@ -588,14 +566,22 @@ def reports():
     # Get date range from query params
     start_date = request.args.get('start_date', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
     end_date = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
+    try:
+        range_start = parse_datetime(start_date) or day_start() - timedelta(days=30)
+        range_end = (parse_datetime(end_date) or day_start()).replace(hour=0, minute=0, second=0)
+    except ValueError:
+        flash('Geçersiz tarih aralığı', 'warning')
+        range_start, range_end = day_start() - timedelta(days=30), day_start()
+    # Bitiş günü dahil
+    range_end += timedelta(days=1)
     
     # Most borrowed books
     most_borrowed = db.session.query(
         Book.isbn, Book.title, Book.authors,
         db.func.count(Transaction.id).label('borrow_count')
     ).join(Transaction).filter(
-        Transaction.borrow_date >= start_date,
-        Transaction.borrow_date <= end_date
+        Transaction.borrow_date >= range_start,
+        Transaction.borrow_date < range_end
     ).group_by(Book.isbn).order_by(db.text('borrow_count DESC')).limit(10).all()
     
     # Most active members
@@ -603,8 +589,8 @@ def reports():
         Member.id, Member.ad_soyad,
         db.func.count(Transaction.id).label('transaction_count')
     ).join(Transaction).filter(
-        Transaction.borrow_date >= start_date,
-        Transaction.borrow_date <= end_date
+        Transaction.borrow_date >= range_start,
+        Transaction.borrow_date < range_end
     ).group_by(Member.id).order_by(db.text('transaction_count DESC')).limit(10).all()
     
     # Category statistics
@@ -615,8 +601,8 @@ def reports():
      .join(Book, BookCategory.book_isbn == Book.isbn)\
      .join(Transaction, Book.isbn == Transaction.isbn)\
      .filter(
-        Transaction.borrow_date >= start_date,
-        Transaction.borrow_date <= end_date
+        Transaction.borrow_date >= range_start,
+        Transaction.borrow_date < range_end
      ).group_by(Category.name).all()
     
     # Daily transactions
@@ -624,8 +610,8 @@ def reports():
         db.func.date(Transaction.borrow_date).label('date'),
         db.func.count(Transaction.id).label('count')
     ).filter(
-        Transaction.borrow_date >= start_date,
-        Transaction.borrow_date <= end_date
+        Transaction.borrow_date >= range_start,
+        Transaction.borrow_date < range_end
     ).group_by(db.func.date(Transaction.borrow_date)).all()
     
     return render_template('reports.html',
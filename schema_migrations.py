@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hafif şema güncelleme adımları
+
+db.create_all() sadece eksik tabloları oluşturur; mevcut tablolara yeni
+sütun veya indeks eklemez. Bu modül eski veritabanlarını (yerel SQLite ve
+Railway PostgreSQL) sıralı ve idempotent adımlarla günceller. Uygulanan
+adımlar schema_migrations tablosunda tutulur.
+
+Kullanım: init_database() her açılışta upgrade_schema() çağırır;
+elle çalıştırmak için: python schema_migrations.py
+"""
+
+from datetime import datetime
+
+from sqlalchemy import inspect, text, String
+
+from models import db, SchemaMigration, Transaction
+from search_index import create_search_index
+from transaction_dates import parse_datetime, format_datetime
+
+
+def _column_exists(table, column):
+    columns = inspect(db.engine).get_columns(table)
+    return any(col['name'] == column for col in columns)
+
+
+def _column_is_text(table, column):
+    columns = inspect(db.engine).get_columns(table)
+    return any(col['name'] == column and isinstance(col['type'], String) for col in columns)
+
+
+def _add_column(table, column, ddl):
+    """Sütun yoksa ALTER TABLE ile ekle"""
+    if _column_exists(table, column):
+        return False
+    db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+    return True
+
+
+# --- Adımlar ---
+
+def _0001_book_borrowed_count():
+    """books.borrowed_count sayacını ekle ve transactions tablosundan doldur"""
+    _add_column('books', 'borrowed_count', 'INTEGER DEFAULT 0')
+    db.session.execute(text("""
+        UPDATE books SET borrowed_count = (
+            SELECT COUNT(*) FROM transactions t
+            WHERE t.isbn = books.isbn AND t.return_date IS NULL
+        )
+    """))
+
+
+def _0002_book_search_index():
+    """Tam metin arama indeksi: SQLite'ta FTS5, PostgreSQL'de GIN indeksli tsvector"""
+    create_search_index()
+
+
+def _0003_move_cover_blobs():
+    """books.cover_image BLOB'larını book_covers tablosuna taşı ve sütunu kaldır"""
+    if not _column_exists('books', 'cover_image'):
+        return
+    db.session.execute(text("""
+        INSERT INTO book_covers (isbn, image, updated_at)
+        SELECT isbn, cover_image, CURRENT_TIMESTAMP FROM books
+        WHERE cover_image IS NOT NULL
+          AND isbn NOT IN (SELECT isbn FROM book_covers)
+    """))
+    try:
+        with db.session.begin_nested():
+            db.session.execute(text('ALTER TABLE books DROP COLUMN cover_image'))
+    except Exception as e:
+        # Eski SQLite (< 3.35) DROP COLUMN desteklemez; en azından baytları boşalt
+        print(f"⚠️ books.cover_image sütunu kaldırılamadı, içerik temizleniyor: {e}")
+        db.session.execute(text('UPDATE books SET cover_image = NULL'))
+
+
+def _0004_transaction_indexes():
+    """transactions için bileşik ve kısmi (yalnızca aktif ödünçler) indeksler"""
+    connection = db.session.connection()
+    for index in Transaction.__table__.indexes:
+        index.create(bind=connection, checkfirst=True)
+    # Planlayıcı yeni indeksleri seçebilsin diye istatistikleri tazele
+    db.session.execute(text('ANALYZE transactions'))
+
+
+TRANSACTION_DATE_COLUMNS = ('borrow_date', 'due_date', 'return_date')
+
+
+def _normalize_transaction_dates(row):
+    """Bir satırın tarihlerini 'YYYY-MM-DD HH:MM:SS' biçimine getir; tanınmayanlar sayılır"""
+    values, invalid = {}, 0
+    for column in TRANSACTION_DATE_COLUMNS:
+        try:
+            values[column] = parse_datetime(getattr(row, column), end_of_day=(column == 'due_date'))
+        except ValueError:
+            values[column] = None
+            invalid += 1
+    # NULL olmayan her eski iade değeri (boş metin dahil) iade edilmiş demektir; eski
+    # sorgular ve 0001'deki borrowed_count 'return_date IS NULL' ile aktif ödünç sayar
+    if values['return_date'] is None and row.return_date is not None:
+        values['return_date'] = values['due_date'] or values['borrow_date'] or datetime(1970, 1, 1)
+    return {column: format_datetime(value) for column, value in values.items()}, invalid
+
+
+def _0005_transaction_datetimes():
+    """transactions tarihlerini tek biçime getir; PostgreSQL'de sütunları TIMESTAMP yap.
+
+    Eski kayıtlar 'YYYY-MM-DD' ve 'YYYY-MM-DD HH:MM:SS' karışık metindir.
+    Yalnızca tarih olan son teslim tarihleri günün sonuna (23:59:59) çekilir;
+    ödünç verirken girilen tarih için de aynı kural uygulanır.
+    """
+    if not _column_is_text('transactions', 'borrow_date'):
+        return  # Yeni veritabanı: sütunlar zaten DateTime
+
+    update = text('UPDATE transactions SET borrow_date = :borrow_date, due_date = :due_date, '
+                  'return_date = :return_date WHERE id = :id')
+    select_page = text('SELECT id, borrow_date, due_date, return_date FROM transactions '
+                       'WHERE id > :last_id ORDER BY id LIMIT 5000')
+    last_id, changed, invalid = 0, 0, 0
+    while True:
+        rows = db.session.execute(select_page, {'last_id': last_id}).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            values, row_invalid = _normalize_transaction_dates(row)
+            invalid += row_invalid
+            if any(values[column] != getattr(row, column) for column in TRANSACTION_DATE_COLUMNS):
+                updates.append(dict(values, id=row.id))
+        if updates:
+            db.session.execute(update, updates)
+            changed += len(updates)
+        last_id = rows[-1].id
+    print(f"📅 {changed} işlemin tarihleri düzenlendi")
+    if invalid:
+        print(f"⚠️ {invalid} tanınmayan tarih değeri boşaltıldı")
+
+    if db.engine.dialect.name == 'postgresql':
+        for column in TRANSACTION_DATE_COLUMNS:
+            db.session.execute(text(
+                f'ALTER TABLE transactions ALTER COLUMN {column} TYPE TIMESTAMP USING {column}::timestamp'
+            ))
+
+
+MIGRATIONS = [
+    ('0001_book_borrowed_count', _0001_book_borrowed_count),
+    ('0002_book_search_index', _0002_book_search_index),
+    ('0003_move_cover_blobs', _0003_move_cover_blobs),
+    ('0004_transaction_indexes', _0004_transaction_indexes),
+    ('0005_transaction_datetimes', _0005_transaction_datetimes),
+]
+
+
+def upgrade_schema():
+    """Henüz uygulanmamış adımları sırayla çalıştır. Uygulanan adım listesini döner."""
+    applied = {row.id for row in SchemaMigration.query.all()}
+    newly_applied = []
+
+    for migration_id, step in MIGRATIONS:
+        if migration_id in applied:
+            continue
+        try:
+            step()
+            db.session.add(SchemaMigration(id=migration_id))
+            db.session.commit()
+            newly_applied.append(migration_id)
+            print(f"✅ Şema güncellendi: {migration_id}")
+        except Exception as e:
+            # Birden fazla gunicorn worker aynı anda açılırsa adım başka worker tarafından uygulanmış olabilir
+            db.session.rollback()
+            print(f"⚠️ Şema adımı uygulanamadı ({migration_id}): {e}")
+            break
+
+    refresh_statistics()
+    return newly_applied
+
+
+def refresh_statistics():
+    """SQLite planlayıcı istatistiklerini (sqlite_stat1) her açılışta tazele.
+
+    0004 adımındaki ANALYZE yeni kurulumda boş tablolar üzerinde çalışır;
+    istatistik olmadan SQLite kısmi indeksler yerine bileşik indeksleri baştan
+    sona tarar. analysis_limit ile örneklemeli ANALYZE büyük veritabanında da
+    kısa sürer. PostgreSQL istatistikleri autovacuum tarafından güncellenir.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    try:
+        db.session.execute(text('PRAGMA analysis_limit=1000'))
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ Veritabanı istatistikleri güncellenemedi: {e}")
+
+
+if __name__ == '__main__':
+    from config import app
+
+    with app.app_context():
+        applied = upgrade_schema()
+        print(f"🎉 {len(applied)} şema adımı uygulandı")
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kitaplar için tam metin arama indeksi
+
+SQLite'ta FTS5 sanal tablosu (books_fts), Railway PostgreSQL'de GIN
+indeksli books.search_vector (tsvector) sütunu kullanılır. İndekse yazılan
+metin normalize_text_tr ile katlanır (Ç->c, ı->i ...), böylece "cagri" ve
+"Çağrı" aynı kelimeye düşer. İndeks Book insert/update/delete olaylarında
+aynı transaction içinde güncellenir.
+
+İndeks yoksa (ör. FTS5 derlenmemiş SQLite) match_subquery() None döner ve
+çağıranlar eski LIKE aramasına geri düşer.
+"""
+
+import re
+
+from sqlalchemy import event, inspect, text, bindparam, String, Float
+
+from models import db, Book
+
+
+# İndekslenen alanlar ve PostgreSQL ağırlıkları (A en yüksek)
+INDEXED_FIELDS = ('title', 'authors', 'publishers', 'isbn', 'barcode')
+COLUMN_WEIGHTS = {'title': 'A', 'authors': 'B', 'publishers': 'C', 'identifiers': 'D'}
+# FTS5 bm25() sütun ağırlıkları: isbn (UNINDEXED), title, authors, publishers, identifiers
+BM25_WEIGHTS = '0.0, 10.0, 5.0, 2.0, 1.0'
+# Başlığı sorguyla birebir aynı kitaplar için rank'tan düşülen pay (bm25/ts_rank_cd bundan küçük)
+EXACT_TITLE_BOOST = 1000
+
+_backend_cache = {}
+
+
+def normalize_text_tr(value: str) -> str:
+    """Türkçe için basit normalizasyon: küçük harf, aksan/özel harfleri sadeleştir, fazla boşlukları sil."""
+    if not value:
+        return ''
+    s = str(value)
+    replacements = {
+        'Ç': 'C', 'Ş': 'S', 'Ğ': 'G', 'İ': 'I', 'I': 'I', 'Ö': 'O', 'Ü': 'U',
+        'ç': 'c', 'ş': 's', 'ğ': 'g', 'ı': 'i', 'ö': 'o', 'ü': 'u'
+    }
+    s = ''.join(replacements.get(ch, ch) for ch in s)
+    s = s.lower()
+    s = ' '.join(s.split())
+    return s
+
+
+def _identifiers(isbn, barcode):
+    """ISBN'i tire/boşluksuz ve barkodla birlikte indekslenecek metne çevir"""
+    parts = [re.sub(r'[^0-9Xx]', '', isbn or ''), isbn or '', barcode or '']
+    return normalize_text_tr(' '.join(p for p in parts if p))
+
+
+def _document(book):
+    return {
+        'isbn': book.isbn,
+        'title': normalize_text_tr(book.title),
+        'authors': normalize_text_tr(book.authors),
+        'publishers': normalize_text_tr(book.publishers),
+        'identifiers': _identifiers(book.isbn, book.barcode),
+    }
+
+
+def _query_tokens(query_text):
+    """Sorguyu katla ve yalnızca harf/rakam token'larını bırak (sorgu sözdizimi enjekte edilemez)"""
+    return re.findall(r'\w+', normalize_text_tr(query_text))
+
+
+def get_backend(bind=None):
+    """'sqlite', 'postgresql' ya da indeks yoksa None"""
+    bind = bind or db.engine
+    key = str(bind.engine.url)
+    if key not in _backend_cache:
+        backend = None
+        try:
+            insp = inspect(bind)
+            dialect = bind.dialect.name
+            if dialect == 'sqlite' and insp.has_table('books_fts'):
+                backend = 'sqlite'
+            elif dialect == 'postgresql' and any(c['name'] == 'search_vector' for c in insp.get_columns('books')):
+                backend = 'postgresql'
+        except Exception:
+            backend = None
+        _backend_cache[key] = backend
+    return _backend_cache[key]
+
+
+def reset_backend_cache():
+    _backend_cache.clear()
+
+
+# --- İndeks bakımı ---
+
+_PG_VECTOR_SQL = """
+    setweight(to_tsvector('simple', :title), 'A') ||
+    setweight(to_tsvector('simple', :authors), 'B') ||
+    setweight(to_tsvector('simple', :publishers), 'C') ||
+    setweight(to_tsvector('simple', :identifiers), 'D')
+"""
+
+
+def _write_documents(connection, documents, backend):
+    if not documents:
+        return
+    if backend == 'sqlite':
+        _delete_documents(connection, [d['isbn'] for d in documents], backend)
+        connection.execute(text(
+            'INSERT INTO books_fts (isbn, title, authors, publishers, identifiers) '
+            'VALUES (:isbn, :title, :authors, :publishers, :identifiers)'
+        ), documents)
+    elif backend == 'postgresql':
+        connection.execute(text(f'UPDATE books SET search_vector = {_PG_VECTOR_SQL} WHERE isbn = :isbn'),
+                           documents)
+
+
+def _delete_documents(connection, isbns, backend):
+    # PostgreSQL'de vektör satırla birlikte silinir
+    # isbn FTS5'te UNINDEXED: her DELETE tabloyu tarar, bu yüzden tek satır
+    # başına değil parti başına bir sorgu çalıştırılır
+    if backend == 'sqlite' and isbns:
+        statement = text('DELETE FROM books_fts WHERE isbn IN :isbns').bindparams(
+            bindparam('isbns', expanding=True))
+        for i in range(0, len(isbns), 500):
+            connection.execute(statement, {'isbns': list(isbns[i:i + 500])})
+
+
+def reindex_books(isbns=None):
+    """Verilen ISBN'leri (None ise tüm kitapları) yeniden indeksle.
+
+    bulk_*_mappings ve Query.update() ORM olaylarını tetiklemediği için toplu
+    yazmalardan sonra bu fonksiyon çağrılmalıdır. Commit çağıranın işidir.
+    """
+    backend = get_backend()
+    if not backend:
+        return 0
+    batch_size = 500
+    connection = db.session.connection()
+    query = db.session.query(Book.isbn, Book.title, Book.authors, Book.publishers, Book.barcode)
+
+    if isbns is None:
+        if backend == 'sqlite':
+            connection.execute(text('DELETE FROM books_fts'))
+        rows = query.yield_per(batch_size)
+    else:
+        isbns = list(isbns)
+        _delete_documents(connection, isbns, backend)
+        rows = (row for i in range(0, len(isbns), batch_size)
+                for row in query.filter(Book.isbn.in_(isbns[i:i + batch_size])).all())
+
+    count = 0
+    documents = []
+    for row in rows:
+        documents.append(_document(row))
+        if len(documents) >= batch_size:
+            _write_documents(connection, documents, backend)
+            count += len(documents)
+            documents = []
+    _write_documents(connection, documents, backend)
+    count += len(documents)
+    return count
+
+
+def create_search_index():
+    """İndeks yapısını oluştur ve doldur (schema_migrations adımı)"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        db.session.execute(text('DROP TABLE IF EXISTS books_fts'))
+        try:
+            db.session.execute(text(
+                "CREATE VIRTUAL TABLE books_fts USING fts5("
+                "isbn UNINDEXED, title, authors, publishers, identifiers, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            ))
+        except Exception as e:
+            # FTS5 olmadan derlenmiş SQLite: aramalar LIKE ile devam eder
+            print(f"⚠️ FTS5 kullanılamıyor, tam metin indeksi atlandı: {e}")
+            reset_backend_cache()
+            return
+    elif dialect == 'postgresql':
+        db.session.execute(text('ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector'))
+        db.session.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING GIN (search_vector)'
+        ))
+    else:
+        return
+    reset_backend_cache()
+    # DDL aynı transaction içinde; get_backend yeni tabloyu görmeli
+    _backend_cache[str(db.engine.url)] = dialect
+    reindex_books()
+
+
+@event.listens_for(Book, 'after_insert')
+def _book_after_insert(mapper, connection, target):
+    backend = get_backend(connection)
+    if backend:
+        _write_documents(connection, [_document(target)], backend)
+
+
+@event.listens_for(Book, 'after_update')
+def _book_after_update(mapper, connection, target):
+    backend = get_backend(connection)
+    if not backend:
+        return
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in INDEXED_FIELDS):
+        _write_documents(connection, [_document(target)], backend)
+
+
+@event.listens_for(Book, 'after_delete')
+def _book_after_delete(mapper, connection, target):
+    backend = get_backend(connection)
+    if backend:
+        _delete_documents(connection, [target.isbn], backend)
+
+
+# --- Sorgu ---
+
+def match_subquery(query_text, columns=None, name='fts'):
+    """Eşleşen kitaplar için (isbn, rank) alt sorgusu; küçük rank daha alakalıdır.
+
+    columns: aranacak alanlar ('title', 'authors', 'publishers', 'identifiers'); None = hepsi.
+    Tüm token'lar eşleşmelidir; yalnızca son token önek olarak aranır (yazılmakta
+    olan kelime). Başlığı sorguyla birebir aynı olan kitaplar en üste alınır.
+    İndeks yoksa ya da sorguda token yoksa None döner.
+    """
+    backend = get_backend()
+    tokens = _query_tokens(query_text)
+    if not backend or not tokens:
+        return None
+    exact_title = normalize_text_tr(query_text)
+
+    if backend == 'sqlite':
+        match = ' '.join([f'"{tok}"' for tok in tokens[:-1]] + [f'"{tokens[-1]}"*'])
+        if columns:
+            match = '{' + ' '.join(columns) + '} : (' + match + ')'
+        sql = text(
+            f'SELECT isbn, bm25(books_fts, {BM25_WEIGHTS}) '
+            f'- CASE WHEN title = :{name}_title THEN {EXACT_TITLE_BOOST} ELSE 0 END AS rank '
+            f'FROM books_fts WHERE books_fts MATCH :{name}_query'
+        )
+    else:
+        weights = ''.join(COLUMN_WEIGHTS[c] for c in columns) if columns else ''
+        match = ' & '.join([f'{tok}:{weights}' if weights else tok for tok in tokens[:-1]]
+                           + [f'{tokens[-1]}:*{weights}'])
+        # PostgreSQL'de yerleşik BM25 yok; uzunluk normalizasyonlu ts_rank_cd kullanılır.
+        # Başlık normalize_text_tr ile aynı şekilde katlanıp karşılaştırılır.
+        sql = text(
+            "SELECT isbn, -ts_rank_cd(search_vector, q, 1) "
+            "- CASE WHEN btrim(regexp_replace(lower(translate(books.title, 'ÇŞĞİÖÜçşğıöü', 'CSGIOUcsgiou')), "
+            f"'\\s+', ' ', 'g')) = :{name}_title THEN {EXACT_TITLE_BOOST} ELSE 0 END AS rank "
+            f"FROM books, to_tsquery('simple', :{name}_query) AS q WHERE search_vector @@ q"
+        )
+
+    return sql.bindparams(**{f'{name}_query': match, f'{name}_title': exact_title})\
+        .columns(isbn=String, rank=Float).subquery(name)
+
+
+def search_books(query_text, page=1, per_page=20, columns=None, base_query=None):
+    """Sıralı ve sayfalanmış tam metin arama: (kitaplar, toplam) ya da indeks yoksa None"""
+    fts = match_subquery(query_text, columns)
+    if fts is None:
+        return None
+    query = (base_query if base_query is not None else Book.query).join(fts, fts.c.isbn == Book.isbn)
+    total = query.order_by(None).count()
+    page = max(page or 1, 1)
+    books = query.order_by(fts.c.rank, Book.isbn).offset((page - 1) * per_page).limit(per_page).all()
+    return books, total
+
+
+if __name__ == '__main__':
+    from config import app
+
+    with app.app_context():
+        create_search_index()
+        db.session.commit()
+        print(f"🎉 Arama indeksi yeniden oluşturuldu ({get_backend() or 'indeks yok'})")
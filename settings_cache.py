@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Süreç içi ayar önbelleği
+
+get_setting her çağrıda Settings tablosunu sorgulamak yerine tüm ayarların
+bellekteki kopyasından okur. Kopya, data_versions tablosundaki 'settings'
+sayacıyla doğrulanır: Settings satırı yazılıp commit edilince sayaç artar
+(bkz. data_version.py). Her worker sayacı en fazla SETTINGS_POLL_INTERVAL
+saniyede bir okur; sayaç değiştiyse ayarları tek sorguda yeniden yükler.
+Ayarı değiştiren süreç invalidate_settings() ile kendi kopyasını hemen
+tazeler, diğer worker'lar en geç bir saniye içinde yeni değeri görür.
+"""
+
+import threading
+import time
+
+from config import app
+from models import db, Settings
+from data_version import get_version, SETTINGS
+
+
+app.config.setdefault('SETTINGS_POLL_INTERVAL', 1.0)
+
+
+class SettingsCache:
+    def __init__(self):
+        self._values = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'reloads': 0, 'polls': 0}
+
+    def _fresh(self):
+        return (self._values is not None
+                and time.monotonic() - self._checked_at < app.config['SETTINGS_POLL_INTERVAL'])
+
+    def values(self):
+        """Güncel ayarlar sözlüğü (anahtar -> değer)"""
+        if self._fresh():
+            self.stats['hits'] += 1
+            return self._values
+        with self._lock:
+            if self._fresh():
+                return self._values
+            self.stats['polls'] += 1
+            # Önce sürüm okunur: arada yazma olursa bir sonraki kontrolde tekrar yüklenir
+            version = get_version(SETTINGS)
+            if self._values is None or version != self._version:
+                self._values = dict(db.session.query(Settings.key, Settings.value).all())
+                self._version = version
+                self.stats['reloads'] += 1
+            self._checked_at = time.monotonic()
+            return self._values
+
+    def get(self, key, default=None):
+        values = self.values()
+        return values[key] if key in values else default
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+            self._version = None
+
+
+settings_cache = SettingsCache()
+
+
+def invalidate_settings():
+    """Bu süreçteki kopyayı bırak (ayar yazan istekler commit sonrası çağırır)"""
+    settings_cache.invalidate()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Worker'lar arasında paylaşılan sonuç önbelleği
+
+gunicorn'un her worker'ı ayrı süreçtir; süreç içi önbellekte bir worker'daki
+invalidate_related_cache diğerlerini etkilemez ve her worker aynı
+toplamları kendisi hesaplar. utils.cache_with_ttl ve invalidate_related_cache
+bu modüldeki result_cache üzerinden çalışır:
+
+- 'sqlite' (varsayılan): instance klasöründe tek bir SQLite dosyası (WAL).
+  Aynı makinedeki tüm worker'lar aynı kayıtları ve etiketleri görür.
+- 'redis': CACHE_REDIS_URL (ya da REDIS_URL) verilir ve redis paketi kuruluysa;
+  birden fazla makinede çalışan kurulumlar için.
+- 'memory': yalnızca süreç içi (memory_cache.MemoryCache), tek süreçli EXE için.
+
+Tek uçuşlu hesaplama süreçler arası da geçerlidir: bir anahtarı hesaplayan
+worker kısa süreli bir kira (lease) kaydı alır, diğerleri sonucu bekler.
+Kira sahibi CACHE_LEASE_SECONDS içinde bitirmezse bekleyen kendisi hesaplar.
+
+Değerler pickle ile saklanır; önbellek dosyası/Redis yalnızca uygulamanın
+erişebildiği bir yerde olmalıdır.
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from config import app
+from memory_cache import MemoryCache, MISSING
+
+try:
+    import redis
+except ImportError:  # İsteğe bağlı bağımlılık
+    redis = None
+
+
+app.config.setdefault('CACHE_BACKEND', os.environ.get('CACHE_BACKEND'))
+app.config.setdefault('CACHE_SQLITE_PATH', None)
+app.config.setdefault('CACHE_REDIS_URL', os.environ.get('REDIS_URL'))
+app.config.setdefault('CACHE_MAX_ENTRIES', 5000)
+app.config.setdefault('CACHE_LEASE_SECONDS', 30)
+app.config.setdefault('CACHE_SWEEP_INTERVAL', 60)
+
+
+class _SharedCache:
+    """Ortak tek uçuşlu get_or_set ve sayaçlar; alt sınıflar depolamayı yapar"""
+    backend = None
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'invalidations': 0,
+                       'coalesced': 0, 'lease_timeouts': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def get(self, key, default=None):
+        value = self._load(key)
+        self._count('hits' if value is not MISSING else 'misses')
+        return default if value is MISSING else value
+
+    def get_or_set(self, key, factory, ttl, tags=()):
+        value = self._load(key)
+        if value is not MISSING:
+            self._count('hits')
+            return value
+        self._count('misses')
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                value = self._load(key)
+                if value is not MISSING:
+                    self._count('coalesced')
+                    return value
+                leased = self._acquire_lease(key)
+                if not leased:
+                    # Başka worker hesaplıyor; sonucunu bekle
+                    value = self._wait_for(key)
+                    if value is not MISSING:
+                        self._count('coalesced')
+                        return value
+                    self._count('lease_timeouts')
+                try:
+                    value = factory()
+                    self.set(key, value, ttl, tags)
+                    return value
+                finally:
+                    if leased:
+                        self._release_lease(key)
+            finally:
+                with self._lock:
+                    if self._inflight.get(key) is key_lock:
+                        del self._inflight[key]
+
+    def _wait_for(self, key):
+        deadline = time.monotonic() + app.config['CACHE_LEASE_SECONDS']
+        delay = 0.02
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            value = self._load(key)
+            if value is not MISSING:
+                return value
+            if not self._lease_held(key):
+                return self._load(key)
+        return MISSING
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats)
+        result['backend'] = self.backend
+        lookups = result['hits'] + result['misses']
+        result['hit_rate'] = round((result['hits'] + result['coalesced']) / lookups, 3) if lookups else None
+        return result
+
+
+class SQLiteCache(_SharedCache):
+    """Aynı makinedeki süreçlerin paylaştığı SQLite dosyası"""
+    backend = 'sqlite'
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)',
+        'CREATE INDEX IF NOT EXISTS ix_entries_expires_at ON entries (expires_at)',
+        'CREATE TABLE IF NOT EXISTS entry_tags (tag TEXT, key TEXT, PRIMARY KEY (tag, key))',
+        'CREATE INDEX IF NOT EXISTS ix_entry_tags_key ON entry_tags (key)',
+        'CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires_at REAL)',
+    )
+
+    def __init__(self, path, max_entries=None):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries or app.config['CACHE_MAX_ENTRIES']
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+        try:
+            os.chmod(path, 0o600)
+        except OSError:
+            pass
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: her ifade kendi transaction'ında; yazmalar BEGIN IMMEDIATE ile
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def _load(self, key):
+        with self._connection() as conn:
+            row = conn.execute('SELECT value, expires_at FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return MISSING
+        try:
+            return pickle.loads(row[0])
+        except Exception:
+            return MISSING
+
+    def set(self, key, value, ttl, tags=()):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)',
+                         (key, payload, time.time() + ttl))
+            conn.execute('DELETE FROM entry_tags WHERE key = ?', (key,))
+            conn.executemany('INSERT OR IGNORE INTO entry_tags (tag, key) VALUES (?, ?)',
+                             [(tag, key) for tag in set(tags)])
+        self._count('sets')
+        if time.monotonic() - self._last_sweep > app.config['CACHE_SWEEP_INTERVAL']:
+            self.sweep()
+
+    def delete(self, key):
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._delete_keys(conn, [key])
+
+    def _delete_keys(self, conn, keys):
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            marks = ','.join('?' * len(chunk))
+            conn.execute(f'DELETE FROM entries WHERE key IN ({marks})', chunk)
+            conn.execute(f'DELETE FROM entry_tags WHERE key IN ({marks})', chunk)
+
+    def invalidate_tags(self, *tags):
+        if not tags:
+            return 0
+        marks = ','.join('?' * len(tags))
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            keys = [row[0] for row in conn.execute(
+                f'SELECT DISTINCT key FROM entry_tags WHERE tag IN ({marks})', tags)]
+            self._delete_keys(conn, keys)
+        self._count('invalidations', len(keys))
+        return len(keys)
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            count = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            conn.execute('DELETE FROM entries')
+            conn.execute('DELETE FROM entry_tags')
+        self._count('invalidations', count)
+
+    def sweep(self):
+        """Süresi dolan kayıtları ve kiraları sil; kayıt sayısını sınırda tut"""
+        self._last_sweep = time.monotonic()
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            expired = [row[0] for row in conn.execute('SELECT key FROM entries WHERE expires_at <= ?', (now,))]
+            # Sınır aşılırsa en erken dolacak kayıtlar gider
+            excess = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - len(expired) - self.max_entries
+            if excess > 0:
+                expired += [row[0] for row in conn.execute(
+                    'SELECT key FROM entries WHERE expires_at > ? ORDER BY expires_at LIMIT ?', (now, excess))]
+            self._delete_keys(conn, expired)
+            conn.execute('DELETE FROM leases WHERE expires_at <= ?', (now,))
+        return len(expired)
+
+    def _acquire_lease(self, key):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM leases WHERE key = ? AND expires_at <= ?', (key, now))
+            cursor = conn.execute('INSERT OR IGNORE INTO leases (key, expires_at) VALUES (?, ?)',
+                                  (key, now + app.config['CACHE_LEASE_SECONDS']))
+            return cursor.rowcount == 1
+
+    def _lease_held(self, key):
+        with self._connection() as conn:
+            row = conn.execute('SELECT expires_at FROM leases WHERE key = ?', (key,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def _release_lease(self, key):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM leases WHERE key = ?', (key,))
+
+    def stats(self):
+        result = super().stats()
+        with self._connection() as conn:
+            result['entries'] = conn.execute('SELECT COUNT(*) FROM entries WHERE expires_at > ?',
+                                             (time.time(),)).fetchone()[0]
+            result['tags'] = [row[0] for row in conn.execute('SELECT DISTINCT tag FROM entry_tags ORDER BY tag')]
+        result.update({'max_entries': self.max_entries, 'path': self.path})
+        return result
+
+
+class _Transaction:
+    """BEGIN ile açılan transaction'ı bloğun sonunda commit/rollback eder"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn.in_transaction:
+            if exc_type is None:
+                self.conn.execute('COMMIT')
+            else:
+                self.conn.execute('ROLLBACK')
+        return False
+
+
+class RedisCache(_SharedCache):
+    """Birden fazla makinede paylaşılan Redis önbelleği"""
+    backend = 'redis'
+    PREFIX = 'kutuphane:cache:'
+    TAG_TTL = 24 * 60 * 60
+
+    def __init__(self, url):
+        super().__init__()
+        self.client = redis.Redis.from_url(url)
+
+    def _key(self, key):
+        return f'{self.PREFIX}entry:{key}'
+
+    def _tag(self, tag):
+        return f'{self.PREFIX}tag:{tag}'
+
+    def _lease(self, key):
+        return f'{self.PREFIX}lease:{key}'
+
+    def _load(self, key):
+        payload = self.client.get(self._key(key))
+        if payload is None:
+            return MISSING
+        try:
+            return pickle.loads(payload)
+        except Exception:
+            return MISSING
+
+    def set(self, key, value, ttl, tags=()):
+        ttl = max(1, int(ttl))
+        pipe = self.client.pipeline()
+        pipe.set(self._key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=ttl)
+        for tag in set(tags):
+            pipe.sadd(self._tag(tag), key)
+            # Etiket kümesi kayıtlarından uzun yaşamalı; silinmiş anahtarlar zararsızdır
+            pipe.expire(self._tag(tag), max(ttl, self.TAG_TTL))
+        pipe.execute()
+        self._count('sets')
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def invalidate_tags(self, *tags):
+        keys = set()
+        for tag in tags:
+            keys.update(member.decode('utf-8') for member in self.client.smembers(self._tag(tag)))
+        pipe = self.client.pipeline()
+        if keys:
+            pipe.delete(*[self._key(key) for key in keys])
+        for tag in tags:
+            pipe.delete(self._tag(tag))
+        pipe.execute()
+        self._count('invalidations', len(keys))
+        return len(keys)
+
+    def clear(self):
+        names = list(self.client.scan_iter(match=f'{self.PREFIX}*', count=500))
+        for start in range(0, len(names), 500):
+            self.client.delete(*names[start:start + 500])
+
+    def sweep(self):
+        return 0  # Redis süresi dolan anahtarları kendisi siler
+
+    def _acquire_lease(self, key):
+        return bool(self.client.set(self._lease(key), b'1', nx=True, ex=app.config['CACHE_LEASE_SECONDS']))
+
+    def _lease_held(self, key):
+        return bool(self.client.exists(self._lease(key)))
+
+    def _release_lease(self, key):
+        self.client.delete(self._lease(key))
+
+
+def default_sqlite_path():
+    """Veritabanı başına ayrı dosya (aynı makinedeki farklı kurulumlar karışmaz)"""
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+    suffix = hashlib.sha1(uri.encode('utf-8')).hexdigest()[:10]
+    return os.path.join(app.instance_path, f'result_cache_{suffix}.db')
+
+
+def create_cache():
+    """CACHE_BACKEND'e göre önbellek; belirtilmezse Redis URL'i ve paketi varsa redis, yoksa sqlite"""
+    backend = (app.config.get('CACHE_BACKEND') or '').lower()
+    redis_url = app.config.get('CACHE_REDIS_URL')
+    if not backend:
+        backend = 'redis' if (redis_url and redis is not None) else 'sqlite'
+
+    if backend == 'redis':
+        if redis is None or not redis_url:
+            print("⚠️ Redis önbelleği için redis paketi ve CACHE_REDIS_URL gerekli; SQLite kullanılıyor")
+        else:
+            try:
+                cache = RedisCache(redis_url)
+                cache.client.ping()
+                return cache
+            except Exception as e:
+                print(f"⚠️ Redis'e bağlanılamadı ({e}); SQLite önbelleği kullanılıyor")
+        backend = 'sqlite'
+
+    if backend == 'memory':
+        cache = MemoryCache()
+        cache.backend = 'memory'
+        return cache
+
+    path = app.config.get('CACHE_SQLITE_PATH') or default_sqlite_path()
+    try:
+        return SQLiteCache(path)
+    except Exception as e:
+        print(f"⚠️ Paylaşılan önbellek açılamadı ({e}); süreç içi önbellek kullanılıyor")
+        cache = MemoryCache()
+        cache.backend = 'memory'
+        return cache
+
+
+result_cache = create_cache()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ödünç işlemi tarihleri (borrow_date, due_date, return_date)
+
+Sütunlar DateTime'dır: PostgreSQL'de TIMESTAMP, SQLite'ta mevcut kayıtlarla
+aynı 'YYYY-MM-DD HH:MM:SS' metni (mikrosaniyesiz). Böylece SQLite'ta aralık
+filtreleri ve indeksler eski ve yeni satırlarda aynı sırayla çalışır.
+
+Gecikme ve kalan gün hesapları SQL tarafında days_between ile yapılır:
+    days_between(Transaction.due_date, today)  -> gecikme günü
+    days_between(today, Transaction.due_date)  -> kalan gün
+Gecikmiş ödünç: return_date IS NULL AND due_date < day_start()
+"""
+
+from datetime import date, datetime, time
+
+from sqlalchemy import DateTime, Date, Integer, literal
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+TransactionDateTime = DateTime().with_variant(
+    sqlite.DATETIME(storage_format='%(year)04d-%(month)02d-%(day)02d '
+                                   '%(hour)02d:%(minute)02d:%(second)02d'),
+    'sqlite'
+)
+
+# Eski metin kayıtlarında görülen biçimler
+LEGACY_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%d.%m.%Y %H:%M:%S',
+    '%d.%m.%Y %H:%M',
+    '%d.%m.%Y',
+)
+
+
+def parse_datetime(value, end_of_day=False):
+    """Metin/tarih değerini datetime'a çevir; boşsa None, tanınmazsa ValueError.
+
+    Yalnızca tarih içeren değerler end_of_day ile günün sonuna (23:59:59),
+    aksi halde gün başına çekilir; son teslim tarihi o günün sonuna kadardır.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0)
+    if isinstance(value, date):
+        return datetime.combine(value, time(23, 59, 59) if end_of_day else time.min)
+    text = str(value).strip()
+    if not text:
+        return None
+    for fmt in LEGACY_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if end_of_day and '%H' not in fmt:
+            parsed = parsed.replace(hour=23, minute=59, second=59)
+        return parsed.replace(microsecond=0)
+    raise ValueError(f'Tanınmayan tarih: {text}')
+
+
+def format_datetime(value):
+    """API yanıtları için eski metin biçimi ('YYYY-MM-DD HH:MM:SS')"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    return str(value)
+
+
+def day_start(day=None):
+    """Günün 00:00'ı (varsayılan bugün)"""
+    return datetime.combine(day or date.today(), time.min)
+
+
+class days_between(FunctionElement):
+    """start'tan end'e takvim günü farkı (saat yok sayılır), SQL tarafında.
+
+    Parametrelerden biri Python date/datetime olabilir.
+    """
+    type = Integer()
+    name = 'days_between'
+    inherit_cache = True
+
+    def __init__(self, start, end):
+        super().__init__(_as_date(start), _as_date(end))
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return literal(value, Date())
+    return value
+
+
+@compiles(days_between, 'sqlite')
+def _days_between_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return 'CAST(julianday(date(%s)) - julianday(date(%s)) AS INTEGER)' % (
+        compiler.process(end, **kw), compiler.process(start, **kw))
+
+
+@compiles(days_between)
+def _days_between_default(element, compiler, **kw):
+    # PostgreSQL: date - date tamsayı gün verir
+    start, end = list(element.clauses)
+    return '(CAST(%s AS DATE) - CAST(%s AS DATE))' % (
+        compiler.process(end, **kw), compiler.process(start, **kw))
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/search/smart için otomatik tamamlama indeksi
+
+Kitap başlıkları, tek tek yazar adları (virgülle ayrılmış authors alanından)
+ve kategori adları normalize_text_tr ile katlanıp kelimelerine ayrılır;
+(kelime, tür, anahtar) üçlüleri sıralı bir dizide tutulur. Önek araması
+bisect ile yapılır, istek sırasında veritabanına gidilmez.
+
+İndeks açılışta kurulur. Bu süreçteki değişiklikler commit sonrası indekse
+işlenir; diğer worker'ların değişiklikleri için SEARCH_FUZZY_MAX_AGE
+saniyede bir arka planda yeniden kurulur (bkz. fuzzy_index).
+"""
+
+import bisect
+import re
+import threading
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import db, Book, Category, BookCategory
+from search_index import normalize_text_tr
+from fuzzy_index import is_stale, refresh_in_background
+
+
+# Tek önek için taranacak en fazla kayıt (1-2 harfli öneklerde süreyi sınırlar)
+MAX_SCAN = 2000
+
+_AUTHOR_SPLIT = re.compile(r'\s*(?:,|;|&|\bve\b)\s*')
+
+
+def split_authors(authors):
+    """'Ahmet Ümit, Ayşe Kulin' -> ['Ahmet Ümit', 'Ayşe Kulin']"""
+    return [name.strip() for name in _AUTHOR_SPLIT.split(authors or '') if name.strip()]
+
+
+def _words(value):
+    return re.findall(r'\w+', normalize_text_tr(value))
+
+
+def _book_doc(isbn, title, authors, quantity, borrowed, popularity):
+    """Kitap kaydı için (kelimeler, veri, {normalize yazar adı: yazar adı})"""
+    author_names = {normalize_text_tr(name): name for name in split_authors(authors)}
+    words = set(_words(title))
+    digits = re.sub(r'[^0-9Xx]', '', isbn or '').lower()
+    if digits:
+        words.add(digits)
+    data = {
+        'title': title,
+        'authors': authors,
+        'isbn': isbn,
+        'quantity': quantity or 0,
+        'borrowed': borrowed or 0,
+        'popularity': popularity or 0,
+        'author_keys': set(author_names),
+    }
+    return words, data, author_names
+
+
+class TypeaheadIndex:
+    """Sıralı kelime dizisi üzerinde önek araması"""
+
+    def __init__(self):
+        self._entries = []   # sıralı (kelime, tür, anahtar)
+        self._docs = {}      # (tür, anahtar) -> {'words': set, 'data': dict}
+        self._author_books = {}    # normalize yazar adı -> {isbn}
+        self._category_books = {}  # kategori id -> {isbn}
+        self._book_categories = {}  # isbn -> [kategori id]
+        self.categories_stale = False
+        self.loaded_at = None
+        self._lock = threading.RLock()
+
+    # --- Kayıt ekleme/silme ---
+
+    def _put(self, kind, key, words, data):
+        self._drop(kind, key)
+        words = set(words)
+        self._docs[(kind, key)] = {'words': words, 'data': data}
+        for word in words:
+            bisect.insort(self._entries, (word, kind, key))
+
+    def _drop(self, kind, key):
+        doc = self._docs.pop((kind, key), None)
+        if not doc:
+            return
+        for word in doc['words']:
+            i = bisect.bisect_left(self._entries, (word, kind, key))
+            if i < len(self._entries) and self._entries[i] == (word, kind, key):
+                del self._entries[i]
+
+    def _refresh_author(self, author_key, display_name=None):
+        isbns = self._author_books.get(author_key)
+        if not isbns:
+            self._author_books.pop(author_key, None)
+            self._drop('author', author_key)
+            return
+        doc = self._docs.get(('author', author_key))
+        name = display_name or (doc['data']['name'] if doc else author_key)
+        self._put('author', author_key, _words(author_key), {'name': name, 'book_count': len(isbns)})
+
+    def set_book(self, isbn, title, authors, quantity, borrowed, popularity):
+        """Kitabı ekle/güncelle; borrowed None ise indeksteki sayaç korunur"""
+        with self._lock:
+            old = self._docs.get(('book', isbn))
+            old_authors = old['data']['author_keys'] if old else set()
+            if borrowed is None:
+                borrowed = old['data']['borrowed'] if old else 0
+            words, data, author_names = _book_doc(isbn, title, authors, quantity, borrowed, popularity)
+            self._put('book', isbn, words, data)
+
+            for key in old_authors - set(author_names):
+                self._author_books.get(key, set()).discard(isbn)
+                self._refresh_author(key)
+            for key, name in author_names.items():
+                self._author_books.setdefault(key, set()).add(isbn)
+                self._refresh_author(key, name)
+
+    def remove_book(self, isbn):
+        with self._lock:
+            old = self._docs.get(('book', isbn))
+            if not old:
+                return
+            self._drop('book', isbn)
+            for key in old['data']['author_keys']:
+                self._author_books.get(key, set()).discard(isbn)
+                self._refresh_author(key)
+
+    def adjust_borrowed(self, isbn, delta):
+        with self._lock:
+            doc = self._docs.get(('book', isbn))
+            if doc:
+                doc['data']['borrowed'] = max(doc['data']['borrowed'] + delta, 0)
+
+    def load_categories(self):
+        """Kategori adları ve kitap-kategori eşlemesini veritabanından yeniden yükle"""
+        names = {row.id: row.name for row in db.session.query(Category.id, Category.name)}
+        category_books, book_categories = {}, {}
+        for isbn, category_id in db.session.query(BookCategory.book_isbn, BookCategory.category_id) \
+                .order_by(BookCategory.category_id):
+            category_books.setdefault(category_id, set()).add(isbn)
+            book_categories.setdefault(isbn, []).append(category_id)
+        with self._lock:
+            for kind, key in [k for k in self._docs if k[0] == 'category']:
+                self._drop(kind, key)
+            for category_id, name in names.items():
+                self._put('category', category_id, _words(name), {'name': name})
+            self._category_books = category_books
+            self._book_categories = book_categories
+
+    def rebuild(self):
+        # Tek tek insort yerine tüm kelimeleri toplayıp bir kez sırala
+        fresh = TypeaheadIndex()
+        entries = []
+        author_display = {}
+        rows = db.session.query(Book.isbn, Book.title, Book.authors, Book.quantity,
+                                Book.borrowed_count, Book.total_borrow_count).yield_per(1000)
+        for row in rows:
+            words, data, author_names = _book_doc(*row)
+            fresh._docs[('book', row.isbn)] = {'words': words, 'data': data}
+            entries.extend((word, 'book', row.isbn) for word in words)
+            for key, name in author_names.items():
+                fresh._author_books.setdefault(key, set()).add(row.isbn)
+                author_display.setdefault(key, name)
+        for key, isbns in fresh._author_books.items():
+            words = set(_words(key))
+            fresh._docs[('author', key)] = {'words': words, 'data': {'name': author_display[key], 'book_count': len(isbns)}}
+            entries.extend((word, 'author', key) for word in words)
+        fresh._entries = sorted(entries)
+        fresh.load_categories()
+        with self._lock:
+            self._entries = fresh._entries
+            self._docs = fresh._docs
+            self._author_books = fresh._author_books
+            self._category_books = fresh._category_books
+            self._book_categories = fresh._book_categories
+            self.categories_stale = False
+            self.loaded_at = time.monotonic()
+
+    def ensure_loaded(self):
+        if self.loaded_at is None:
+            self.rebuild()
+            return
+        if is_stale(self.loaded_at):
+            # İstekler kurulum bitene kadar mevcut indeksten yanıtlanır
+            refresh_in_background(self, 'typeahead')
+        if self.categories_stale:
+            # after_commit içinde SQL çalıştırılamadığı için kategori değişiklikleri burada yüklenir
+            self.categories_stale = False
+            self.load_categories()
+
+    # --- Sorgu ---
+
+    def _matches(self, tokens):
+        """Tüm sorgu kelimelerinin bir kelimenin öneki olduğu (tür, anahtar) kümeleri"""
+        # En uzun (en seçici) kelimeyle aday topla, diğerleriyle süz
+        probe = max(tokens, key=len)
+        start = bisect.bisect_left(self._entries, (probe,))
+        seen = {}
+        for word, kind, key in self._entries[start:start + MAX_SCAN]:
+            if not word.startswith(probe):
+                break
+            exact = word == probe
+            seen[(kind, key)] = seen.get((kind, key), False) or exact
+        result = []
+        for doc_key, exact in seen.items():
+            words = self._docs[doc_key]['words']
+            if all(any(w.startswith(tok) for w in words) for tok in tokens):
+                result.append((doc_key, exact))
+        return result
+
+    def suggest(self, query, limit=10):
+        """Kitap, yazar ve kategori önerileri (eski /api/search/smart biçiminde)"""
+        tokens = _words(query)
+        if not tokens:
+            return []
+        self.ensure_loaded()
+
+        books, authors, categories = [], [], []
+        with self._lock:
+            for (kind, key), exact in self._matches(tokens):
+                data = self._docs[(kind, key)]['data']
+                if kind == 'book':
+                    category_ids = self._book_categories.get(key) or []
+                    category_doc = self._docs.get(('category', category_ids[0])) if category_ids else None
+                    books.append(((not exact, -data['popularity'], data['title'] or ''), {
+                        'type': 'book',
+                        'title': data['title'],
+                        'authors': data['authors'],
+                        'isbn': data['isbn'],
+                        'available': data['quantity'] - data['borrowed'] > 0,
+                        'category': category_doc['data']['name'] if category_doc else None
+                    }))
+                elif kind == 'author':
+                    authors.append(((not exact, -data['book_count'], data['name']), {
+                        'type': 'author',
+                        'name': data['name'],
+                        'book_count': data['book_count']
+                    }))
+                else:
+                    book_count = len(self._category_books.get(key, ()))
+                    if book_count:
+                        categories.append(((not exact, -book_count, data['name']), {
+                            'type': 'category',
+                            'name': data['name'],
+                            'book_count': book_count
+                        }))
+
+        suggestions = []
+        for group in (books, authors, categories):
+            group.sort(key=lambda item: item[0])
+            suggestions.extend(item for _, item in group[:limit])
+        return suggestions
+
+
+book_typeahead = TypeaheadIndex()
+
+
+# --- Artımlı güncelleme: değişiklikler commit sonrası indekse işlenir ---
+
+def _pending(session):
+    return session.info.setdefault('typeahead_pending', {'books': {}, 'borrowed': {}, 'categories': False})
+
+
+def note_borrowed_delta(isbn, delta):
+    """adjust_borrowed_count çağrıları (Query.update) ORM olayı üretmez; commit sonrası işlenir"""
+    borrowed = _pending(db.session())['borrowed']
+    borrowed[isbn] = borrowed.get(isbn, 0) + delta
+
+
+@event.listens_for(Book, 'after_insert')
+def _book_inserted(mapper, connection, target):
+    _pending(inspect(target).session)['books'][target.isbn] = (
+        target.isbn, target.title, target.authors, target.quantity,
+        target.borrowed_count, target.total_borrow_count)
+
+
+@event.listens_for(Book, 'after_update')
+def _book_changed(mapper, connection, target):
+    # borrowed_count yalnızca adjust_borrowed_count ile değişir; o note_borrowed_delta ile izlenir
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in ('isbn', 'title', 'authors', 'quantity')):
+        _pending(state.session)['books'][target.isbn] = (
+            target.isbn, target.title, target.authors, target.quantity,
+            None, target.total_borrow_count)
+
+
+@event.listens_for(Book, 'after_delete')
+def _book_deleted(mapper, connection, target):
+    _pending(inspect(target).session)['books'][target.isbn] = None
+
+
+@event.listens_for(Session, 'after_flush')
+def _categories_flushed(session, flush_context):
+    if any(isinstance(obj, (Category, BookCategory))
+           for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        _pending(session)['categories'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _categories_bulk_changed(orm_execute_state):
+    # BookCategory.query.filter_by(...).delete() gibi toplu işlemler
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and \
+            orm_execute_state.bind_mapper is not None and \
+            orm_execute_state.bind_mapper.class_ in (Category, BookCategory):
+        _pending(orm_execute_state.session)['categories'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session):
+    pending = session.info.pop('typeahead_pending', None)
+    if not pending or book_typeahead.loaded_at is None:
+        return
+    for isbn, row in pending['books'].items():
+        if row is None:
+            book_typeahead.remove_book(isbn)
+        else:
+            book_typeahead.set_book(*row)
+    for isbn, delta in pending['borrowed'].items():
+        book_typeahead.adjust_borrowed(isbn, delta)
+    if pending['categories']:
+        book_typeahead.categories_stale = True
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('typeahead_pending', None)
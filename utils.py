@@ -1,4 +1,4 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response
 from flask_login import current_user
 from flask_mail import Message
 from datetime import datetime, timedelta
@@ -12,6 +12,9 @@ import shutil
 import subprocess
 import sys
 import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from io import BytesIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4, landscape
@@ -24,6 +27,15 @@ if hasattr(sys, 'frozen'):
 
 from config import app, mail, get_setting
 from models import db, User, Book, Member, Transaction, Category, BookCategory, Notification, SearchHistory, Review, Reservation, Fine, ActivityLog, Settings, EmailTemplate, OnlineBorrowRequest, QRCode
+from search_index import normalize_text_tr, match_subquery
+from fuzzy_index import trigram_similarity
+from typeahead import note_borrowed_delta
+from data_version import bump_version
+import metadata_cache
+from provider_client import provider_client
+from qr_render import draw_qr
+from cover_store import download_cover, download_covers, thumbnail_for, cover_url
+from transaction_dates import parse_datetime, format_datetime, day_start
 
 def log_activity(action, details=None, user_id=None):
     """Log user activity"""
@@ -70,7 +82,7 @@ def save_qr_code(isbn):
     return qr_path
 
 # Image helpers
-def normalize_cover_url(image_path):
+def normalize_cover_url(image_path, size=None):
     """Kapak görüntü yolu/URL'sini istemci için normalize eder.
 
     Kurallar:
@@ -78,6 +90,10 @@ def normalize_cover_url(image_path):
     - http/https ile başlıyorsa olduğu gibi döner
     - /static/ ile başlıyorsa olduğu gibi döner
     - Aksi halde filename olarak kabul edip /static/book_covers/ ile birleştirir
+
+    size ('list', 'kiosk', 'detail') verilirse yerel kapağın o boydaki küçük
+    hali döner; üretilemezse orijinale düşer. Diskteki kapaklar parmak izli
+    /covers/ adresiyle döner (uzun süreli önbellek, WebP/AVIF).
     """
     if not image_path:
         return '/static/img/no_cover.png'
@@ -87,32 +103,20 @@ def normalize_cover_url(image_path):
         return path
     if path.startswith('/static/'):
         return path
-    return f"/static/book_covers/{path}"
+    if size:
+        thumb = thumbnail_for(path, size)
+        if thumb:
+            return cover_url(thumb)
+    return cover_url(path)
 
 def download_cover_image(image_url, isbn):
-    """Verilen image_url'i indirip static/book_covers/{isbn}.jpg olarak kaydeder.
-    Başarılı olursa filename (örn. 978...jpg) döner, aksi halde None.
+    """Verilen image_url'i indirip static/book_covers altına içerik özetiyle kaydeder.
+    Başarılı olursa filename (örn. 3f2a...c1.jpg) döner, aksi halde None.
     """
     try:
         if not image_url or not isbn:
             return None
-        filename = f"{isbn}.jpg"
-        save_dir = os.path.join(app.root_path, 'static', 'book_covers')
-        os.makedirs(save_dir, exist_ok=True)
-        save_path = os.path.join(save_dir, filename)
-
-        # SSL certificate verification disabled for PyInstaller executable compatibility
-        import sys
-        if hasattr(sys, 'frozen'):
-            # Running as PyInstaller executable
-            resp = requests.get(image_url, verify=False, timeout=10)
-        else:
-            # Running normally
-            resp = requests.get(image_url, timeout=10)
-        if resp.status_code == 200 and resp.content:
-            with open(save_path, 'wb') as f:
-                f.write(resp.content)
-            return filename
+        return download_cover(image_url)
     except Exception as e:
         try:
             print(f"download_cover_image error for {isbn}: {e}")
@@ -120,26 +124,15 @@ def download_cover_image(image_url, isbn):
             pass
     return None
 
-# --- Turkish text normalization and scoring helpers ---
-def normalize_text_tr(value: str) -> str:
-    """Türkçe için basit normalizasyon: küçük harf, aksan/özel harfleri sadeleştir, fazla boşlukları sil."""
-    if not value:
-        return ''
-    s = str(value)
-    replacements = {
-        'Ç': 'C', 'Ş': 'S', 'Ğ': 'G', 'İ': 'I', 'I': 'I', 'Ö': 'O', 'Ü': 'U',
-        'ç': 'c', 'ş': 's', 'ğ': 'g', 'ı': 'i', 'ö': 'o', 'ü': 'u'
-    }
-    s = ''.join(replacements.get(ch, ch) for ch in s)
-    s = s.lower()
-    s = ' '.join(s.split())
-    return s
+def download_cover_images(items):
+    """Birden fazla kapağı paralel indir: {isbn: image_url} -> {isbn: filename}"""
+    return download_covers({isbn: url for isbn, url in items.items() if isbn and url})
 
+# --- Turkish text normalization and scoring helpers ---
 def compute_relevance_score(query: str, title: str, authors: str = '', publishers: str = '') -> float:
     """Basit alaka puanı: tam eşleşme/başlangıç/alt dize ve benzerlik puanı.
     Daha yüksek puan daha alakalı demektir.
     """
-    import difflib
     q = normalize_text_tr(query)
     t = normalize_text_tr(title)
     a = normalize_text_tr(authors)
@@ -166,28 +159,17 @@ def compute_relevance_score(query: str, title: str, authors: str = '', publisher
         score += 25
     if q in p:
         score += 10
-    # Fuzzy similarity on title
-    try:
-        ratio = difflib.SequenceMatcher(None, q, t).ratio()
-        score += ratio * 40
-    except Exception:
-        pass
+    # Fuzzy similarity on title (trigram; difflib'e göre doğrusal maliyet)
+    score += trigram_similarity(q, t) * 40
     return score
 
 def calculate_fine(due_date, return_date=None):
-    """Calculate fine amount for overdue books (supports YYYY-MM-DD and YYYY-MM-DD HH:MM:SS)"""
+    """Calculate fine amount for overdue books (datetime veya eski metin tarihleri)"""
     def _parse_dt(value):
-        if isinstance(value, datetime):
-            return value
-        if not value:
+        try:
+            return parse_datetime(value)
+        except ValueError:
             return None
-        # Try full datetime first
-        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
-            try:
-                return datetime.strptime(value, fmt)
-            except Exception:
-                continue
-        return None
 
     ret_dt = _parse_dt(return_date) or datetime.now()
     due_dt = _parse_dt(due_date)
@@ -230,8 +212,136 @@ def send_email(to_email, template_name, context):
         print(f"Email sending error: {e}")
         return False
 
-def fetch_book_info_from_api(isbn):
+# --- Kitap bilgisi sağlayıcıları (Google Books, Open Library) ---
+app.config.setdefault('METADATA_FETCH_WORKERS', 8)
+app.config.setdefault('METADATA_REQUEST_TIMEOUT', 15)
+# Open Library tek istekte sorgulanacak ISBN sayısı (bibkeys=ISBN:a,ISBN:b,...)
+app.config.setdefault('OPENLIBRARY_BIBKEYS_PER_REQUEST', 25)
+# Toplam süre sınırları (saniye): tek ISBN ve toplu istekler
+app.config.setdefault('METADATA_FETCH_DEADLINE', 20)
+app.config.setdefault('METADATA_BULK_DEADLINE', 90)
+
+_metadata_lock = threading.Lock()
+_metadata_executor = None
+
+def _get_metadata_executor():
+    global _metadata_executor
+    with _metadata_lock:
+        if _metadata_executor is None:
+            _metadata_executor = ThreadPoolExecutor(
+                max_workers=app.config['METADATA_FETCH_WORKERS'],
+                thread_name_prefix='metadata-fetch'
+            )
+        return _metadata_executor
+
+def _provider_get(provider, url, timeout=None):
+    """Ortak sağlayıcı istemcisiyle GET (hız sınırı, tekrar ve devre kesici dahil)"""
+    return provider_client.get(provider, url, timeout=timeout or app.config['METADATA_REQUEST_TIMEOUT'])
+
+PROVIDER_URLS = {
+    'google_books': "https://www.googleapis.com/books/v1/volumes?q=isbn:{isbn}",
+    'openlibrary': "https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data",
+}
+
+def fetch_provider_data(provider, isbn, timeout=None):
+    """Sağlayıcının ham JSON yanıtı; ağ/HTTP hatasında exception fırlatır"""
+    response = _provider_get(provider, PROVIDER_URLS[provider].format(isbn=isbn), timeout)
+    response.raise_for_status()
+    return response.json()
+
+def fetch_openlibrary_batch(isbns, timeout=None):
+    """Tek istekte birden fazla ISBN (bibkeys=ISBN:a,ISBN:b,...): {isbn: tekil yanıt biçiminde ham veri}
+
+    Her ISBN'in verisi fetch_provider_data('openlibrary', isbn) ile aynı biçime
+    ({'ISBN:...': {...}} ya da bulunamadıysa {}) ayrılır; böylece ayrıştırıcı ve
+    önbellek değişmeden kullanılır.
+    """
+    bibkeys = ','.join(f'ISBN:{isbn}' for isbn in isbns)
+    url = f"https://openlibrary.org/api/books?bibkeys={bibkeys}&format=json&jscmd=data"
+    response = _provider_get('openlibrary', url, timeout)
+    response.raise_for_status()
+    data = response.json()
+    return {
+        isbn: ({f'ISBN:{isbn}': data[f'ISBN:{isbn}']} if f'ISBN:{isbn}' in data else {})
+        for isbn in isbns
+    }
+
+def _run_provider(provider, isbns, end_time):
+    """Kalan süre içinde sağlayıcıdan ham yanıtları al: {isbn: veri}; süre dolduysa boş"""
+    remaining = end_time - time.monotonic()
+    if remaining <= 0:
+        return {}
+    timeout = min(app.config['METADATA_REQUEST_TIMEOUT'], remaining)
+    if provider == 'openlibrary':
+        return fetch_openlibrary_batch(isbns, timeout=timeout)
+    return {isbn: fetch_provider_data(provider, isbn, timeout=timeout) for isbn in isbns}
+
+def fetch_books_info_bulk(isbns, deadline=None, refresh=False):
+    """Birden fazla ISBN için bilgileri paralel çek: {isbn: birleşik bilgi ya da None}
+
+    Ham sağlayıcı yanıtları önce kalıcı önbellekten (metadata_cache) okunur;
+    refresh=True önbelleği atlar. Eksikler için Google Books (ISBN başına) ve
+    Open Library (bibkeys ile toplu) aynı anda, ortak ve sınırlı bir thread
+    havuzunda sorgulanır. deadline
+    (saniye) dolduğunda bitmeyen istekler yok sayılır ve eldeki sonuçlar
+    birleştirilir.
+    """
+    isbns = list(dict.fromkeys(isbn for isbn in isbns if isbn))
+    if deadline is None:
+        deadline = app.config['METADATA_BULK_DEADLINE']
+    end_time = time.monotonic() + deadline
+    parsers = {'google_books': fetch_from_google_books, 'openlibrary': fetch_from_openlibrary}
+    keys = [(provider, isbn) for isbn in isbns for provider in parsers]
+
+    raw = {} if refresh else metadata_cache.get_many(keys)
+    missing = {provider: [isbn for isbn in isbns if (provider, isbn) not in raw] for provider in parsers}
+
+    # Google Books ISBN başına bir istek; Open Library bibkeys ile parça başına bir istek
+    chunk = app.config['OPENLIBRARY_BIBKEYS_PER_REQUEST']
+    jobs = [('google_books', [isbn]) for isbn in missing['google_books']]
+    jobs += [('openlibrary', missing['openlibrary'][i:i + chunk])
+             for i in range(0, len(missing['openlibrary']), chunk)]
+
+    executor = _get_metadata_executor()
+    futures = {executor.submit(_run_provider, provider, job_isbns, end_time): (provider, job_isbns)
+               for provider, job_isbns in jobs}
+
+    fetched = {}
+    if futures:
+        done, not_done = wait(list(futures), timeout=max(end_time - time.monotonic(), 0))
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            print(f"⚠️ Kitap bilgisi çekme süre sınırı aşıldı: {len(not_done)} sağlayıcı isteği yanıtsız")
+        for future in done:
+            provider, job_isbns = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                # Ağ hataları önbelleğe yazılmaz, bir sonraki çağrıda tekrar denenir
+                print(f"{provider} API Error for ISBN {', '.join(job_isbns)}: {e}")
+                continue
+            for isbn, data in results.items():
+                if data is not None:
+                    fetched[(provider, isbn)] = data
+        raw.update(fetched)
+
+    parsed = {key: parsers[key[0]](key[1], data=data) for key, data in raw.items()}
+    metadata_cache.put_many({key: (data, parsed[key] is not None) for key, data in fetched.items()})
+
+    return {
+        isbn: merge_book_info(isbn, parsed.get(('google_books', isbn)), parsed.get(('openlibrary', isbn)))
+        for isbn in isbns
+    }
+
+def fetch_book_info_from_api(isbn, deadline=None, refresh=False):
     """Hibrit API sistemi - Google Books ve Open Library'den en iyi bilgileri birleştir"""
+    if deadline is None:
+        deadline = app.config['METADATA_FETCH_DEADLINE']
+    return fetch_books_info_bulk([isbn], deadline=deadline, refresh=refresh).get(isbn)
+
+def merge_book_info(isbn, google_info, openlib_info):
+    """İki sağlayıcının sonuçlarını alan alan birleştir (öncelik Google Books)"""
     
     def is_empty_or_invalid(value):
         """Boş, nan, N/A gibi geçersiz değerleri kontrol et"""
@@ -242,10 +352,6 @@ def fetch_book_info_from_api(isbn):
             return clean in ['', 'nan', 'n/a', 'null', 'none', 'unknown']
         return value == 0
     
-    # Her iki API'den de veri çek
-    google_info = fetch_from_google_books(isbn)
-    openlib_info = fetch_from_openlibrary(isbn)
-    
     # Eğer hiçbirinden veri gelmezse None döndür
     if not google_info and not openlib_info:
         return None
@@ -313,24 +419,11 @@ def fetch_book_info_from_api(isbn):
     
     return combined_info
 
-def fetch_from_google_books(isbn):
-    """Fetch book info from Google Books API"""
+def fetch_from_google_books(isbn, timeout=None, data=None):
+    """Fetch book info from Google Books API (data verilirse önbellekteki ham yanıt ayrıştırılır)"""
     try:
-        url = f"https://www.googleapis.com/books/v1/volumes?q=isbn:{isbn}"
-        # SSL certificate verification disabled for PyInstaller executable compatibility
-        import sys
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        if hasattr(sys, 'frozen'):
-            # Running as PyInstaller executable
-            response = requests.get(url, verify=False, timeout=15)
-        else:
-            # Running normally (Railway production)
-            response = requests.get(url, timeout=15)
-        
-        response.raise_for_status()
-        data = response.json()
+        if data is None:
+            data = fetch_provider_data('google_books', isbn, timeout)
         
         if data.get("totalItems", 0) > 0:
             item = data["items"][0]["volumeInfo"]
@@ -357,22 +450,9 @@ def fetch_from_google_books(isbn):
         print(f"Google Books API Unexpected Error for ISBN {isbn}: {e}")
     return None
 
-def fetch_from_openlibrary_for_cover(isbn):
+def fetch_from_openlibrary_for_cover(isbn, timeout=None):
     try:
-        url = f"https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
-        # SSL certificate verification disabled for PyInstaller executable compatibility
-        import sys
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        if hasattr(sys, 'frozen'):
-            # Running as PyInstaller executable
-            response = requests.get(url, verify=False, timeout=15)
-        else:
-            # Running normally (Railway production)
-            response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        data = response.json()
+        data = fetch_provider_data('openlibrary', isbn, timeout)
         key = f"ISBN:{isbn}"
         if key in data and "cover" in data[key]:
             book = data[key]
@@ -390,22 +470,10 @@ def fetch_from_openlibrary_for_cover(isbn):
         print(f"OpenLibrary Cover API Unexpected Error for ISBN {isbn}: {e}")
     return None
 
-def fetch_from_openlibrary(isbn):
+def fetch_from_openlibrary(isbn, timeout=None, data=None):
     try:
-        url = f"https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
-        # SSL certificate verification disabled for PyInstaller executable compatibility
-        import sys
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        if hasattr(sys, 'frozen'):
-            # Running as PyInstaller executable
-            response = requests.get(url, verify=False, timeout=15)
-        else:
-            # Running normally (Railway production)
-            response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        data = response.json()
+        if data is None:
+            data = fetch_provider_data('openlibrary', isbn, timeout)
         key = f"ISBN:{isbn}"
         if key in data:
             book = data[key]
@@ -484,6 +552,143 @@ def fetch_from_openlibrary(isbn):
         print(f"OpenLibrary API Unexpected Error for ISBN {isbn}: {e}")
     return None
 
+def missing_info_books_query():
+    """Başlık, yazar, yayınevi, tarih, sayfa ya da kapak bilgisi eksik kitaplar"""
+    return Book.query.filter(
+        db.or_(
+            Book.title == None,
+            Book.title == '',
+            Book.title == 'nan',
+            Book.authors == None,
+            Book.authors == '',
+            Book.authors == 'nan',
+            Book.publishers == None,
+            Book.publishers == '',
+            Book.publishers == 'nan',
+            Book.publish_date == None,
+            Book.publish_date == '',
+            Book.number_of_pages == None,
+            Book.number_of_pages == 0,
+            Book.image_path == None,
+            Book.image_path == ''
+        )
+    )
+
+def fill_missing_book_info(book, book_info):
+    """Kitabın yalnızca boş/geçersiz alanlarını API bilgisiyle doldur; güncellenen alan listesini döner"""
+    updated_fields = []
+    
+    # Helper function to check if value is empty or invalid
+    def is_empty_or_invalid(value):
+        if not value:
+            return True
+        if isinstance(value, str):
+            clean_value = value.strip().lower()
+            return clean_value == '' or clean_value == 'nan' or clean_value == 'n/a' or clean_value == 'null' or clean_value == 'none'
+        return False
+    
+    # Update title
+    if is_empty_or_invalid(book.title) and book_info.get('title'):
+        book.title = book_info['title']
+        updated_fields.append('title')
+    
+    # Update authors
+    if is_empty_or_invalid(book.authors) and book_info.get('authors'):
+        book.authors = book_info['authors']
+        updated_fields.append('authors')
+    
+    # Update publishers
+    if is_empty_or_invalid(book.publishers) and book_info.get('publishers'):
+        if book_info['publishers'] != 'N/A':
+            book.publishers = book_info['publishers']
+            updated_fields.append('publishers')
+    
+    # Update publish date
+    if is_empty_or_invalid(book.publish_date) and book_info.get('publish_date'):
+        book.publish_date = book_info['publish_date']
+        updated_fields.append('publish_date')
+    
+    # Update page count
+    if (not book.number_of_pages or book.number_of_pages == 0) and book_info.get('number_of_pages'):
+        if book_info['number_of_pages'] > 0:
+            book.number_of_pages = book_info['number_of_pages']
+            updated_fields.append('pages')
+    
+    # Update language
+    if is_empty_or_invalid(book.languages) and book_info.get('languages'):
+        book.languages = book_info['languages']
+        updated_fields.append('languages')
+    
+    # Download cover image
+    if (not book.image_path or book.image_path.strip() == '') and book_info.get('image_url'):
+        try:
+            downloaded = download_cover_image(book_info['image_url'], book.isbn)
+            if downloaded:
+                book.image_path = downloaded
+                updated_fields.append('image')
+        except Exception:
+            pass
+    
+    return updated_fields
+
+def verify_and_update_book(book, book_info, force_update=True, include_covers=True):
+    """Kitap alanlarını API bilgisiyle doğrula/güncelle; değişiklik açıklamalarını döner.
+
+    force_update açıksa farklı olan her alan güncellenir, kapalıysa yalnızca boş/geçersiz alanlar.
+    """
+    changes = []
+    
+    # Helper function - değeri kontrol et ve güncelle
+    def update_field(field_name, api_value, display_name):
+        current_value = getattr(book, field_name)
+        
+        # API'den gelen değer varsa ve mevcut değerden farklıysa
+        if api_value and api_value != 'N/A':
+            # Force update modunda VEYA alan boşsa/geçersizse güncelle
+            should_update = False
+            
+            if force_update:
+                # Zorla güncelleme modunda farklıysa güncelle
+                if str(current_value) != str(api_value):
+                    should_update = True
+            else:
+                # Normal modda sadece boş/geçersiz alanları güncelle
+                if not current_value or str(current_value).strip().lower() in ['', 'nan', 'n/a', 'null', 'none']:
+                    should_update = True
+            
+            if should_update:
+                setattr(book, field_name, api_value)
+                changes.append(f"{display_name}: {current_value} → {api_value}")
+    
+    # TÜM ALANLARI KONTROL ET VE GÜNCELLE
+    update_field('title', book_info.get('title'), 'Başlık')
+    update_field('authors', book_info.get('authors'), 'Yazarlar')
+    update_field('publishers', book_info.get('publishers'), 'Yayınevi')
+    update_field('publish_date', book_info.get('publish_date'), 'Yayın Tarihi')
+    update_field('languages', book_info.get('languages'), 'Diller')
+    
+    # Sayfa sayısı özel kontrolü
+    api_pages = book_info.get('number_of_pages', 0)
+    if api_pages and api_pages > 0:
+        if force_update or not book.number_of_pages or book.number_of_pages == 0:
+            if book.number_of_pages != api_pages:
+                old_pages = book.number_of_pages
+                book.number_of_pages = api_pages
+                changes.append(f"Sayfa Sayısı: {old_pages} → {api_pages}")
+    
+    # Kapak resmi güncelleme
+    if include_covers and book_info.get('image_url'):
+        if force_update or not book.image_path or book.image_path.strip() == '':
+            try:
+                downloaded = download_cover_image(book_info['image_url'], book.isbn)
+                if downloaded:
+                    book.image_path = downloaded
+                    changes.append("Kapak resmi güncellendi")
+            except Exception as img_error:
+                print(f"Kapak indirme hatası {book.isbn}: {img_error}")
+    
+    return changes
+
 def add_notification(type, message, related_isbn=None):
     """Add a new notification"""
     notification = Notification(
@@ -495,27 +700,71 @@ def add_notification(type, message, related_isbn=None):
     db.session.add(notification)
     db.session.commit()
 
+def adjust_borrowed_count(isbn, delta):
+    """Kitabın ödünçteki kopya sayacını (Book.borrowed_count) artırır/azaltır.
+
+    Güncelleme SQL tarafında (borrowed_count = borrowed_count + delta) yapılır;
+    böylece aynı anda gelen istekler birbirinin değerini ezmez. Commit çağıranda kalır,
+    sayaç işlem kaydıyla aynı transaction içinde yazılır.
+    """
+    if not isbn or not delta:
+        return
+    new_value = db.func.coalesce(Book.borrowed_count, 0) + delta
+    Book.query.filter(Book.isbn == isbn).update(
+        {Book.borrowed_count: db.case((new_value < 0, 0), else_=new_value)},
+        synchronize_session='fetch'
+    )
+    note_borrowed_delta(isbn, delta)
+
+def reconcile_book_availability():
+    """borrowed_count sayaçlarını transactions tablosundan yeniden hesaplar (onarım)"""
+    actual_counts = dict(
+        db.session.query(Transaction.isbn, db.func.count(Transaction.id))
+        .filter(Transaction.return_date == None)
+        .group_by(Transaction.isbn)
+        .all()
+    )
+    
+    rows = db.session.query(Book.isbn, Book.borrowed_count).all()
+    fixes = []
+    deltas = {}
+    for isbn, stored in rows:
+        actual = actual_counts.get(isbn, 0)
+        if (stored or 0) != actual or stored is None:
+            fixes.append({'isbn': isbn, 'borrowed_count': actual})
+            deltas[isbn] = actual - (stored or 0)
+    
+    if fixes:
+        db.session.bulk_update_mappings(Book, fixes)
+        # Toplu yazma ORM olayı üretmez: rapor sürümü ve typeahead sayaçları elle güncellenir
+        bump_version(connection=db.session.connection())
+        for isbn, delta in deltas.items():
+            note_borrowed_delta(isbn, delta)
+    db.session.commit()
+    
+    return {'checked': len(rows), 'fixed': len(fixes)}
+
 def check_overdue_books():
     """Check for overdue books and create notifications"""
     # Books due soon
     upcoming = db.session.query(Transaction, Book, Member).join(Book, Transaction.isbn == Book.isbn)\
         .join(Member, Transaction.member_id == Member.id)\
         .filter(Transaction.return_date == None)\
-        .filter(Transaction.due_date <= (datetime.now() + timedelta(days=3)).strftime("%Y-%m-%d"))\
-        .filter(Transaction.due_date >= datetime.now().strftime("%Y-%m-%d")).all()
+        .filter(Transaction.due_date < day_start() + timedelta(days=4))\
+        .filter(Transaction.due_date >= day_start()).all()
     
     for trans, book, member in upcoming:
-        message = f"'{book.title}' kitabı {member.ad_soyad} tarafından {trans.due_date} tarihine kadar iade edilmelidir."
+        message = f"'{book.title}' kitabı {member.ad_soyad} tarafından {format_datetime(trans.due_date)} tarihine kadar iade edilmelidir."
         add_notification("return_reminder", message, book.isbn)
     
     # Overdue books
     overdue = db.session.query(Transaction, Book, Member).join(Book, Transaction.isbn == Book.isbn)\
         .join(Member, Transaction.member_id == Member.id)\
         .filter(Transaction.return_date == None)\
-        .filter(Transaction.due_date < datetime.now().strftime("%Y-%m-%d")).all()
+        .filter(Transaction.due_date < day_start()).all()
     
     for trans, book, member in overdue:
-        message = f"'{book.title}' kitabı {member.ad_soyad} tarafından {trans.due_date} tarihinden beri gecikmiştir."
+        message = f"'{book.title}' kitabı {member.ad_soyad} tarafından {format_datetime(trans.due_date)} tarihinden beri gecikmiştir."
         add_notification("overdue", message, book.isbn)
 
 def process_borrow_transaction(book, member, method, notes):
@@ -525,8 +774,7 @@ def process_borrow_transaction(book, member, method, notes):
         return jsonify({'success': False, 'message': 'Üyenin ceza süresi devam ediyor'}), 403
     
     # Kullanılabilirlik kontrolü
-    borrowed_count = Transaction.query.filter_by(isbn=book.isbn, return_date=None).count()
-    if book.quantity <= borrowed_count:
+    if book.available_count <= 0:
         return jsonify({'success': False, 'message': 'Kitap şu anda mevcut değil'}), 400
     
     # Kullanıcının bu kitabı zaten ödünç alıp almadığını kontrol et
@@ -546,12 +794,13 @@ def process_borrow_transaction(book, member, method, notes):
         return jsonify({'success': False, 'message': f'Üye maksimum {max_books} kitap ödünç alabilir'}), 400
     
     # Ödünç alma işlemi
-    due_date = (datetime.now() + timedelta(days=int(get_setting('max_borrow_days', '14')))).strftime('%Y-%m-%d %H:%M:%S')
+    now = datetime.now()
+    due_date = now + timedelta(days=int(get_setting('max_borrow_days', '14')))
     
     transaction = Transaction(
         isbn=book.isbn,
         member_id=member.id,
-        borrow_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        borrow_date=now,
         due_date=due_date,
         notes=f'{method.upper()} ile ödünç alındı - {notes}'
     )
@@ -565,6 +814,7 @@ def process_borrow_transaction(book, member, method, notes):
     member.current_borrowed = (member.current_borrowed or 0) + 1
     
     db.session.add(transaction)
+    adjust_borrowed_count(book.isbn, 1)
     db.session.commit()
     
     # Bildirim oluştur
@@ -575,8 +825,8 @@ def process_borrow_transaction(book, member, method, notes):
         send_email(member.email, 'book_borrowed', {
             'member_name': member.ad_soyad,
             'book_title': book.title,
-            'due_date': due_date,
-            'borrow_date': transaction.borrow_date
+            'due_date': format_datetime(due_date),
+            'borrow_date': format_datetime(transaction.borrow_date)
         })
     
     log_activity('borrow_transaction', f'{method.upper()} ile ödünç alma: {book.title} - {member.ad_soyad}')
@@ -588,8 +838,8 @@ def process_borrow_transaction(book, member, method, notes):
             'id': transaction.id,
             'book_title': book.title,
             'member_name': member.ad_soyad,
-            'due_date': due_date,
-            'borrow_date': transaction.borrow_date,
+            'due_date': format_datetime(due_date),
+            'borrow_date': format_datetime(transaction.borrow_date),
             'method': method
         }
     })
@@ -603,7 +853,7 @@ def process_return_transaction(transaction, notes, method, check_fines=True):
         return {'success': False, 'message': 'İade edilecek işlem bulunamadı.'}
 
     # İade işlemi
-    transaction.return_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    transaction.return_date = datetime.now()
     previous_notes = transaction.notes or ''
     try:
         method_label = str(method).upper()
@@ -615,6 +865,7 @@ def process_return_transaction(transaction, notes, method, check_fines=True):
     book = Book.query.get(transaction.isbn)
     if book:
         book.status = 'available'
+    adjust_borrowed_count(transaction.isbn, -1)
 
     # Güvenli kullanıcı ID'si al - kiosk ortamında current_user olmayabilir
     try:
@@ -625,9 +876,9 @@ def process_return_transaction(transaction, notes, method, check_fines=True):
     # Ceza kontrolü (sadece check_fines True ise)
     if check_fines:
         try:
-            due_date = datetime.strptime(transaction.due_date, '%Y-%m-%d')
-            return_date_dt = datetime.now()
-            if return_date_dt > due_date:
+            due_date = transaction.due_date
+            return_date_dt = transaction.return_date
+            if due_date and return_date_dt > due_date:
                 days_late = (return_date_dt - due_date).days
                 if days_late > 0:
                     fine_amount = days_late * 0.5  # Günlük 0.5 TL ceza
@@ -1012,343 +1263,10 @@ def create_simple_text_pdf_fallback(title, subtitle, headers, rows, stats_text):
     buffer.seek(0)
     return buffer
 
-# Basit ReportLab PDF fonksiyonu - QR kod PDF'i gibi çalışır
-def create_simple_reportlab_pdf(title, subtitle, headers, rows, stats_text):
-    """Create PDF using ReportLab - Simple and reliable like QR PDF"""
-    buffer = BytesIO()
-    # Rapor çıktıları yatay (landscape)
-    c = canvas.Canvas(buffer, pagesize=landscape(A4))
-    width, height = landscape(A4)
-    
-    # Türkçe karakterleri ASCII'ye çevir (normalize + diacritic remove)
-    def to_ascii(text):
-        if not text:
-            return ''
-        import unicodedata as _ud
-        # Önce bilinen Türkçe harfleri dönüştür
-        tr_chars = {
-            'İ': 'I', 'İ': 'I', 'ı': 'i', 'Ğ': 'G', 'ğ': 'g', 'Ü': 'U', 'ü': 'u',
-            'Ş': 'S', 'ş': 's', 'Ö': 'O', 'ö': 'o', 'Ç': 'C', 'ç': 'c'
-        }
-        for tr, en in tr_chars.items():
-            text = text.replace(tr, en)
-        # Unicode normalize edip combining mark'ları temizle
-        normalized = _ud.normalize('NFKD', text)
-        stripped = ''.join(ch for ch in normalized if _ud.category(ch) != 'Mn')
-        return stripped
-    
-    # Header
-    c.setFont('Helvetica-Bold', 8)
-    title_ascii = to_ascii(title)
-    title_width = c.stringWidth(title_ascii, 'Helvetica-Bold', 16)
-    c.drawString((width - title_width) / 2, height - 50, title_ascii)
-    
-    c.setFont('Helvetica-Bold', 8)
-    subtitle_ascii = to_ascii(subtitle)
-    subtitle_width = c.stringWidth(subtitle_ascii, 'Helvetica-Bold', 14)
-    c.drawString((width - subtitle_width) / 2, height - 80, subtitle_ascii)
-    
-    # Date
-    from datetime import datetime
-    date_str = f"Rapor Tarihi: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
-    c.setFont('Helvetica', 8)
-    date_width = c.stringWidth(date_str, 'Helvetica', 10)
-    c.drawString((width - date_width) / 2, height - 100, date_str)
-    
-    # Table headers
-    y = height - 140
-    c.setFont('Helvetica-Bold', 9)
-
-    # Column positions ve max uzunluklar (liste türüne göre optimize)
-    subtitle_ascii = to_ascii(subtitle).lower()
-    x_positions = []
-    max_lengths = []
-    # Kitap raporu - daha fazla sütun (Dolap, Raf eklenmiş -> 9 sütun)
-    if 'kitap' in subtitle_ascii and len(headers) >= 9:
-        # Sıra, ISBN, Kitap, Yazar, Yayınevi, Kategori, Dolap, Raf, Mevcut/Toplam
-        x_positions = [20, 70, 130, 300, 430, 520, 600, 680, 760]
-        max_lengths = [4, 13, 32, 22, 20, 12, 6, 6, 10]
-    elif 'kitap' in subtitle_ascii and len(headers) == 8:
-        # Sıra, ISBN, Kitap, Yazar, Yayınevi, Kategori, Raf, Mevcut/Toplam
-        x_positions = [20, 70, 130, 300, 430, 520, 680, 760]
-        max_lengths = [4, 13, 34, 22, 20, 12, 6, 10]
-    # Kitap raporu - 7 sütun (landscape)
-    elif 'kitap' in subtitle_ascii and len(headers) >= 7:
-        x_positions = [30, 90, 170, 380, 500, 590, 700]
-        max_lengths = [4, 13, 42, 24, 30, 16, 12]
-    elif 'kitap' in subtitle_ascii and len(headers) >= 6:
-        x_positions = [30, 90, 210, 400, 480, 540]
-        max_lengths = [4, 13, 36, 22, 16, 12]
-    # Üyeler raporu - 5 sütun (Öğrenci No ve E-posta kaldırıldı)
-    elif ('uye' in subtitle_ascii or 'üye' in subtitle.lower()) and len(headers) >= 5:
-        x_positions = [40, 220, 350, 480, 600]
-        max_lengths = [4, 36, 14, 14, 14]
-    # İşlemler raporu - 7 sütun (landscape)
-    elif ('islem' in subtitle_ascii or 'işlem' in subtitle.lower()) and len(headers) >= 7:
-        x_positions = [30, 120, 220, 480, 620, 720, 800]
-        max_lengths = [4, 13, 34, 24, 14, 14, 10]
-    elif ('islem' in subtitle_ascii or 'işlem' in subtitle.lower()) and len(headers) >= 6:
-        x_positions = [40, 100, 320, 430, 510, 560]
-        max_lengths = [4, 30, 22, 14, 14, 10]
-    else:
-        # Varsayılan dağılım
-        if len(headers) == 7:
-            x_positions = [30, 90, 180, 300, 400, 500, 560]
-            max_lengths = [4, 13, 24, 18, 14, 14, 10]
-        elif len(headers) == 6:
-            x_positions = [50, 120, 200, 320, 420, 500]
-            max_lengths = [6, 12, 18, 14, 12, 10]
-        elif len(headers) == 5:
-            x_positions = [50, 130, 230, 350, 470]
-            max_lengths = [6, 18, 18, 16, 14]
-        else:
-            x_positions = [50, 150, 250, 350, 450]
-            max_lengths = [16, 16, 16, 16, 16]
-    
-    # Draw headers
-    for i, header in enumerate(headers[:len(x_positions)]):
-        if i < len(x_positions):
-            header_ascii = to_ascii(header)
-            c.drawString(x_positions[i], y, header_ascii)
-    
-    # Draw line under headers
-    c.line(40, y-5, width-40, y-5)
-    
-    # Table rows
-    y -= 22
-    c.setFont('Helvetica', 8)
-    
-    for row in rows:  # Tüm satırları yazdır, limit yok
-        if y < 50:  # New page
-            c.showPage()
-            y = height - 50
-            c.setFont('Helvetica', 8)
-        
-        for i, cell in enumerate(row[:len(x_positions)]):
-            if i < len(x_positions):
-                cell_ascii = to_ascii(str(cell))
-                # Sütun bazlı truncation
-                max_len = max_lengths[i] if i < len(max_lengths) else 15
-                if len(cell_ascii) > max_len:
-                    cell_ascii = cell_ascii[:max(3, max_len - 3)] + '...'
-                c.drawString(x_positions[i], y, cell_ascii)
-        y -= 13
-    
-    # Stats
-    if y < 80:
-        c.showPage()
-        y = height - 50
-    
-    c.setFont('Helvetica-Bold', 8)
-    stats_ascii = to_ascii(stats_text)
-    c.drawString(50, y - 20, stats_ascii)
-    
-    c.save()
-    buffer.seek(0)
-    return buffer
-
-def generate_books_list_pdf(books):
-    """Generate books list PDF (ISBN, Yayınevi ve Mevcut/Toplam dahil)"""
-    title = "CUMHURİYET ANADOLU LİSESİ KÜTÜPHANESİ"
-    subtitle = "Kitaplar Listesi"
-    # Dolap ve Raf sütunlarını ekledik
-    headers = ['Sıra', 'ISBN', 'Kitap Adı', 'Yazar', 'Yayınevi', 'Kategori', 'Dolap', 'Raf', 'Mevcut/Toplam']
-    
-    # Dolap ve Raf'a göre sırala (dolap -> raf -> başlık)
-    def safe_lower(value):
-        return (str(value) if value is not None else '').strip().lower()
-
-    sorted_books = sorted(
-        books,
-        key=lambda b: (
-            safe_lower(getattr(b, 'cupboard', '')),
-            safe_lower(getattr(b, 'shelf', '')),
-            safe_lower(getattr(b, 'title', ''))
-        )
-    )
-
-    rows = []
-    for i, book in enumerate(sorted_books, 1):
-        try:
-            # Safe attribute access
-            status = 'Mevcut' if getattr(book, 'durum', None) == 'mevcut' else 'Ödünç Verildi'
-            title_text = getattr(book, 'title', 'Bilinmiyor')
-            authors = getattr(book, 'authors', 'Bilinmiyor')
-            publishers = getattr(book, 'publishers', None) or '-'
-            category = getattr(book, 'category', None) or 'Belirtilmemiş'
-            cupboard = getattr(book, 'cupboard', None) or '-'
-            shelf = getattr(book, 'shelf', None) or '-'
-            isbn = getattr(book, 'isbn', '-')
-            quantity = getattr(book, 'quantity', 0) or 0
-            borrowed = Transaction.query.filter_by(isbn=isbn, return_date=None).count() if isbn and isbn != '-' else 0
-            stock_text = f"{max(0, quantity - borrowed)}/{quantity}"
-            
-            # Truncate if too long
-            if len(title_text) > 30:
-                title_text = title_text[:27] + '...'
-            if len(authors) > 25:
-                authors = authors[:22] + '...'
-            if len(publishers) > 30:
-                publishers = publishers[:27] + '...'
-            
-            rows.append([
-                str(i),
-                isbn,
-                title_text,
-                authors,
-                publishers,
-                category,
-                cupboard,
-                shelf,
-                stock_text
-            ])
-        except Exception as e:
-            print(f"Book row error: {e}")
-            continue
-    
-    stats_text = f"Toplam Kitap Sayısı: {len(books)}"
-    return create_simple_reportlab_pdf(title, subtitle, headers, rows, stats_text)
-
-def generate_members_list_pdf(members):
-    """Generate members list PDF (Öğrenci No ve E-posta sütunları kaldırıldı)"""
-    title = "CUMHURİYET ANADOLU LİSESİ KÜTÜPHANESİ"
-    subtitle = "Üyeler Listesi"
-    # Öğrenci No ve E-posta istenmediği için kaldırıldı
-    headers = ['Sıra', 'Ad Soyad', 'Sınıf', 'Numara', 'Üye Türü']
-    
-    # Sınıfa (ve sonra numaraya) göre sırala
-    def safe_value(v):
-        return (str(v) if v is not None else '').strip()
-    def sort_key(m):
-        return (safe_value(getattr(m, 'sinif', '')), safe_value(getattr(m, 'numara', '')), safe_value(getattr(m, 'ad_soyad', '')))
-    sorted_members = sorted(members, key=sort_key)
-
-    rows = []
-    for i, member in enumerate(sorted_members, 1):
-        try:
-            # Safe attribute access
-            ad_soyad = getattr(member, 'ad_soyad', 'Bilinmiyor')
-            sinif = getattr(member, 'sinif', None) or '-'
-            numara = getattr(member, 'numara', None) or '-'
-            email = getattr(member, 'email', None) or '-'
-            uye_turu = getattr(member, 'uye_turu', None) or 'Öğrenci'
-            
-            # Truncate if too long
-            if len(ad_soyad) > 25:
-                ad_soyad = ad_soyad[:22] + '...'
-            if email != '-' and len(email) > 25:
-                email = email[:22] + '...'
-            
-            rows.append([
-                str(i),
-                ad_soyad,
-                sinif,
-                numara,
-                uye_turu
-            ])
-        except Exception as e:
-            print(f"Member row error: {e}")
-            continue
-    
-    stats_text = f"Toplam Üye Sayısı: {len(members)}"
-    return create_simple_reportlab_pdf(title, subtitle, headers, rows, stats_text)
-
-def generate_transactions_list_pdf(transactions):
-    """Generate transactions list PDF (ISBN sütunu eklendi)"""
-    title = "CUMHURİYET ANADOLU LİSESİ KÜTÜPHANESİ"
-    subtitle = "İşlemler Listesi"
-    headers = ['Sıra', 'ISBN', 'Kitap', 'Üye', 'Ödünç Tarihi', 'İade Tarihi', 'Durum']
-    
-    # Tarihlere göre sırala (Ödünç tarihi, en yeni en üstte)
-    from datetime import datetime as _dt
-    def parse_date(d):
-        try:
-            return _dt.strptime(d, '%Y-%m-%d') if d else _dt.min
-        except:
-            return _dt.min
-    sorted_transactions = sorted(transactions, key=lambda t: parse_date(getattr(t, 'borrow_date', None)), reverse=True)
-
-    rows = []
-    for i, transaction in enumerate(sorted_transactions, 1):
-        try:
-            # Safe relationship access - handle missing book/member relationships
-            isbn = getattr(transaction, 'isbn', '-') or '-'
-            book_title = 'Bilinmiyor'
-            member_name = 'Bilinmiyor'
-            
-            # Try to get book info
-            if hasattr(transaction, 'book') and transaction.book:
-                book_title = getattr(transaction.book, 'title', 'Bilinmiyor')
-                if len(book_title) > 25:
-                    book_title = book_title[:22] + '...'
-            elif hasattr(transaction, 'isbn') and transaction.isbn:
-                # If no book relationship, try to get from ISBN
-                from models import Book
-                book = Book.query.filter_by(isbn=transaction.isbn).first()
-                if book:
-                    book_title = getattr(book, 'title', 'Bilinmiyor')
-                    if len(book_title) > 25:
-                        book_title = book_title[:22] + '...'
-                else:
-                    book_title = f"ISBN: {transaction.isbn}"
-            
-            # Try to get member info
-            if hasattr(transaction, 'member') and transaction.member:
-                member_name = getattr(transaction.member, 'ad_soyad', 'Bilinmiyor')
-                if len(member_name) > 20:
-                    member_name = member_name[:17] + '...'
-            elif hasattr(transaction, 'member_id') and transaction.member_id:
-                # If no member relationship, try to get from member_id
-                from models import Member
-                member = Member.query.filter_by(id=transaction.member_id).first()
-                if member:
-                    member_name = getattr(member, 'ad_soyad', 'Bilinmiyor')
-                    if len(member_name) > 20:
-                        member_name = member_name[:17] + '...'
-                else:
-                    member_name = f"ID: {transaction.member_id}"
-            
-            # Get dates and status
-            borrow_date = getattr(transaction, 'borrow_date', None) or '-'
-            return_date = getattr(transaction, 'return_date', None) or '-'
-            status = 'İade Edildi' if return_date != '-' else 'Ödünç'
-            
-            rows.append([
-                str(i),
-                isbn,
-                book_title,
-                member_name,
-                borrow_date,
-                return_date,
-                status
-            ])
-        except Exception as e:
-            print(f"Transaction row error: {e}")
-            # Add error row to continue processing
-            rows.append([
-                str(i),
-                'Hata',
-                'Hata',
-                '-',
-                '-',
-                'Hata'
-            ])
-            continue
-    
-    try:
-        active_count = len([t for t in transactions if not getattr(t, 'return_date', None)])
-        completed_count = len([t for t in transactions if getattr(t, 'return_date', None)])
-    except:
-        active_count = 0
-        completed_count = len(transactions)
-    
-    stats_text = f"Toplam İşlem: {len(transactions)} | Aktif Ödünç: {active_count} | Tamamlanan: {completed_count}"
-    return create_simple_reportlab_pdf(title, subtitle, headers, rows, stats_text)
-
 def generate_books_qr_pdf(books):
     """Generate QR codes for books in PDF format"""
     buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
     width, height = A4
     x, y = 20*mm, height-60*mm
     qr_size = 40*mm
@@ -1356,8 +1274,7 @@ def generate_books_qr_pdf(books):
     count = 0
     
     for book in books:
-        qr_img = qrcode.make(book.isbn)
-        c.drawInlineImage(qr_img, x, y, qr_size, qr_size)
+        draw_qr(c, book.isbn, x, y, qr_size)
         c.setFont('Helvetica', 8)
         c.drawString(x, y-8, f"{book.title[:30]}")
         c.drawString(x, y-16, f"ISBN: {book.isbn}")
@@ -1462,14 +1379,10 @@ def generate_books_qr_pdf(books):
     buffer.seek(0)
     return buffer
 
-## duplicate generate_members_list_pdf removed; using the simplified ReportLab version above
-
-## duplicate generate_transactions_list_pdf removed; using the simplified ReportLab version above
-
 def generate_members_qr_pdf(members):
     """Generate QR codes for members in PDF format"""
     buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
     width, height = A4
     x, y = 20*mm, height-60*mm
     qr_size = 40*mm
@@ -1477,8 +1390,7 @@ def generate_members_qr_pdf(members):
     count = 0
     
     for member in members:
-        qr_img = qrcode.make(str(member.id))
-        c.drawInlineImage(qr_img, x, y, qr_size, qr_size)
+        draw_qr(c, str(member.id), x, y, qr_size)
         c.setFont('Helvetica', 8)
         c.drawString(x, y-8, f"{member.ad_soyad[:30]}")
         c.drawString(x, y-16, f"No: {member.numara}")
@@ -1497,6 +1409,31 @@ def generate_members_qr_pdf(members):
     buffer.seek(0)
     return buffer
 
+def send_temp_file(path, download_name, mimetype, chunk_size=65536):
+    """Geçici dosyayı parça parça gönder ve gönderim bitince (ya da istemci koparsa) sil.
+
+    send_file + call_on_close dosya sarmalayıcısıyla güvenilir çalışmadığı için
+    üreteç kullanılır; Windows'ta açık dosya silinemediğinden silme dosya kapandıktan sonra yapılır.
+    """
+    def generate():
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    response = Response(generate(), mimetype=mimetype)
+    response.headers['Content-Length'] = str(os.path.getsize(path))
+    response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    return response
+
 def export_to_excel(data, sheet_name='Data'):
     """Export data to Excel format"""
     df = pd.DataFrame(data)
@@ -1519,8 +1456,7 @@ def process_online_borrow_request(request_data):
         return {'success': False, 'message': 'Kitap bulunamadı'}
     
     # Kullanılabilirlik kontrolü
-    borrowed_count = Transaction.query.filter_by(isbn=isbn, return_date=None).count()
-    if book.quantity <= borrowed_count:
+    if book.available_count <= 0:
         return {'success': False, 'message': 'Kitap şu anda mevcut değil'}
     
     # Üye kontrolü
@@ -1708,7 +1644,7 @@ def get_member_statistics():
         Member.ad_soyad.label('name'), db.func.count(Transaction.id).label('overdue_count')
     ).join(Transaction).filter(
         Transaction.return_date == None,
-        Transaction.due_date < datetime.now().strftime('%Y-%m-%d')
+        Transaction.due_date < day_start()
     ).group_by(Member.id).order_by(db.text('overdue_count DESC')).limit(10).all()
     
     return {
@@ -1728,24 +1664,29 @@ def quick_search_books(query, limit=10):
     if not query:
         return {'success': False, 'message': 'Arama terimi gerekli'}
     
-    # Kitap arama
-    books = Book.query.filter(
-        db.or_(
-            Book.title.contains(query),
-            Book.authors.contains(query),
-            Book.isbn.contains(query),
-            Book.barcode.contains(query)
-        )
-    ).limit(limit).all()
+    # Kitap arama (tam metin indeksi varsa alaka sırasıyla)
+    fts = match_subquery(query)
+    if fts is not None:
+        books = Book.query.join(fts, fts.c.isbn == Book.isbn)\
+            .order_by(fts.c.rank).limit(limit).all()
+    else:
+        books = Book.query.filter(
+            db.or_(
+                Book.title.contains(query),
+                Book.authors.contains(query),
+                Book.isbn.contains(query),
+                Book.barcode.contains(query)
+            )
+        ).limit(limit).all()
     
     books_data = []
     for book in books:
         # Mevcut durumu kontrol et
-        borrowed_count = Transaction.query.filter_by(isbn=book.isbn, return_date=None).count()
-        available = book.quantity > borrowed_count
+        borrowed_count = book.borrowed_count or 0
+        available = book.available_count > 0
         
         # Kapak yolunu normalize et
-        image_url = normalize_cover_url(book.image_path)
+        image_url = normalize_cover_url(book.image_path, size='list')
         
         books_data.append({
             'isbn': book.isbn,
@@ -2210,8 +2151,12 @@ def merge_duplicate_books(main_isbn, duplicate_isbn):
         
         # Duplicate kitabın işlemlerini main kitaba aktar
         transactions = Transaction.query.filter_by(isbn=duplicate_isbn).all()
+        moved_active = 0
         for transaction in transactions:
             transaction.isbn = main_isbn
+            if transaction.return_date is None:
+                moved_active += 1
+        adjust_borrowed_count(main_isbn, moved_active)
         
         # Duplicate kitabın bilgilerini main kitaba ekle (eksik olanları)
         if not main_book.authors and duplicate_book.authors:
@@ -2286,54 +2231,40 @@ def merge_duplicate_members(main_id, duplicate_id):
 
 # Performance Optimization - Caching and Pre-computation
 import functools
-import time
+import hashlib
+
+from shared_cache import result_cache
 
-# Simple in-memory cache
-_cache = {}
-_cache_timestamps = {}
+def _cache_key(func, args, kwargs):
+    # Paylaşılan önbellek metin anahtar ister; argümanlar repr ile özetlenir
+    digest = hashlib.sha1(repr((args, sorted(kwargs.items()))).encode('utf-8')).hexdigest()
+    return f'{func.__module__}.{func.__qualname__}:{digest}'
 
-def cache_with_ttl(ttl_seconds=300):  # 5 dakika default TTL
-    """TTL (Time To Live) ile cache decorator"""
+def cache_with_ttl(ttl_seconds=300, tags=()):  # 5 dakika default TTL
+    """TTL (Time To Live) ile cache decorator (shared_cache.result_cache: tüm worker'larda ortak).
+
+    Kayıtlar fonksiyon adı ve verilen etiketlerle işaretlenir;
+    invalidate_related_cache etiketle geçersiz kılar. Aynı anahtarı aynı anda
+    isteyen worker'lardan yalnızca biri hesaplar.
+    """
     def decorator(func):
+        entry_tags = (func.__name__,) + tuple(tags)
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # Cache key oluştur
-            cache_key = f"{func.__name__}:{str(args)}:{str(sorted(kwargs.items()))}"
-            
-            # Cache kontrol et
-            current_time = time.time()
-            if (cache_key in _cache and 
-                cache_key in _cache_timestamps and
-                current_time - _cache_timestamps[cache_key] < ttl_seconds):
-                return _cache[cache_key]
-            
-            # Cache miss - fonksiyonu çalıştır
-            result = func(*args, **kwargs)
-            
-            # Cache'e kaydet
-            _cache[cache_key] = result
-            _cache_timestamps[cache_key] = current_time
-            
-            return result
+            return result_cache.get_or_set(_cache_key(func, args, kwargs),
+                                           lambda: func(*args, **kwargs),
+                                           ttl_seconds, entry_tags)
         return wrapper
     return decorator
 
-def clear_cache(pattern=None):
-    """Cache'i temizle"""
-    global _cache, _cache_timestamps
-    
-    if pattern:
-        # Pattern ile eşleşen cache'leri temizle
-        keys_to_remove = [key for key in _cache.keys() if pattern in key]
-        for key in keys_to_remove:
-            _cache.pop(key, None)
-            _cache_timestamps.pop(key, None)
-    else:
-        # Tüm cache'i temizle
-        _cache.clear()
-        _cache_timestamps.clear()
+def clear_cache(tag=None):
+    """Cache'i temizle (etiket ya da fonksiyon adı verilirse yalnızca o kayıtları)"""
+    if tag:
+        return result_cache.invalidate_tags(tag)
+    result_cache.clear()
 
-@cache_with_ttl(600)  # 10 dakika cache
+@cache_with_ttl(600, tags=('books', 'transactions'))  # 10 dakika cache
 def get_popular_books_cached(limit=10):
     """Popüler kitapları cache'li olarak getir"""
     from models import Book, Transaction
@@ -2357,7 +2288,7 @@ def get_popular_books_cached(limit=10):
         'borrow_count': book.borrow_count
     } for book in popular_books]
 
-@cache_with_ttl(300)  # 5 dakika cache
+@cache_with_ttl(300, tags=('books', 'members', 'transactions'))  # 5 dakika cache
 def get_dashboard_stats_cached():
     """Dashboard istatistiklerini cache'li olarak getir"""
     from models import Book, Member, Transaction
@@ -2371,14 +2302,13 @@ def get_dashboard_stats_cached():
     # Bu ayın işlemleri
     current_month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     monthly_transactions = Transaction.query.filter(
-        Transaction.borrow_date >= current_month_start.strftime('%Y-%m-%d')
+        Transaction.borrow_date >= current_month_start
     ).count()
     
     # Geciken kitaplar
-    today = datetime.now().strftime('%Y-%m-%d')
     overdue_books = Transaction.query.filter(
         Transaction.return_date == None,
-        Transaction.due_date < today
+        Transaction.due_date < day_start()
     ).count()
     
     return {
@@ -2406,17 +2336,15 @@ def precompute_reports():
         print(f"❌ Ön-hesaplama hatası: {str(e)}")
 
 def invalidate_related_cache(operation_type, **kwargs):
-    """İlgili cache'leri geçersiz kıl"""
+    """İlgili cache'leri geçersiz kıl (paylaşılan önbellekte: tüm worker'lar için)"""
     if operation_type in ['book_added', 'book_updated', 'book_deleted']:
-        clear_cache('get_popular_books_cached')
-        clear_cache('get_dashboard_stats_cached')
+        result_cache.invalidate_tags('books')
     
     elif operation_type in ['member_added', 'member_updated', 'member_deleted']:
-        clear_cache('get_dashboard_stats_cached')
+        result_cache.invalidate_tags('members')
     
     elif operation_type in ['transaction_created', 'transaction_updated']:
-        clear_cache('get_popular_books_cached')
-        clear_cache('get_dashboard_stats_cached')
+        result_cache.invalidate_tags('transactions')
     
     elif operation_type == 'cache_clear_all':
         clear_cache()